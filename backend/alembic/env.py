@@ -0,0 +1,77 @@
+"""
+Alembic 迁移环境
+
+数据库地址优先使用命令行参数 -x url=...，否则使用应用配置中的 DATABASE_URL。
+SQLite 不支持大部分 ALTER TABLE 操作，迁移在 SQLite 上以批处理模式（重建表）执行。
+"""
+
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine, pool
+
+from backend.core.config import settings
+from backend.database.database import Base
+from backend.database.types import include_for_dialect
+# 导入所有模型，确保 Base.metadata 包含全部表（autogenerate 需要）
+import backend.models.user  # noqa: F401
+import backend.models.model  # noqa: F401
+import backend.models.chat  # noqa: F401
+import backend.models.cache_version  # noqa: F401
+import backend.models.usage  # noqa: F401
+import backend.models.job  # noqa: F401
+
+config = context.config
+
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+
+def get_url() -> str:
+    return context.get_x_argument(as_dictionary=True).get("url") or settings.DATABASE_URL
+
+
+def _configure_args(dialect_name: str) -> dict:
+    return {
+        "target_metadata": target_metadata,
+        "compare_type": True,
+        "render_as_batch": dialect_name == "sqlite",
+        "include_object": include_for_dialect(dialect_name),
+    }
+
+
+def run_migrations_offline() -> None:
+    """只输出SQL，不连接数据库（alembic upgrade head --sql）"""
+    url = get_url()
+    context.configure(
+        url=url,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        **_configure_args(url.split(":", 1)[0].split("+", 1)[0]),
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    connectable = config.attributes.get("connection")
+    if connectable is not None:
+        # 由代码调用（例如 tools/check_migrations.py）时复用传入的连接
+        context.configure(connection=connectable, **_configure_args(connectable.dialect.name))
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+
+    engine = create_engine(get_url(), poolclass=pool.NullPool)
+    with engine.connect() as connection:
+        context.configure(connection=connection, **_configure_args(connection.dialect.name))
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
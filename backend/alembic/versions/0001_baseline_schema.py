@@ -0,0 +1,196 @@
+"""baseline schema
+
+与 backend/migrations 中 001-011 脚本执行完后的表结构一致。
+已经用旧脚本建好的数据库不需要执行本迁移，直接 alembic stamp 0001 标记即可。
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-19 05:17:54
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# PostgreSQL 上使用 JSONB，其它数据库使用通用 JSON
+JSONType = sa.JSON().with_variant(postgresql.JSONB(), "postgresql")
+
+
+def _is_postgresql() -> bool:
+    return op.get_context().dialect.name == "postgresql"
+
+
+def upgrade() -> None:
+    op.create_table('cache_versions',
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.create_table('model_instances',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('config_id', sa.Integer(), nullable=False),
+    sa.Column('instance_name', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('loaded_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('last_used', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_model_instances_id'), 'model_instances', ['id'], unique=False)
+    op.create_table('user_model_preferences',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('model_config_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_user_model_preferences_id'), 'user_model_preferences', ['id'], unique=False)
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('username', sa.String(), nullable=False),
+    sa.Column('email', sa.String(), nullable=False),
+    sa.Column('hashed_password', sa.String(), nullable=False),
+    sa.Column('avatar_url', sa.String(), nullable=True),
+    sa.Column('theme_preference', sa.String(), nullable=True),
+    sa.Column('last_login', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('last_logout', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True, comment='创建时间'),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True, comment='更新时间'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_users_email'), 'users', ['email'], unique=True)
+    op.create_index(op.f('ix_users_id'), 'users', ['id'], unique=False)
+    op.create_index(op.f('ix_users_username'), 'users', ['username'], unique=True)
+    op.create_table('model_configs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('base_url', sa.String(), nullable=False),
+    sa.Column('api_key', sa.String(), nullable=False),
+    sa.Column('model_name', sa.String(), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('enable_streaming', sa.Boolean(), nullable=True),
+    sa.Column('enable_context', sa.Boolean(), nullable=True),
+    sa.Column('temperature', sa.Float(), nullable=True),
+    sa.Column('top_p', sa.Float(), nullable=True),
+    sa.Column('frequency_penalty', sa.Float(), nullable=True),
+    sa.Column('presence_penalty', sa.Float(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_model_configs_id'), 'model_configs', ['id'], unique=False)
+    op.create_index(op.f('ix_model_configs_name'), 'model_configs', ['name'], unique=False)
+    op.create_table('chat_history',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('config_id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(length=255), nullable=False, comment='聊天标题'),
+    sa.Column('url', sa.String(length=500), nullable=False, comment='聊天URL'),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True, comment='创建时间'),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True, comment='更新时间'),
+    sa.Column('is_deleted', sa.Boolean(), nullable=True, comment='是否删除'),
+    sa.Column('enable_context', sa.Boolean(), nullable=True, comment='是否启用上下文功能'),
+    sa.Column('context_window_size', sa.Integer(), nullable=True, comment='上下文窗口大小（消息数量）'),
+    sa.Column('enable_context_summary', sa.Boolean(), nullable=True, comment='是否启用上下文摘要'),
+    sa.Column('context_summary', sa.Text(), nullable=True, comment='上下文摘要内容'),
+    sa.Column('context_settings', JSONType, nullable=True, comment='上下文设置，如智能选择、关键词过滤等'),
+    sa.ForeignKeyConstraint(['config_id'], ['model_configs.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('url')
+    )
+    op.create_index(op.f('ix_chat_history_id'), 'chat_history', ['id'], unique=False)
+    op.create_table('usage_rollups',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('config_id', sa.Integer(), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(timezone=True), nullable=False, comment='小时桶起始时间'),
+    sa.Column('request_count', sa.Integer(), nullable=False, comment='请求数（助手回复数）'),
+    sa.Column('estimated_count', sa.Integer(), nullable=False, comment='token数为本地估算的请求数'),
+    sa.Column('prompt_tokens', sa.Integer(), nullable=False, comment='输入token总数'),
+    sa.Column('completion_tokens', sa.Integer(), nullable=False, comment='输出token总数'),
+    sa.Column('latency_count', sa.Integer(), nullable=False, comment='有响应时间的请求数'),
+    sa.Column('latency_sum', sa.Float(), nullable=False, comment='响应时间总和（秒）'),
+    sa.Column('ttft_count', sa.Integer(), nullable=False, comment='有首token延迟的请求数'),
+    sa.Column('ttft_sum', sa.Float(), nullable=False, comment='首token延迟总和（秒）'),
+    sa.Column('latency_bucket_0', sa.Integer(), nullable=False, comment='<= 0.5s'),
+    sa.Column('latency_bucket_1', sa.Integer(), nullable=False, comment='<= 1s'),
+    sa.Column('latency_bucket_2', sa.Integer(), nullable=False, comment='<= 2s'),
+    sa.Column('latency_bucket_3', sa.Integer(), nullable=False, comment='<= 5s'),
+    sa.Column('latency_bucket_4', sa.Integer(), nullable=False, comment='<= 10s'),
+    sa.Column('latency_bucket_5', sa.Integer(), nullable=False, comment='<= 20s'),
+    sa.Column('latency_bucket_6', sa.Integer(), nullable=False, comment='<= 30s'),
+    sa.Column('latency_bucket_7', sa.Integer(), nullable=False, comment='<= 60s'),
+    sa.Column('latency_bucket_8', sa.Integer(), nullable=False, comment='<= 120s'),
+    sa.Column('latency_bucket_9', sa.Integer(), nullable=False, comment='> 120s'),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['config_id'], ['model_configs.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'config_id', 'bucket_start', name='uq_usage_rollup_bucket')
+    )
+    op.create_index(op.f('ix_usage_rollups_id'), 'usage_rollups', ['id'], unique=False)
+    op.create_index(op.f('ix_usage_rollups_user_id'), 'usage_rollups', ['user_id'], unique=False)
+    op.create_table('chat_messages',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('chat_history_id', sa.Integer(), nullable=False),
+    sa.Column('role', sa.String(length=50), nullable=False, comment='消息角色：user/assistant/system'),
+    sa.Column('content', sa.Text(), nullable=False, comment='消息内容'),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True, comment='创建时间'),
+    sa.Column('message_metadata', JSONType, nullable=True, comment='额外元数据，如模型参数、工具调用等'),
+    sa.Column('context_relevance_score', sa.Integer(), nullable=True, comment='上下文相关性评分'),
+    sa.Column('context_keywords', JSONType, nullable=True, comment='提取的关键词'),
+    sa.Column('context_vector', sa.LargeBinary(), nullable=True, comment='哈希语义向量（float32）'),
+    sa.Column('prompt_tokens', sa.Integer(), nullable=True, comment='输入token数'),
+    sa.Column('completion_tokens', sa.Integer(), nullable=True, comment='输出token数'),
+    sa.Column('usage_estimated', sa.Boolean(), nullable=True, comment='token数是否为本地估算'),
+    sa.Column('ttft', sa.Float(), nullable=True, comment='首token延迟（秒）'),
+    sa.Column('tokens_per_second', sa.Float(), nullable=True, comment='生成速度（token/秒）'),
+    sa.ForeignKeyConstraint(['chat_history_id'], ['chat_history.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_chat_messages_id'), 'chat_messages', ['id'], unique=False)
+
+    # JSONB 列的 GIN 索引（仅 PostgreSQL）
+    if _is_postgresql():
+        op.create_index('ix_chat_messages_context_keywords_gin', 'chat_messages', ['context_keywords'], unique=False, postgresql_using='gin')
+        op.create_index('ix_chat_messages_metadata_gin', 'chat_messages', ['message_metadata'], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    if _is_postgresql():
+        op.drop_index('ix_chat_messages_metadata_gin', table_name='chat_messages', postgresql_using='gin')
+        op.drop_index('ix_chat_messages_context_keywords_gin', table_name='chat_messages', postgresql_using='gin')
+    op.drop_index(op.f('ix_chat_messages_id'), table_name='chat_messages')
+    op.drop_table('chat_messages')
+    op.drop_index(op.f('ix_usage_rollups_user_id'), table_name='usage_rollups')
+    op.drop_index(op.f('ix_usage_rollups_id'), table_name='usage_rollups')
+    op.drop_table('usage_rollups')
+    op.drop_index(op.f('ix_chat_history_id'), table_name='chat_history')
+    op.drop_table('chat_history')
+    op.drop_index(op.f('ix_model_configs_name'), table_name='model_configs')
+    op.drop_index(op.f('ix_model_configs_id'), table_name='model_configs')
+    op.drop_table('model_configs')
+    op.drop_index(op.f('ix_users_username'), table_name='users')
+    op.drop_index(op.f('ix_users_id'), table_name='users')
+    op.drop_index(op.f('ix_users_email'), table_name='users')
+    op.drop_table('users')
+    op.drop_index(op.f('ix_user_model_preferences_id'), table_name='user_model_preferences')
+    op.drop_table('user_model_preferences')
+    op.drop_index(op.f('ix_model_instances_id'), table_name='model_instances')
+    op.drop_table('model_instances')
+    op.drop_table('cache_versions')
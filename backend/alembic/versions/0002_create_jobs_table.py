@@ -0,0 +1,53 @@
+"""create jobs table
+
+后台任务表（backend/core/jobs.py）。
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 05:25:28
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# PostgreSQL 上使用 JSONB，其它数据库使用通用 JSON
+JSONType = sa.JSON().with_variant(postgresql.JSONB(), "postgresql")
+
+
+def upgrade() -> None:
+    op.create_table('jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=100), nullable=False, comment='任务类型，对应注册的处理函数'),
+    sa.Column('payload', JSONType, nullable=True, comment='任务参数'),
+    sa.Column('idempotency_key', sa.String(length=255), nullable=True, comment='幂等键，相同键的任务只会创建一次'),
+    sa.Column('status', sa.String(length=20), nullable=False, comment='pending/running/succeeded/failed'),
+    sa.Column('attempts', sa.Integer(), nullable=False, comment='已执行次数'),
+    sa.Column('max_attempts', sa.Integer(), nullable=False, comment='最多执行次数'),
+    sa.Column('run_at', sa.DateTime(timezone=True), nullable=False, comment='最早执行时间（重试时按退避时间推后）'),
+    sa.Column('locked_by', sa.String(length=100), nullable=True, comment='正在执行的工作进程'),
+    sa.Column('locked_at', sa.DateTime(timezone=True), nullable=True, comment='开始执行时间'),
+    sa.Column('last_error', sa.Text(), nullable=True, comment='最近一次失败的错误信息'),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True, comment='创建时间'),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True, comment='完成时间'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('idempotency_key')
+    )
+    op.create_index(op.f('ix_jobs_id'), 'jobs', ['id'], unique=False)
+    op.create_index(op.f('ix_jobs_kind'), 'jobs', ['kind'], unique=False)
+    op.create_index('ix_jobs_status_run_at', 'jobs', ['status', 'run_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_jobs_status_run_at', table_name='jobs')
+    op.drop_index(op.f('ix_jobs_kind'), table_name='jobs')
+    op.drop_index(op.f('ix_jobs_id'), table_name='jobs')
+    op.drop_table('jobs')
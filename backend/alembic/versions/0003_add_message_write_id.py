@@ -0,0 +1,31 @@
+"""add message write id
+
+聊天消息写入队列（backend/core/message_writer.py）为每条消息分配的条目ID，重放日志时据此去重。
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 09:12:40
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('chat_messages', sa.Column('write_id', sa.String(length=32), nullable=True, comment='写入队列条目ID'))
+    op.create_index(op.f('ix_chat_messages_write_id'), 'chat_messages', ['write_id'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_chat_messages_write_id'), table_name='chat_messages')
+    with op.batch_alter_table('chat_messages') as batch_op:
+        batch_op.drop_column('write_id')
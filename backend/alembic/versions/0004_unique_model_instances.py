@@ -0,0 +1,33 @@
+"""unique model instances
+
+model_instances 的 (config_id, instance_name) 唯一，健康检查结果按此 upsert，
+避免后台刷新和 /api/models/health 同时写入时产生重复行。已有的重复行只保留最新的一行。
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 14:05:53
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(sa.text("""
+        DELETE FROM model_instances
+        WHERE id NOT IN (SELECT MAX(id) FROM model_instances GROUP BY config_id, instance_name)
+    """))
+    op.create_index('uq_model_instances_config_instance', 'model_instances', ['config_id', 'instance_name'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('uq_model_instances_config_instance', table_name='model_instances')
@@ -3,7 +3,7 @@ from sqlalchemy.orm import Session
 from backend.database.database import get_db
 from backend.models.user import User, get_current_time
 from backend.schemas.user import UserCreate, User as UserSchema, Token, LoginRequest
-from backend.utils.auth import verify_password, create_access_token, get_current_active_user
+from backend.utils.auth import verify_password_async, get_password_hash_async, create_access_token, get_current_active_user, invalidate_user_cache
 from backend.crud.user import get_user_by_username, get_user_by_email, create_user
 from typing import Dict, Any
 from datetime import datetime
@@ -30,8 +30,9 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
                 detail="邮箱已被注册"
             )
         
-        # 创建新用户
-        new_user = create_user(db=db, user=user)
+        # 创建新用户（密码哈希在线程池中计算）
+        hashed_password = await get_password_hash_async(user.password)
+        new_user = create_user(db=db, user=user, hashed_password=hashed_password)
         
         # 返回用户信息
         return {
@@ -77,7 +78,7 @@ async def login(login_data: LoginRequest, db: Session = Depends(get_db)):
             )
         
         # 验证密码
-        if not verify_password(login_data.password, user.hashed_password):
+        if not await verify_password_async(login_data.password, user.hashed_password):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect password",
@@ -87,6 +88,7 @@ async def login(login_data: LoginRequest, db: Session = Depends(get_db)):
         # 更新最后登录时间
         user.last_login = get_current_time()
         db.commit()
+        invalidate_user_cache(user.id)
         
         # 创建访问令牌
         access_token = create_access_token(data={"sub": user.username})
@@ -126,6 +128,7 @@ async def logout(
         # 更新最后退出时间
         current_user.last_logout = get_current_time()
         db.commit()
+        invalidate_user_cache(current_user.id)
         return {"message": "Successfully logged out"}
     except Exception as e:
         raise HTTPException(
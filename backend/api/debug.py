@@ -1,13 +1,97 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+from fastapi.responses import PlainTextResponse
+from typing import Optional
+from backend.core.tokenizer import get_tokenizer_status
+from backend.core.cache import get_cache_stats
+from backend.core.query_log import get_query_summary, reset_query_log
+from backend.core.loop_monitor import get_loop_summary
+from backend.core.profiler import (
+    ProfilerBusyError, run_cpu_profile, run_memory_diff, render_collapsed, clamp_duration
+)
+from backend.core.jobs import get_job_summary
+from backend.core.config import settings
+from backend.database.database import get_db
+from backend.models.user import User
+from backend.utils.auth import get_current_admin_user
 
 router = APIRouter()
 
 @router.get("/health")
 async def health_check():
     """健康检查"""
-    return {"status": "healthy", "message": "ALLIN Backend is running"}
+    return {
+        "status": "healthy",
+        "message": "ALLIN Backend is running",
+        "tokenizer": get_tokenizer_status()
+    }
 
 @router.post("/debug/echo")
 async def debug_echo(message: str = "Hello World"):
     """测试通信"""
-    return {"echo": message, "timestamp": "2024-01-01T00:00:00Z"} 
\ No newline at end of file
+    return {"echo": message, "timestamp": "2024-01-01T00:00:00Z"}
+
+@router.get("/debug/cache")
+async def cache_stats():
+    """缓存命中率统计"""
+    return {"caches": get_cache_stats()}
+
+@router.get("/debug/queries")
+async def query_stats(limit: int = 20, current_user: User = Depends(get_current_admin_user)):
+    """慢查询、N+1查询和耗时最多的SQL语句（需开启 QUERY_DEBUG）"""
+    return get_query_summary(limit)
+
+@router.delete("/debug/queries")
+async def reset_query_stats(current_user: User = Depends(get_current_admin_user)):
+    """清空SQL统计"""
+    reset_query_log()
+    return {"message": "SQL统计已清空"}
+
+@router.get("/debug/loop")
+async def loop_stats(limit: int = 20, current_user: User = Depends(get_current_admin_user)):
+    """事件循环延迟和最近的阻塞记录（含调用栈和路由）"""
+    return get_loop_summary(limit)
+
+@router.get("/debug/jobs")
+async def job_stats(
+    limit: int = 20,
+    job_status: Optional[str] = Query(None, alias="status"),
+    kind: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """后台任务队列：各类型任务的状态统计和最近的任务（可按状态和类型过滤）"""
+    return get_job_summary(db, limit, job_status, kind)
+
+@router.post("/debug/profile/cpu", response_class=PlainTextResponse)
+async def profile_cpu(
+    seconds: float = 10.0,
+    interval: Optional[float] = None,
+    current_user: User = Depends(get_current_admin_user)
+):
+    """对当前工作进程采样调用栈，返回折叠栈文本（可直接用 flamegraph.pl 或 speedscope 打开）"""
+    interval = max(0.001, interval or settings.PROFILE_DEFAULT_INTERVAL)
+    try:
+        result = await run_cpu_profile(clamp_duration(seconds), interval)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return PlainTextResponse(
+        render_collapsed(result["stacks"]),
+        headers={"X-Profile-Samples": str(result["samples"])}
+    )
+
+@router.post("/debug/profile/memory")
+async def profile_memory(
+    seconds: float = 10.0,
+    limit: int = 20,
+    frames: int = 1,
+    group_by: str = "lineno",
+    current_user: User = Depends(get_current_admin_user)
+):
+    """间隔 seconds 秒拍两次 tracemalloc 快照，返回内存增长最多的分配位置"""
+    if group_by not in ("lineno", "filename", "traceback"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="group_by 只能是 lineno、filename 或 traceback")
+    try:
+        return await run_memory_diff(clamp_duration(seconds), max(1, limit), max(1, frames), group_by)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
@@ -4,15 +4,18 @@ from typing import List, Optional
 import json
 from datetime import datetime
 
-from backend.database.database import get_db
+from backend.database.database import get_db, get_read_db
 from backend.utils.auth import get_current_active_user
 from backend.models.user import User
 from backend.crud.chat import (
     create_chat_history, get_chat_history, get_chat_history_by_url,
-    get_user_chat_histories, update_chat_history, delete_chat_history,
+    get_user_chat_history_rows, update_chat_history, delete_chat_history,
     add_chat_message, get_chat_messages, get_chat_history_count,
-    get_context_aware_messages, update_context_summary
+    get_context_message_ids, get_chat_message_rows, update_context_summary,
+    CHAT_HISTORY_FIELDS
 )
+from backend.core.responses import FastJSONResponse
+from backend.models.chat import ChatHistory
 from backend.crud.model import get_model_config
 from backend.schemas.chat import (
     ChatHistoryCreate, ChatHistoryUpdate, ChatHistoryResponse,
@@ -24,6 +27,28 @@ from backend.schemas.chat import (
 
 router = APIRouter()
 
+def _message_rows(db: Session, chat_history: ChatHistory, use_context: bool) -> List[dict]:
+    """读取聊天消息（字典），只有当启用上下文功能且启用智能选择时才使用上下文感知消息"""
+    context_enabled = chat_history.enable_context
+    smart_selection_enabled = chat_history.context_settings.get('smart_selection', True)
+    
+    if use_context and context_enabled and smart_selection_enabled:
+        message_ids = get_context_message_ids(db, chat_history)
+        if not message_ids:
+            return []
+        return get_chat_message_rows(db, chat_history.id, message_ids)
+    return get_chat_message_rows(db, chat_history.id)
+
+def _chat_detail_response(db: Session, chat_history: ChatHistory, use_context: bool, user_id: int) -> FastJSONResponse:
+    """组装聊天详情（字段与 ChatHistoryDetailResponse 一致），直接用 orjson 序列化"""
+    detail = {field: getattr(chat_history, field) for field in CHAT_HISTORY_FIELDS}
+    detail["messages"] = _message_rows(db, chat_history, use_context)
+    
+    # 获取模型名称
+    model_config = get_model_config(db, chat_history.config_id, user_id)
+    detail["name"] = model_config.name if model_config else None
+    return FastJSONResponse(detail)
+
 @router.post("/", response_model=ChatHistoryResponse)
 async def create_chat(
     chat_data: ChatHistoryCreate,
@@ -47,25 +72,25 @@ async def get_chat_histories(
     skip: int = Query(0, ge=0, description="跳过数量"),
     limit: int = Query(100, ge=1, le=1000, description="限制数量"),
     config_id: Optional[int] = Query(None, description="模型配置ID过滤"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """获取用户的聊天历史列表"""
-    chats = get_user_chat_histories(db, current_user.id, skip, limit, config_id)
+    chats = get_user_chat_history_rows(db, current_user.id, skip, limit, config_id)
     total = get_chat_history_count(db, current_user.id, config_id)
     
-    return ChatHistoryListResponse(
-        chats=chats,
-        total=total,
-        skip=skip,
-        limit=limit
-    )
+    return FastJSONResponse({
+        "chats": chats,
+        "total": total,
+        "skip": skip,
+        "limit": limit
+    })
 
 @router.get("/{chat_id}", response_model=ChatHistoryDetailResponse)
 async def get_chat_detail(
     chat_id: int,
     use_context: bool = Query(True, description="是否使用上下文感知的消息选择"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """获取聊天历史详情"""
@@ -76,31 +101,13 @@ async def get_chat_detail(
             detail="聊天历史不存在"
         )
     
-    # 根据参数选择使用普通消息还是上下文感知消息
-    # 只有当启用上下文功能且启用智能选择时才使用上下文感知消息
-    context_enabled = chat_history.enable_context
-    smart_selection_enabled = chat_history.context_settings.get('smart_selection', True)
-    
-    if use_context and context_enabled and smart_selection_enabled:
-        messages = get_context_aware_messages(db, chat_id, current_user.id)
-    else:
-        messages = get_chat_messages(db, chat_id, current_user.id)
-    
-    # 获取模型名称
-    model_config = get_model_config(db, chat_history.config_id, current_user.id)
-    name = model_config.name if model_config else None
-    
-    return ChatHistoryDetailResponse(
-        **chat_history.__dict__,
-        messages=messages,
-        name=name
-    )
+    return _chat_detail_response(db, chat_history, use_context, current_user.id)
 
 @router.get("/url/{url}", response_model=ChatHistoryDetailResponse)
 async def get_chat_by_url(
     url: str,
     use_context: bool = Query(True, description="是否使用上下文感知的消息选择"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """根据URL获取聊天历史详情"""
@@ -111,25 +118,7 @@ async def get_chat_by_url(
             detail="聊天历史不存在"
         )
     
-    # 根据参数选择使用普通消息还是上下文感知消息
-    # 只有当启用上下文功能且启用智能选择时才使用上下文感知消息
-    context_enabled = chat_history.enable_context
-    smart_selection_enabled = chat_history.context_settings.get('smart_selection', True)
-    
-    if use_context and context_enabled and smart_selection_enabled:
-        messages = get_context_aware_messages(db, chat_history.id, current_user.id)
-    else:
-        messages = get_chat_messages(db, chat_history.id, current_user.id)
-    
-    # 获取模型名称
-    model_config = get_model_config(db, chat_history.config_id, current_user.id)
-    name = model_config.name if model_config else None
-    
-    return ChatHistoryDetailResponse(
-        **chat_history.__dict__,
-        messages=messages,
-        name=name
-    )
+    return _chat_detail_response(db, chat_history, use_context, current_user.id)
 
 @router.put("/{chat_id}", response_model=ChatHistoryResponse)
 async def update_chat(
@@ -185,7 +174,7 @@ async def add_message(
 async def get_messages(
     chat_id: int,
     use_context: bool = Query(True, description="是否使用上下文感知的消息选择"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """获取聊天消息列表"""
@@ -197,20 +186,7 @@ async def get_messages(
             detail="聊天历史不存在"
         )
     
-    # 根据参数选择使用普通消息还是上下文感知消息
-    # 只有当启用上下文功能且启用智能选择时才使用上下文感知消息
-    context_enabled = chat_history.enable_context
-    smart_selection_enabled = chat_history.context_settings.get('smart_selection', True)
-    
-    if use_context and context_enabled and smart_selection_enabled:
-        messages = get_context_aware_messages(db, chat_id, current_user.id)
-    else:
-        messages = get_chat_messages(db, chat_id, current_user.id)
-    
-    if not messages:
-        return []
-    
-    return messages
+    return FastJSONResponse(_message_rows(db, chat_history, use_context))
 
 @router.post("/{chat_id}/context/summary", response_model=ContextSummaryResponse)
 async def generate_context_summary(
@@ -250,7 +226,7 @@ async def generate_context_summary(
 async def export_chat(
     chat_id: int,
     export_request: ChatExportRequest,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """导出聊天历史"""
@@ -0,0 +1,31 @@
+import hmac
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import PlainTextResponse
+from backend.core.config import settings
+from backend.core.metrics import render_metrics
+
+router = APIRouter()
+
+_LOCAL_HOSTS = {"127.0.0.1", "::1", "localhost"}
+
+def verify_metrics_access(request: Request):
+    """配置了 METRICS_TOKEN 时校验令牌，否则只允许本机抓取（指标中包含路由和模型服务主机等内部信息）"""
+    if settings.METRICS_TOKEN:
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), settings.METRICS_TOKEN.encode()):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="指标令牌无效",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        return
+    if request.client is None or request.client.host not in _LOCAL_HOSTS:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="只允许本机访问指标，远程抓取请设置 METRICS_TOKEN"
+        )
+
+@router.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(verify_metrics_access)])
+def prometheus_metrics():
+    """Prometheus 指标（多进程部署时汇总所有工作进程）"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
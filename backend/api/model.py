@@ -1,11 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import httpx
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
 
-from backend.database.database import get_db
+from backend.database.database import get_db, get_read_db
 from backend.utils.auth import get_current_active_user
 from backend.models.user import User
 from backend.crud.model import (
@@ -14,7 +14,15 @@ from backend.crud.model import (
 )
 from backend.schemas.model import (
     ModelConfigCreate, ModelConfigUpdate, ModelConfigResponse,
-    ModelListResponse, ModelConnectionTestRequest, ModelConnectionTestResponse
+    ModelListResponse, ModelConnectionTestRequest, ModelConnectionTestResponse,
+    ModelHealthResponse, ModelUsageStatsResponse
+)
+from backend.crud.usage import get_usage_rollups, summarize_usage
+from backend.crud.chat import enqueue_context_cascade
+from backend.models.chat import get_current_time, shanghai_tz
+from backend.core.model_health import (
+    probe_model_configs, get_health_instances, save_health_results,
+    is_health_stale, build_health_entry
 )
 
 router = APIRouter()
@@ -43,7 +51,7 @@ async def list_models(
     skip: int = 0,
     limit: int = 100,
     active_only: bool = False,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     
@@ -58,11 +66,47 @@ async def list_models(
         active_count=active_count
     )
 
+# 模型健康状态
+@router.get("/health", response_model=ModelHealthResponse)
+async def get_models_health(
+    force: bool = False,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """获取用户所有激活模型的健康状态（过期的并发探测，其余返回缓存）"""
+    models = get_model_configs(db, current_user.id, limit=1000, active_only=True)
+    configs = [
+        {"id": m.id, "name": m.name, "base_url": m.base_url, "api_key": m.api_key}
+        for m in models
+    ]
+    
+    instances = get_health_instances(db, [config["id"] for config in configs])
+    stale = [
+        config for config in configs
+        if force or is_health_stale(instances.get(config["id"]))
+    ]
+    
+    results = await probe_model_configs(stale)
+    if results:
+        save_health_results(db, results)
+        instances = get_health_instances(db, [config["id"] for config in configs])
+    
+    entries = [
+        build_health_entry(config, instances.get(config["id"]), cached=config["id"] not in results)
+        for config in configs
+    ]
+    
+    return ModelHealthResponse(
+        models=entries,
+        healthy_count=len([e for e in entries if e["status"] == "running"]),
+        probed_count=len(results)
+    )
+
 # 获取特定模型
 @router.get("/{model_id}", response_model=ModelConfigResponse)
 async def get_model(
     model_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     
@@ -74,6 +118,44 @@ async def get_model(
         )
     return model_config
 
+# 模型用量统计
+@router.get("/{model_id}/stats", response_model=ModelUsageStatsResponse)
+async def get_model_stats(
+    model_id: int,
+    hours: int = Query(168, ge=1, le=24 * 366, description="统计最近多少小时"),
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """获取模型的用量和延迟统计（只读取小时汇总表）"""
+    model_config = get_model_config(db, model_id, current_user.id)
+    if not model_config:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="模型配置不存在"
+        )
+    
+    until = get_current_time()
+    since = until - timedelta(hours=hours)
+    rollups = get_usage_rollups(db, current_user.id, model_id, since, until)
+    
+    return ModelUsageStatsResponse(
+        config_id=model_id,
+        since=since,
+        until=until,
+        buckets=[
+            {
+                # SQLite 读回的时间不带时区，按写入时使用的上海时区处理
+                "bucket_start": row.bucket_start if row.bucket_start.tzinfo else shanghai_tz.localize(row.bucket_start),
+                "requests": row.request_count,
+                "prompt_tokens": row.prompt_tokens,
+                "completion_tokens": row.completion_tokens,
+                "avg_latency": row.latency_sum / row.latency_count if row.latency_count else None,
+            }
+            for row in rollups
+        ],
+        **summarize_usage(rollups)
+    )
+
 # 更新模型设置
 @router.put("/{model_id}/settings", response_model=ModelConfigResponse)
 async def update_model_settings(
@@ -90,6 +172,8 @@ async def update_model_settings(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="模型配置不存在"
         )
+    # 更新会修改同一个会话中的对象，需要先记录旧值
+    old_enable_context = old_model_config.enable_context
     
     # 更新模型配置
     model_config = update_model_config(db, model_id, model_settings, current_user.id)
@@ -99,18 +183,9 @@ async def update_model_settings(
             detail="模型配置不存在"
         )
     
-    # 如果上下文功能状态发生了变化，更新相关聊天历史的上下文设置
-    if old_model_config.enable_context != model_config.enable_context:
-        from backend.crud.chat import get_user_chat_histories, update_chat_history
-        from backend.schemas.chat import ChatHistoryUpdate
-        
-        # 获取使用该模型的所有聊天历史
-        chat_histories = get_user_chat_histories(db, current_user.id, config_id=model_id)
-        
-        for chat in chat_histories:
-            # 更新聊天历史的enable_context字段
-            chat_update = ChatHistoryUpdate(enable_context=model_config.enable_context)
-            update_chat_history(db, chat.id, chat_update, current_user.id)
+    # 如果上下文功能状态发生了变化，由后台任务批量更新使用该模型的所有聊天历史
+    if old_enable_context != model_config.enable_context:
+        enqueue_context_cascade(db, current_user.id, model_id)
     
     return model_config
 
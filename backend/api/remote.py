@@ -5,31 +5,41 @@ import httpx
 import time
 from datetime import datetime
 from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 import json
+from contextlib import asynccontextmanager
 
 from backend.database.database import get_db
-from backend.utils.auth import get_current_active_user
+from backend.utils.auth import get_current_active_user, get_current_admin_user
 from backend.models.user import User
+from backend.models.model import ModelConfig
 from backend.crud.model import get_model_config, get_model_configs
 from backend.schemas.remote import (
-    RemoteChatRequest, RemoteChatResponse, RemoteChatStreamResponse
+    RemoteChatRequest, RemoteChatResponse, RemoteChatStreamResponse, CircuitBreakerStatus,
+    RemotePrewarmRequest, RemotePrewarmResponse
 )
-from backend.crud.chat import create_chat_history, add_chat_message, get_chat_history_by_url, get_chat_history, get_user_latest_chat_history
+from backend.core.circuit_breaker import circuit_breakers, is_upstream_failure, CircuitBreakerCall, OPEN
+from backend.core.http_client import get_upstream_client, mark_upstream_active, prewarm_upstream
+from backend.core.token_counter import normalize_usage, tokens_per_second
+from backend.core.metrics import upstream_ttft, upstream_duration, upstream_label
+from backend.core.tracing import span, record_span
+from backend.core.config import settings
+from backend.crud.chat import (
+    create_chat_history, get_chat_history_by_url, get_chat_history,
+    get_user_latest_chat_history, get_context_aware_messages
+)
+from backend.core.message_writer import enqueue_message, save_message
 from backend.models.chat import get_current_time
-from backend.schemas.chat import ChatHistoryCreate, ChatMessageCreate
+from backend.schemas.chat import ChatHistoryCreate, ChatMessageCreate, ChatMessageRecord
 
 router = APIRouter()
 
-@router.post("/chat", response_model=RemoteChatResponse)
-async def simple_remote_chat(
-    chat_request: RemoteChatRequest,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
-):
-    """简化版远程聊天 - 通过配置的模型发送聊天消息"""
-    
-    # 获取模型配置
-    model_config = get_model_config(db, chat_request.config_id, current_user.id)
+CIRCUIT_OPEN_ERROR = "模型服务暂时不可用（已熔断），请稍后重试"
+
+
+def _get_active_model_config(db: Session, config_id: int, user_id: int):
+    """获取已激活的模型配置"""
+    model_config = get_model_config(db, config_id, user_id)
     if not model_config:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -41,19 +51,128 @@ async def simple_remote_chat(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="模型配置未激活"
         )
+    return model_config
+
+
+def _acquire_model_config(db: Session, chat_request: RemoteChatRequest, user_id: int):
+    """选择本次请求使用的模型配置
     
-    # 处理聊天历史保存
-    chat_history_id = None
-    if chat_request.chat_url:
-        # 如果提供了聊天URL，查找现有聊天历史
-        chat_history = get_chat_history_by_url(db, chat_request.chat_url, current_user.id)
-        if chat_history:
-            chat_history_id = chat_history.id
+    主配置的服务已熔断时切换到备用配置；返回 (模型配置, 熔断器调用)，
+    没有可用的服务时熔断器调用为 None，调用方应直接失败而不是等待超时。
+    返回的熔断器调用必须在 finally 中 release()，否则半开状态的探测名额不会释放。
+    """
+    model_config = _get_active_model_config(db, chat_request.config_id, user_id)
+    breaker = circuit_breakers.get(model_config.base_url)
+    if breaker.allow_request():
+        return model_config, CircuitBreakerCall(breaker)
+    
+    fallback_id = chat_request.fallback_config_id
+    if fallback_id and fallback_id != chat_request.config_id:
+        fallback_config = _get_active_model_config(db, fallback_id, user_id)
+        fallback_breaker = circuit_breakers.get(fallback_config.base_url)
+        if fallback_breaker.allow_request():
+            return fallback_config, CircuitBreakerCall(fallback_breaker)
+    
+    return model_config, None
+
+
+def _retry_after(base_url: str) -> int:
+    """熔断剩余时间（秒），用于 Retry-After 响应头"""
+    retry_after = circuit_breakers.get(base_url).snapshot()["retry_after"]
+    return max(1, int(retry_after or 0) + 1)
+
+
+# 不支持 stream_options 参数的上游地址（请求时带该参数会返回400）
+_stream_usage_unsupported = set()
+
+
+@asynccontextmanager
+async def _open_chat_stream(client: httpx.AsyncClient, base_url: str, headers: dict, data: dict, timeout: float):
+    """发起流式聊天请求，并要求上游在最后一个数据块中返回usage
+    
+    上游拒绝 stream_options 参数时去掉该参数重试一次，并记住该地址不再发送。
+    """
+    url = f"{base_url}/v1/chat/completions"
+    request_usage = settings.STREAM_INCLUDE_USAGE and base_url not in _stream_usage_unsupported
+    payload = {**data, "stream_options": {"include_usage": True}} if request_usage else data
+    
+    response = await client.send(client.build_request("POST", url, headers=headers, json=payload, timeout=timeout), stream=True)
+    if request_usage and response.status_code in (400, 422):
+        await response.aclose()
+        response = await client.send(client.build_request("POST", url, headers=headers, json=data, timeout=timeout), stream=True)
+        if response.status_code == 200:
+            _stream_usage_unsupported.add(base_url)
+    try:
+        yield response
+    finally:
+        await response.aclose()
+
+
+def _record_response(breaker, status_code: int):
+    """根据上游状态码更新熔断器（其他4xx属于请求本身的问题，不计入）"""
+    if status_code < 400:
+        breaker.record_success()
+    elif is_upstream_failure(status_code):
+        breaker.record_failure(f"HTTP {status_code}")
+    else:
+        breaker.release()
+
+
+@router.post("/chat", response_model=RemoteChatResponse)
+async def simple_remote_chat(
+    chat_request: RemoteChatRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """简化版远程聊天 - 通过配置的模型发送聊天消息"""
+    
+    # 获取模型配置（主模型服务熔断时使用备用配置）
+    model_config, breaker = _acquire_model_config(db, chat_request, current_user.id)
+    if breaker is None:
+        return RemoteChatResponse(
+            success=False,
+            message="聊天失败",
+            error=CIRCUIT_OPEN_ERROR,
+            config_id=model_config.id
+        )
+    
+    # 上游调用之前出错（例如创建聊天历史失败）时没有记录结果，在 finally 中释放
+    try:
+        # 处理聊天历史保存
+        chat_history_id = None
+        if chat_request.chat_url:
+            # 如果提供了聊天URL，查找现有聊天历史
+            chat_history = get_chat_history_by_url(db, chat_request.chat_url, current_user.id)
+            if chat_history:
+                chat_history_id = chat_history.id
+            else:
+                # 如果URL不存在，创建新的聊天历史，使用用户的第一条消息作为标题
+                # 限制标题长度，避免过长
+                title = chat_request.message[:50] + "..." if len(chat_request.message) > 50 else chat_request.message
+            
+                # 从上下文设置中获取enable_context状态
+                context_enabled = True  # 默认启用
+                if chat_request.context_settings:
+                    # 如果上下文设置中有enable_context字段，使用它
+                    if 'enable_context' in chat_request.context_settings:
+                        context_enabled = chat_request.context_settings['enable_context']
+                    # 或者根据其他上下文功能的状态来判断
+                    elif not (chat_request.context_settings.get('enable_summary', True) or 
+                             chat_request.context_settings.get('smart_selection', True)):
+                        context_enabled = False
+            
+                chat_data = ChatHistoryCreate(
+                    title=title,
+                    config_id=chat_request.config_id,
+                    enable_context=context_enabled,
+                    context_settings=chat_request.context_settings or {}
+                )
+                chat_history = create_chat_history(db, chat_data, current_user.id)
+                chat_history_id = chat_history.id
         else:
-            # 如果URL不存在，创建新的聊天历史，使用用户的第一条消息作为标题
-            # 限制标题长度，避免过长
+            # 如果没有提供chat_url，总是创建新的聊天历史
             title = chat_request.message[:50] + "..." if len(chat_request.message) > 50 else chat_request.message
-            
+        
             # 从上下文设置中获取enable_context状态
             context_enabled = True  # 默认启用
             if chat_request.context_settings:
@@ -64,7 +183,7 @@ async def simple_remote_chat(
                 elif not (chat_request.context_settings.get('enable_summary', True) or 
                          chat_request.context_settings.get('smart_selection', True)):
                     context_enabled = False
-            
+        
             chat_data = ChatHistoryCreate(
                 title=title,
                 config_id=chat_request.config_id,
@@ -73,83 +192,70 @@ async def simple_remote_chat(
             )
             chat_history = create_chat_history(db, chat_data, current_user.id)
             chat_history_id = chat_history.id
-    else:
-        # 如果没有提供chat_url，总是创建新的聊天历史
-        title = chat_request.message[:50] + "..." if len(chat_request.message) > 50 else chat_request.message
-        
-        # 从上下文设置中获取enable_context状态
-        context_enabled = True  # 默认启用
-        if chat_request.context_settings:
-            # 如果上下文设置中有enable_context字段，使用它
-            if 'enable_context' in chat_request.context_settings:
-                context_enabled = chat_request.context_settings['enable_context']
-            # 或者根据其他上下文功能的状态来判断
-            elif not (chat_request.context_settings.get('enable_summary', True) or 
-                     chat_request.context_settings.get('smart_selection', True)):
-                context_enabled = False
-        
-        chat_data = ChatHistoryCreate(
-            title=title,
-            config_id=chat_request.config_id,
-            enable_context=context_enabled,
-            context_settings=chat_request.context_settings or {}
-        )
-        chat_history = create_chat_history(db, chat_data, current_user.id)
-        chat_history_id = chat_history.id
     
-    try:
-        headers = {
-            "Authorization": f"Bearer {model_config.api_key}",
-            "Content-Type": "application/json"
-        }
+        try:
+            headers = {
+                "Authorization": f"Bearer {model_config.api_key}",
+                "Content-Type": "application/json"
+            }
         
-        # 构建消息历史
-        messages = []
-        if chat_request.conversation_history:
-            messages.extend(chat_request.conversation_history)
+            # 构建消息历史
+            messages = []
+            if chat_request.conversation_history:
+                messages.extend(chat_request.conversation_history)
         
-        # 添加当前用户消息
-        messages.append({"role": "user", "content": chat_request.message})
+            # 添加当前用户消息
+            messages.append({"role": "user", "content": chat_request.message})
         
-        # 根据模型配置和请求参数决定是否使用流式传输
-        use_streaming = chat_request.stream if chat_request.stream is not None else model_config.enable_streaming
+            # 根据模型配置和请求参数决定是否使用流式传输
+            use_streaming = chat_request.stream if chat_request.stream is not None else model_config.enable_streaming
         
-        data = {
-            "model": model_config.model_name,
-            "messages": messages,
-            "max_tokens": chat_request.max_tokens or 10000,
-            "temperature": chat_request.temperature or model_config.temperature,
-            "stream": use_streaming
-        }
+            data = {
+                "model": model_config.model_name,
+                "messages": messages,
+                "max_tokens": chat_request.max_tokens or 10000,
+                "temperature": chat_request.temperature or model_config.temperature,
+                "stream": use_streaming
+            }
         
-        # 添加可选的参数，使用模型配置的默认值作为后备
-        if chat_request.top_p is not None:
-            data["top_p"] = chat_request.top_p
-        elif model_config.top_p is not None:
-            data["top_p"] = model_config.top_p
+            # 添加可选的参数，使用模型配置的默认值作为后备
+            if chat_request.top_p is not None:
+                data["top_p"] = chat_request.top_p
+            elif model_config.top_p is not None:
+                data["top_p"] = model_config.top_p
             
-        if chat_request.frequency_penalty is not None:
-            data["frequency_penalty"] = chat_request.frequency_penalty
-        elif model_config.frequency_penalty is not None:
-            data["frequency_penalty"] = model_config.frequency_penalty
+            if chat_request.frequency_penalty is not None:
+                data["frequency_penalty"] = chat_request.frequency_penalty
+            elif model_config.frequency_penalty is not None:
+                data["frequency_penalty"] = model_config.frequency_penalty
             
-        if chat_request.presence_penalty is not None:
-            data["presence_penalty"] = chat_request.presence_penalty
-        elif model_config.presence_penalty is not None:
-            data["presence_penalty"] = model_config.presence_penalty
+            if chat_request.presence_penalty is not None:
+                data["presence_penalty"] = chat_request.presence_penalty
+            elif model_config.presence_penalty is not None:
+                data["presence_penalty"] = model_config.presence_penalty
         
-        url = f"{model_config.base_url}/v1/chat/completions"
+            url = f"{model_config.base_url}/v1/chat/completions"
         
-        start_time = time.time()
+            start_time = time.time()
         
-        async with httpx.AsyncClient(timeout=chat_request.timeout or 30.0) as client:
-            response = await client.post(url, headers=headers, json=data)
+            client = get_upstream_client()
+            request_timeout = chat_request.timeout or 30.0
+            try:
+                with span("upstream.request"):
+                    response = await client.post(url, headers=headers, json=data, timeout=request_timeout)
+            except httpx.HTTPError as e:
+                breaker.record_failure(f"{type(e).__name__}: {e}")
+                raise
             
             response_time = time.time() - start_time
+            _record_response(breaker, response.status_code)
+            mark_upstream_active(model_config.base_url)
+            upstream_duration.observe(upstream_label(model_config.base_url), "chat", value=response_time)
             
             if response.status_code == 200:
                 result = response.json()
                 content = result["choices"][0]["message"]["content"]
+                usage = normalize_usage(result.get("usage"), messages, content)
                 
                 # 保存聊天消息到数据库
                 if chat_history_id:
@@ -158,25 +264,31 @@ async def simple_remote_chat(
                         role="user",
                         content=chat_request.message,
                         message_metadata={
-                            "config_id": chat_request.config_id,
+                            "config_id": model_config.id,
                             "max_tokens": chat_request.max_tokens,
                             "temperature": chat_request.temperature
                         }
                     )
-                    add_chat_message(db, chat_history_id, user_message, current_user.id)
+                    # 用户消息不需要等待，与助手回复在同一批写入
+                    enqueue_message(chat_history_id, user_message, current_user.id)
                     
                     # 保存模型回复
-                    assistant_message = ChatMessageCreate(
+                    assistant_message = ChatMessageRecord(
                         role="assistant",
                         content=content,
                         message_metadata={
                             "name": model_config.model_name,
+                            "config_id": model_config.id,
                             "response_time": response_time,
                             "usage": result.get("usage", {}),
                             "finish_reason": result["choices"][0].get("finish_reason", "stop")
-                        }
+                        },
+                        prompt_tokens=usage["prompt_tokens"],
+                        completion_tokens=usage["completion_tokens"],
+                        usage_estimated=usage["estimated"],
+                        tokens_per_second=tokens_per_second(usage["completion_tokens"], response_time)
                     )
-                    add_chat_message(db, chat_history_id, assistant_message, current_user.id)
+                    await save_message(chat_history_id, assistant_message, current_user.id)
                 
                 # 获取聊天历史URL
                 chat_url = None
@@ -191,24 +303,29 @@ async def simple_remote_chat(
                     response=content,
                     name=model_config.model_name,
                     response_time=response_time,
-                    usage=result.get("usage", {}),
+                    usage=usage,
                     finish_reason=result["choices"][0].get("finish_reason", "stop"),
-                    chat_url=chat_url
+                    chat_url=chat_url,
+                    config_id=model_config.id
                 )
             else:
                 return RemoteChatResponse(
                     success=False,
                     message="聊天失败",
                     error=f"HTTP {response.status_code}: {response.text}",
-                    response_time=response_time
+                    response_time=response_time,
+                    config_id=model_config.id
                 )
                 
-    except Exception as e:
-        return RemoteChatResponse(
-            success=False,
-            message="聊天失败",
-            error=f"请求异常: {str(e)}"
-        )
+        except Exception as e:
+            return RemoteChatResponse(
+                success=False,
+                message="聊天失败",
+                error=f"请求异常: {str(e)}",
+                config_id=model_config.id
+            )
+    finally:
+        breaker.release()
 
 @router.post("/chat/stream")
 async def stream_remote_chat(
@@ -218,29 +335,36 @@ async def stream_remote_chat(
 ):
     """流式远程聊天 - 通过配置的模型发送聊天消息并返回流式响应"""
     
-    # 获取模型配置
-    model_config = get_model_config(db, chat_request.config_id, current_user.id)
-    if not model_config:
+    # 获取模型配置（主模型服务熔断时使用备用配置）
+    model_config, breaker = _acquire_model_config(db, chat_request, current_user.id)
+    if breaker is None:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="模型配置不存在"
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=CIRCUIT_OPEN_ERROR,
+            headers={"Retry-After": str(_retry_after(model_config.base_url))}
         )
     
-    if not model_config.is_active:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="模型配置未激活"
-        )
-    
-    # 处理聊天历史保存
-    chat_history_id = None
-    if chat_request.chat_url:
-        # 如果提供了聊天URL，查找现有聊天历史
-        chat_history = get_chat_history_by_url(db, chat_request.chat_url, current_user.id)
-        if chat_history:
-            chat_history_id = chat_history.id
+    # 流式响应开始之前出错时没有记录结果，释放后再抛出
+    try:
+        # 处理聊天历史保存
+        chat_history_id = None
+        if chat_request.chat_url:
+            # 如果提供了聊天URL，查找现有聊天历史
+            chat_history = get_chat_history_by_url(db, chat_request.chat_url, current_user.id)
+            if chat_history:
+                chat_history_id = chat_history.id
+            else:
+                # 如果URL不存在，创建新的聊天历史
+                title = chat_request.message[:50] + "..." if len(chat_request.message) > 50 else chat_request.message
+                chat_data = ChatHistoryCreate(
+                    title=title,
+                    config_id=chat_request.config_id,
+                    context_settings=chat_request.context_settings or {}
+                )
+                chat_history = create_chat_history(db, chat_data, current_user.id)
+                chat_history_id = chat_history.id
         else:
-            # 如果URL不存在，创建新的聊天历史
+            # 如果没有提供chat_url，总是创建新的聊天历史
             title = chat_request.message[:50] + "..." if len(chat_request.message) > 50 else chat_request.message
             chat_data = ChatHistoryCreate(
                 title=title,
@@ -249,28 +373,21 @@ async def stream_remote_chat(
             )
             chat_history = create_chat_history(db, chat_data, current_user.id)
             chat_history_id = chat_history.id
-    else:
-        # 如果没有提供chat_url，总是创建新的聊天历史
-        title = chat_request.message[:50] + "..." if len(chat_request.message) > 50 else chat_request.message
-        chat_data = ChatHistoryCreate(
-            title=title,
-            config_id=chat_request.config_id,
-            context_settings=chat_request.context_settings or {}
-        )
-        chat_history = create_chat_history(db, chat_data, current_user.id)
-        chat_history_id = chat_history.id
     
-    # 先保存用户消息
-    user_message_data = ChatMessageCreate(
-        role="user",
-        content=chat_request.message,
-        message_metadata={
-            "config_id": chat_request.config_id,
-            "temperature": chat_request.temperature,
-            "max_tokens": chat_request.max_tokens
-        }
-    )
-    user_message = add_chat_message(db, chat_history_id, user_message_data, current_user.id)
+        # 先保存用户消息
+        user_message_data = ChatMessageCreate(
+            role="user",
+            content=chat_request.message,
+            message_metadata={
+                "config_id": model_config.id,
+                "temperature": chat_request.temperature,
+                "max_tokens": chat_request.max_tokens
+            }
+        )
+        enqueue_message(chat_history_id, user_message_data, current_user.id)
+    except BaseException:
+        breaker.release()
+        raise
     
     # 记录开始时间用于计算响应时间
     start_time = time.time()
@@ -280,8 +397,10 @@ async def stream_remote_chat(
     model_name = model_config.model_name
     base_url = model_config.base_url
     temperature = model_config.temperature
+    config_id = model_config.id
     
     async def generate_stream():
+        # 熔断器结果只记录一次；客户端中途断开等未记录的情况在 finally 中释放
         try:
             headers = {
                 "Authorization": f"Bearer {api_key}",
@@ -320,68 +439,102 @@ async def stream_remote_chat(
             elif model_config.presence_penalty is not None:
                 data["presence_penalty"] = model_config.presence_penalty
             
-            url = f"{base_url}/v1/chat/completions"
-            
             full_content = ""
+            usage = None
+            first_token_at = None
             
-            async with httpx.AsyncClient(timeout=chat_request.timeout or 30.0) as client:
-                async with client.stream("POST", url, headers=headers, json=data) as response:
-                    if response.status_code == 200:
-                        async for line in response.aiter_lines():
-                            if line.startswith("data: "):
-                                data_line = line[6:]  # 移除 "data: " 前缀
-                                if data_line.strip() == "[DONE]":
-                                    # 流式传输结束，保存助手消息到数据库
-                                    if full_content:
-                                        try:
-                                            assistant_message_data = ChatMessageCreate(
-                                                role="assistant",
-                                                content=full_content,
-                                                message_metadata={
-                                                    "model": model_name,
-                                                    "config_id": chat_request.config_id,
-                                                    "temperature": chat_request.temperature,
-                                                    "max_tokens": chat_request.max_tokens,
-                                                    "streaming": True,
-                                                    "response_time": time.time() - start_time
-                                                }
-                                            )
-                                            # 使用新的数据库会话保存消息
-                                            from backend.database.database import SessionLocal
-                                            new_db = SessionLocal()
-                                            try:
-                                                add_chat_message(new_db, chat_history_id, assistant_message_data, current_user.id)
-                                                print(f"助手消息保存成功，聊天ID: {chat_history_id}")
-                                            finally:
-                                                new_db.close()
-                                        except Exception as e:
-                                            print(f"保存助手消息失败: {e}")
+            client = get_upstream_client()
+            request_timeout = chat_request.timeout or 30.0
+            upstream_started = time.time()
+            async with _open_chat_stream(client, base_url, headers, data, request_timeout) as response:
+                mark_upstream_active(base_url)
+                
+                if response.status_code == 200:
+                    async for line in response.aiter_lines():
+                        if line.startswith("data: "):
+                            data_line = line[6:]  # 移除 "data: " 前缀
+                            if data_line.strip() == "[DONE]":
+                                breaker.record_success()
                                     
-                                    # 发送结束信号
-                                    yield f"data: {json.dumps({'type': 'done', 'success': True, 'chat_id': chat_history_id})}\n\n"
-                                    break
-                                else:
+                                # 流式传输结束，保存助手消息到数据库
+                                finished_at = time.time()
+                                upstream_duration.observe(upstream_label(base_url), "stream", value=finished_at - upstream_started)
+                                record_span("upstream.stream", finished_at - upstream_started)
+                                usage = normalize_usage(usage, messages, full_content)
+                                if full_content:
                                     try:
-                                        chunk_data = json.loads(data_line)
-                                        if "choices" in chunk_data and len(chunk_data["choices"]) > 0:
-                                            choice = chunk_data["choices"][0]
-                                            if "delta" in choice and "content" in choice["delta"]:
-                                                content_chunk = choice["delta"]["content"]
-                                                full_content += content_chunk
+                                        assistant_message_data = ChatMessageRecord(
+                                            role="assistant",
+                                            content=full_content,
+                                            message_metadata={
+                                                "model": model_name,
+                                                "config_id": config_id,
+                                                "temperature": chat_request.temperature,
+                                                "max_tokens": chat_request.max_tokens,
+                                                "streaming": True,
+                                                "response_time": finished_at - start_time
+                                            },
+                                            prompt_tokens=usage["prompt_tokens"],
+                                            completion_tokens=usage["completion_tokens"],
+                                            usage_estimated=usage["estimated"],
+                                            ttft=first_token_at - upstream_started if first_token_at else None,
+                                            tokens_per_second=tokens_per_second(
+                                                usage["completion_tokens"],
+                                                finished_at - first_token_at if first_token_at else None
+                                            )
+                                        )
+                                        # 等待批量写入完成后再发送结束信号，客户端随后读取历史时能看到这条消息
+                                        await save_message(chat_history_id, assistant_message_data, current_user.id)
+                                        print(f"助手消息保存成功，聊天ID: {chat_history_id}")
+                                    except Exception as e:
+                                        print(f"保存助手消息失败: {e}")
+                                    
+                                # 发送结束信号
+                                yield f"data: {json.dumps({'type': 'done', 'success': True, 'chat_id': chat_history_id, 'usage': usage})}\n\n"
+                                break
+                            else:
+                                try:
+                                    chunk_data = json.loads(data_line)
+                                    # 开启 include_usage 后，最后一个数据块的 choices 为空，只包含usage
+                                    if chunk_data.get("usage"):
+                                        usage = chunk_data["usage"]
+                                    if "choices" in chunk_data and len(chunk_data["choices"]) > 0:
+                                        choice = chunk_data["choices"][0]
+                                        if "delta" in choice and choice["delta"].get("content"):
+                                            content_chunk = choice["delta"]["content"]
+                                            full_content += content_chunk
+                                            if first_token_at is None:
+                                                first_token_at = time.time()
+                                                upstream_ttft.observe(upstream_label(base_url), value=first_token_at - upstream_started)
                                                 
-                                                # 发送内容块
-                                                yield f"data: {json.dumps({'type': 'content', 'content': content_chunk})}\n\n"
-                                    except json.JSONDecodeError:
-                                        continue
-                    else:
-                        # 发送错误信息
-                        error_response = {
-                            "type": "error",
-                            "success": False,
-                            "error": f"HTTP {response.status_code}: {response.text}"
-                        }
-                        yield f"data: {json.dumps(error_response)}\n\n"
+                                            # 发送内容块
+                                            yield f"data: {json.dumps({'type': 'content', 'content': content_chunk})}\n\n"
+                                except json.JSONDecodeError:
+                                    continue
+                else:
+                    await response.aread()
+                    _record_response(breaker, response.status_code)
                         
+                    # 发送错误信息
+                    error_response = {
+                        "type": "error",
+                        "success": False,
+                        "error": f"HTTP {response.status_code}: {response.text}"
+                    }
+                    yield f"data: {json.dumps(error_response)}\n\n"
+            
+            # 上游没有发送 [DONE] 但正常结束（已经记录过结果时不会重复记录）
+            breaker.record_success()
+                        
+        except httpx.HTTPError as e:
+            # 连接失败、超时或传输中断都计入熔断统计
+            breaker.record_failure(f"{type(e).__name__}: {e}")
+            error_response = {
+                "type": "error",
+                "success": False,
+                "error": f"请求异常: {str(e)}"
+            }
+            yield f"data: {json.dumps(error_response)}\n\n"
         except Exception as e:
             # 发送异常信息
             error_response = {
@@ -390,9 +543,13 @@ async def stream_remote_chat(
                 "error": f"请求异常: {str(e)}"
             }
             yield f"data: {json.dumps(error_response)}\n\n"
+        finally:
+            breaker.release()
     
+    # 客户端在第一个数据块之前断开时生成器不会执行，由后台任务释放
     return StreamingResponse(
         generate_stream(),
+        background=BackgroundTask(breaker.release),
         media_type="text/plain",
         headers={
             "Cache-Control": "no-cache",
@@ -401,18 +558,49 @@ async def stream_remote_chat(
         }
     )
 
+@router.post("/prewarm", response_model=RemotePrewarmResponse)
+async def prewarm_remote_chat(
+    prewarm_request: RemotePrewarmRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """用户开始输入时预热：建立到模型服务的连接，并加载模型配置和上下文缓存"""
+    model_config = get_model_config(db, prewarm_request.config_id, current_user.id)
+    if not model_config:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="模型配置不存在"
+        )
+    
+    # 预先计算上下文选择结果，发送时直接命中缓存
+    context_messages = None
+    if prewarm_request.chat_url:
+        chat_history = get_chat_history_by_url(db, prewarm_request.chat_url, current_user.id)
+        if chat_history and chat_history.enable_context:
+            context_messages = len(get_context_aware_messages(db, chat_history.id, current_user.id))
+    
+    base_url = model_config.base_url
+    if not model_config.is_active or circuit_breakers.get(base_url).state == OPEN:
+        return RemotePrewarmResponse(success=False, connection="skipped", context_messages=context_messages)
+    
+    result = await prewarm_upstream(base_url, model_config.api_key)
+    return RemotePrewarmResponse(
+        success=result["connection"] != "failed",
+        context_messages=context_messages,
+        **result
+    )
+
 @router.post("/chat/stream/save")
 async def save_stream_message(
     chat_id: int,
     message_data: ChatMessageCreate,
-    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """保存流式传输完成后的消息"""
     try:
-        message = add_chat_message(db, chat_id, message_data, current_user.id)
-        if message:
-            return {"success": True, "message_id": message.id}
+        message_id = await save_message(chat_id, message_data, current_user.id)
+        if message_id:
+            return {"success": True, "message_id": message_id}
         else:
             return {"success": False, "error": "保存消息失败"}
     except Exception as e:
@@ -425,4 +613,39 @@ async def health_check():
         "status": "healthy",
         "service": "remote",
         "timestamp": datetime.utcnow().isoformat()
-    } 
\ No newline at end of file
+    }
+
+
+@router.get("/circuit-breakers", response_model=List[CircuitBreakerStatus])
+async def list_circuit_breakers(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """查看当前用户模型服务的熔断器状态（当前工作进程）"""
+    configs = get_model_configs(db, current_user.id, limit=1000)
+    return [
+        CircuitBreakerStatus(
+            config_id=config.id,
+            name=config.name,
+            **circuit_breakers.get(config.base_url).snapshot()
+        )
+        for config in configs
+    ]
+
+@router.post("/circuit-breakers/{config_id}/reset", response_model=CircuitBreakerStatus)
+async def reset_circuit_breaker(
+    config_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """手动恢复模型服务的熔断器（仅管理员：熔断器按 base_url 全局共享，恢复会影响所有使用该服务的用户）"""
+    model_config = db.query(ModelConfig).filter(ModelConfig.id == config_id).first()
+    if not model_config:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="模型配置不存在"
+        )
+    
+    breaker = circuit_breakers.get(model_config.base_url)
+    breaker.reset()
+    return CircuitBreakerStatus(config_id=model_config.id, name=model_config.name, **breaker.snapshot())
@@ -3,8 +3,8 @@ from sqlalchemy.orm import Session
 from backend.database.database import get_db
 from backend.models.user import User
 from backend.schemas.user import UserUpdate, PasswordChange, ThemePreference, User as UserSchema
-from backend.utils.auth import verify_password, get_password_hash, get_current_active_user
-from backend.crud.user import get_user_by_username, get_user_by_email, get_user
+from backend.utils.auth import verify_password_async, get_password_hash_async, get_current_active_user, invalidate_user_cache
+from backend.crud.user import get_user_by_username, get_user_by_email, get_user, enqueue_avatar_cleanup, AVATAR_DIR
 from typing import Optional
 import os
 import uuid
@@ -61,6 +61,7 @@ async def update_user_profile(
             current_user.theme_preference = user_update.theme_preference
         
         current_user.updated_at = datetime.utcnow()
+        invalidate_user_cache(current_user.id, db)
         db.commit()
         db.refresh(current_user)
         
@@ -82,7 +83,7 @@ async def change_password(
     """修改用户密码"""
     try:
         # 验证当前密码
-        if not verify_password(password_change.current_password, current_user.hashed_password):
+        if not await verify_password_async(password_change.current_password, current_user.hashed_password):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Current password is incorrect"
@@ -103,8 +104,9 @@ async def change_password(
             )
         
         # 更新密码
-        current_user.hashed_password = get_password_hash(password_change.new_password)
+        current_user.hashed_password = await get_password_hash_async(password_change.new_password)
         current_user.updated_at = datetime.utcnow()
+        invalidate_user_cache(current_user.id, db)
         db.commit()
         
         return {"message": "Password changed successfully"}
@@ -139,7 +141,7 @@ async def upload_avatar(
             )
         
         # 创建上传目录
-        upload_dir = "uploads/avatars"
+        upload_dir = AVATAR_DIR
         os.makedirs(upload_dir, exist_ok=True)
         
         # 生成唯一文件名
@@ -152,10 +154,13 @@ async def upload_avatar(
             content = await file.read()
             buffer.write(content)
         
-        # 更新用户头像URL
+        # 更新用户头像URL，旧头像文件由后台任务删除
         avatar_url = f"/uploads/avatars/{unique_filename}"
+        if current_user.avatar_url:
+            enqueue_avatar_cleanup(db, current_user.avatar_url)
         current_user.avatar_url = avatar_url
         current_user.updated_at = datetime.utcnow()
+        invalidate_user_cache(current_user.id, db)
         db.commit()
         
         return {
@@ -183,14 +188,13 @@ async def delete_avatar(
                 detail="No avatar to delete"
             )
         
-        # 删除文件
-        file_path = current_user.avatar_url.lstrip('/')
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        # 文件由后台任务删除
+        enqueue_avatar_cleanup(db, current_user.avatar_url)
         
         # 清除头像URL
         current_user.avatar_url = None
         current_user.updated_at = datetime.utcnow()
+        invalidate_user_cache(current_user.id, db)
         db.commit()
         
         return {"message": "Avatar deleted successfully"}
@@ -211,20 +215,20 @@ async def delete_account(
     """删除用户账户"""
     try:
         # 验证密码
-        if not verify_password(password, current_user.hashed_password):
+        if not await verify_password_async(password, current_user.hashed_password):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Password is incorrect"
             )
         
-        # 删除头像文件
+        # 头像文件由后台任务删除
         if current_user.avatar_url:
-            file_path = current_user.avatar_url.lstrip('/')
-            if os.path.exists(file_path):
-                os.remove(file_path)
+            enqueue_avatar_cleanup(db, current_user.avatar_url)
         
         # 删除用户
+        user_id = current_user.id
         db.delete(current_user)
+        invalidate_user_cache(user_id, db)
         db.commit()
         
         return {"message": "Account deleted successfully"}
@@ -254,6 +258,7 @@ async def update_theme_preference(
         # 更新主题偏好
         current_user.theme_preference = theme_data.theme_preference
         current_user.updated_at = datetime.utcnow()
+        invalidate_user_cache(current_user.id, db)
         db.commit()
         
         return {
@@ -0,0 +1,119 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+# 所有缓存实例，按名称注册，用于统计命中率
+_registry: Dict[str, "LRUCache"] = {}
+_registry_lock = threading.Lock()
+
+_MISSING = object()
+
+
+class LRUCache:
+    """线程安全的有界LRU缓存，可选TTL过期"""
+
+    def __init__(self, name: str, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        with _registry_lock:
+            _registry[name] = self
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """读取缓存，命中时移动到队尾"""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """写入缓存，超出容量时淘汰最久未使用的条目"""
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> bool:
+        """删除指定条目"""
+        with self._lock:
+            if self._data.pop(key, _MISSING) is _MISSING:
+                return False
+            self.invalidations += 1
+            return True
+
+    def invalidate_where(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        """删除所有满足条件的条目，返回删除数量"""
+        with self._lock:
+            keys = [key for key, (value, _) in self._data.items() if predicate(key, value)]
+            for key in keys:
+                del self._data[key]
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self.invalidations += len(self._data)
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计信息"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+def get_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """获取所有已注册缓存的统计信息"""
+    with _registry_lock:
+        caches = list(_registry.values())
+    return {cache.name: cache.stats() for cache in caches}
+
+
+def snapshot_row(instance) -> Dict[str, Any]:
+    """提取ORM对象的列值快照（可安全地跨会话缓存）"""
+    return {column.key: getattr(instance, column.key) for column in instance.__table__.columns}
+
+
+def attach_snapshot(db: Session, model, snapshot: Dict[str, Any]):
+    """把快照还原为绑定到当前会话的ORM对象（不查询数据库）
+
+    还原的对象与查询得到的对象一样可以修改并提交。
+    """
+    instance = model(**snapshot)
+    make_transient_to_detached(instance)
+    return db.merge(instance, load=False)
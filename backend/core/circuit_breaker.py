@@ -0,0 +1,191 @@
+import time
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from backend.core.config import settings
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """单个上游地址的熔断器
+
+    closed: 正常放行，统计最近 window_size 次调用的失败率；
+    open: 失败率超过阈值后直接拒绝，open_duration 秒后进入 half_open；
+    half_open: 只放行少量探测请求，成功则恢复 closed，失败则重新 open。
+    """
+
+    def __init__(self, name: str, failure_rate_threshold: float = 0.5, minimum_calls: int = 5,
+                 window_size: int = 20, open_duration: float = 30.0, half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.minimum_calls = minimum_calls
+        self.open_duration = open_duration
+        self.half_open_max_calls = half_open_max_calls
+
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=window_size)  # True 表示失败
+        self._opened_at = 0.0
+        self._half_open_in_flight = 0
+        self._lock = threading.Lock()
+
+        self.total_successes = 0
+        self.total_failures = 0
+        self.total_rejected = 0
+        self.last_failure: Optional[str] = None
+        self.last_failure_at: Optional[float] = None
+        self.state_changed_at = time.time()
+
+    def _transition(self, state: str):
+        self.state = state
+        self.state_changed_at = time.time()
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        elif state == CLOSED:
+            self._outcomes.clear()
+        self._half_open_in_flight = 0
+
+    def allow_request(self) -> bool:
+        """是否放行请求（放行的请求必须随后调用 record_success/record_failure/release）"""
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.open_duration:
+                    self.total_rejected += 1
+                    return False
+                self._transition(HALF_OPEN)
+
+            if self.state == HALF_OPEN:
+                if self._half_open_in_flight >= self.half_open_max_calls:
+                    self.total_rejected += 1
+                    return False
+                self._half_open_in_flight += 1
+
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.total_successes += 1
+            if self.state == HALF_OPEN:
+                self._transition(CLOSED)
+                return
+            self._outcomes.append(False)
+
+    def record_failure(self, reason: str = ""):
+        with self._lock:
+            self.total_failures += 1
+            self.last_failure = reason
+            self.last_failure_at = time.time()
+            if self.state == HALF_OPEN:
+                self._transition(OPEN)
+                return
+            self._outcomes.append(True)
+            if self.state == CLOSED and len(self._outcomes) >= self.minimum_calls:
+                if self.failure_rate() >= self.failure_rate_threshold:
+                    self._transition(OPEN)
+
+    def release(self):
+        """放行的请求既不算成功也不算失败（例如4xx客户端错误）"""
+        with self._lock:
+            if self.state == HALF_OPEN and self._half_open_in_flight > 0:
+                self._half_open_in_flight -= 1
+
+    def failure_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return sum(self._outcomes) / len(self._outcomes)
+
+    def reset(self):
+        with self._lock:
+            self._transition(CLOSED)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """熔断器状态（用于API展示）"""
+        with self._lock:
+            state = self.state
+            retry_after = None
+            if state == OPEN:
+                retry_after = max(0.0, self.open_duration - (time.monotonic() - self._opened_at))
+            return {
+                "base_url": self.name,
+                "state": state,
+                "failure_rate": round(self.failure_rate(), 4),
+                "window_calls": len(self._outcomes),
+                "total_successes": self.total_successes,
+                "total_failures": self.total_failures,
+                "total_rejected": self.total_rejected,
+                "last_failure": self.last_failure,
+                "last_failure_at": self.last_failure_at,
+                "state_changed_at": self.state_changed_at,
+                "retry_after": round(retry_after, 1) if retry_after is not None else None,
+            }
+
+
+class CircuitBreakerCall:
+    """一次被放行的调用
+
+    结果只记录一次，重复调用 record_success/record_failure/release 不会重复计数；
+    调用方在 finally 中调用 release()，没有记录结果就结束（异常、客户端断开）时释放半开状态的探测名额。
+    """
+
+    def __init__(self, breaker: CircuitBreaker):
+        self.breaker = breaker
+        self.recorded = False
+
+    def record_success(self):
+        if not self.recorded:
+            self.recorded = True
+            self.breaker.record_success()
+
+    def record_failure(self, reason: str = ""):
+        if not self.recorded:
+            self.recorded = True
+            self.breaker.record_failure(reason)
+
+    def release(self):
+        if not self.recorded:
+            self.recorded = True
+            self.breaker.release()
+
+
+class CircuitBreakerRegistry:
+    """按上游地址管理熔断器（每个工作进程独立）"""
+
+    def __init__(self):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, base_url: str) -> CircuitBreaker:
+        key = base_url.rstrip("/")
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(key)
+                if breaker is None:
+                    breaker = CircuitBreaker(
+                        key,
+                        failure_rate_threshold=settings.CIRCUIT_FAILURE_RATE,
+                        minimum_calls=settings.CIRCUIT_MINIMUM_CALLS,
+                        window_size=settings.CIRCUIT_WINDOW_SIZE,
+                        open_duration=settings.CIRCUIT_OPEN_SECONDS,
+                    )
+                    self._breakers[key] = breaker
+        return breaker
+
+    def snapshots(self, base_urls: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        if base_urls is None:
+            breakers = list(self._breakers.values())
+        else:
+            keys = {url.rstrip("/") for url in base_urls}
+            breakers = [b for key, b in self._breakers.items() if key in keys]
+        return [breaker.snapshot() for breaker in breakers]
+
+
+circuit_breakers = CircuitBreakerRegistry()
+
+
+def is_upstream_failure(status_code: int) -> bool:
+    """上游返回的状态码是否说明服务异常（5xx 和限流）"""
+    return status_code >= 500 or status_code == 429
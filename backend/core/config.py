@@ -6,15 +6,116 @@ class Settings(BaseSettings):
     # 数据库配置 - 使用绝对路径
     DATABASE_URL: str = f"sqlite:///{os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'allin.db')}"
     
+    # 读写分离配置
+    DATABASE_READ_URL: Optional[str] = None  # 只读副本地址（为空时 SQLite 使用本地只读连接池，其它数据库读主库）
+    READ_AFTER_WRITE_SECONDS: float = 5.0  # 用户写入后多少秒内的读取仍走主库（读到自己的写入）
+    READ_STICKY_CACHE_SIZE: int = 10000  # 记录最近写入用户的条目数
+    READ_STICKY_FILE: Optional[str] = None  # 多进程部署时各工作进程共享的最近写入记录（SQLite文件，serve.py 自动设置）
+    READ_STICKY_SHARE_INTERVAL: float = 1.0  # 同一用户连续写入时，最多每隔多少秒更新一次共享记录
+    
+    # SQLite配置
+    SQLITE_PROFILE: str = "production"  # production: WAL + 调优的PRAGMA；default: 仅设置忙等待
+    SQLITE_BUSY_TIMEOUT: float = 20.0  # 等待数据库锁的时间（秒）
+    SQLITE_MMAP_SIZE: int = 268435456  # 内存映射大小（字节）
+    SQLITE_CACHE_SIZE_KB: int = 65536  # 每个连接的页缓存大小（KB）
+    SQLITE_WAL_AUTOCHECKPOINT: int = 1000  # WAL达到多少页时自动检查点
+    SQLITE_CHECKPOINT_INTERVAL: float = 300.0  # 后台WAL检查点间隔（秒，0表示不启动）
+    SQLITE_CHECKPOINT_MODE: str = "PASSIVE"  # 后台检查点模式：PASSIVE/FULL/RESTART/TRUNCATE
+    SQLITE_WRITE_POOL_SIZE: int = 4  # 写连接池大小
+    SQLITE_READ_POOL_SIZE: int = 8  # 只读连接池大小
+    
+    # 聊天消息批量写入配置
+    MESSAGE_WRITE_BEHIND: bool = True  # 消息先追加到日志，由后台任务批量写入数据库（关闭则在请求中直接提交）
+    MESSAGE_FLUSH_INTERVAL: float = 0.005  # 攒批等待时间（秒）
+    MESSAGE_BATCH_SIZE: int = 200  # 每个事务最多写入的消息数
+    MESSAGE_WRITE_RETRIES: int = 3  # 写入失败的消息的重试次数，仍然失败则转存到 failed-<pid>.jsonl
+    MESSAGE_RETRY_DELAY: float = 1.0  # 写入失败后第一次重试前的等待时间（秒），之后每次翻倍
+    MESSAGE_JOURNAL_DIR: str = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), '.cache', 'message_journal')  # 追加日志目录（每个工作进程一个文件，启动时重放崩溃前未写入的消息）
+    
+    # 后台任务配置
+    JOB_WORKERS: int = 2  # 每个工作进程执行任务的协程数（0表示只写入任务、不执行）
+    JOB_POLL_INTERVAL: float = 1.0  # 没有任务时的轮询间隔（秒），本进程写入的任务会立即唤醒
+    JOB_MAX_ATTEMPTS: int = 5  # 默认最多执行次数
+    JOB_RETRY_BASE_DELAY: float = 2.0  # 第一次重试的等待时间（秒），之后每次翻倍
+    JOB_RETRY_MAX_DELAY: float = 600.0  # 最长重试等待时间（秒）
+    JOB_LOCK_TIMEOUT: float = 600.0  # 执行超过该时间的任务视为工作进程已退出，重新排队（秒）
+    JOB_RETENTION_DAYS: float = 7.0  # 已成功任务的保留天数
+    
     # JWT配置
     SECRET_KEY: str = "your-secret-key-here-change-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    AUTH_CACHE_TTL: float = 60.0  # 已验证令牌的用户缓存时间（秒）
+    AUTH_CACHE_SIZE: int = 4096  # 用户缓存条目数
+    PASSWORD_HASH_WORKERS: int = 4  # 密码哈希线程数（0表示在请求中直接计算）
+    PASSWORD_HASH_QUEUE_SIZE: int = 64  # 密码任务最大排队数，超出返回503
+    ADMIN_USERNAMES: str = ""  # 管理员用户名，逗号分隔（可访问性能分析等调试接口）
     
     # 应用配置
     APP_NAME: str = "ALLIN Backend"
     DEBUG: bool = True
     
+    # 分词器配置
+    TOKENIZER_CACHE_DIR: str = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), '.cache', 'jieba')
+    TOKENIZER_USER_DICT: Optional[str] = None  # 自定义用户词典路径
+    TOKENIZER_WARMUP: bool = True  # 启动时后台预热分词器
+    
+    # 上下文选择配置
+    CONTEXT_SCORER: str = "semantic"  # semantic: 哈希向量相似度, keyword: 关键词重叠
+    CONTEXT_VECTOR_DIM: int = 256  # 消息向量维度（修改后需重建向量）
+    CONTEXT_CACHE_SIZE: int = 1024  # 上下文选择结果缓存条目数
+    
+    # 缓存配置
+    MODEL_CONFIG_CACHE_SIZE: int = 1024  # 模型配置缓存条目数
+    CACHE_VERSION_CHECK_INTERVAL: float = 1.0  # 检查跨进程缓存版本号的间隔（秒）
+    
+    # 模型健康检查配置
+    MODEL_HEALTH_TTL: float = 60.0  # 健康状态缓存时间（秒）
+    MODEL_HEALTH_TIMEOUT: float = 5.0  # 单次探测超时（秒）
+    MODEL_HEALTH_CONCURRENCY: int = 10  # 最大并发探测数
+    MODEL_HEALTH_REFRESH_INTERVAL: float = 120.0  # 后台刷新间隔（秒，0表示不启动后台刷新）
+    
+    # 熔断器配置（按模型服务地址统计）
+    CIRCUIT_FAILURE_RATE: float = 0.5  # 失败率达到该值时熔断
+    CIRCUIT_MINIMUM_CALLS: int = 5  # 统计窗口内至少有多少次调用才判断失败率
+    CIRCUIT_WINDOW_SIZE: int = 20  # 统计最近多少次调用
+    CIRCUIT_OPEN_SECONDS: float = 30.0  # 熔断持续时间（秒），之后放行一次探测请求
+    
+    # 上游连接池配置
+    UPSTREAM_MAX_CONNECTIONS: int = 100  # 每个工作进程到模型服务的最大连接数
+    UPSTREAM_MAX_KEEPALIVE: int = 20  # 保留的空闲连接数
+    UPSTREAM_KEEPALIVE_EXPIRY: float = 90.0  # 空闲连接保留时间（秒）
+    UPSTREAM_PREWARM_INTERVAL: float = 30.0  # 连接在该时间内用过则不重复预热（秒）
+    UPSTREAM_PREWARM_TIMEOUT: float = 5.0  # 预热请求超时（秒）
+    STREAM_INCLUDE_USAGE: bool = True  # 流式请求时要求上游返回usage（stream_options.include_usage）
+    
+    # 指标配置
+    METRICS_DIR: Optional[str] = None  # 多进程部署时各工作进程写入指标快照的目录（serve.py 自动设置）
+    METRICS_FLUSH_INTERVAL: float = 5.0  # 写入指标快照的间隔（秒）
+    METRICS_TOKEN: Optional[str] = None  # 访问 /metrics 需要的令牌（Authorization: Bearer <令牌>）；为空时只允许本机访问
+    METRICS_MAX_UPSTREAMS: int = 50  # 模型服务指标按主机区分的最大数量，超出的归入 other
+    
+    # 请求追踪配置
+    TRACE_SAMPLE_RATE: float = 0.01  # 采样比例（0关闭，1全部采样）
+    TRACE_ALLOW_FORCE: bool = False  # 是否允许请求头 X-Trace: 1 强制采样（任何客户端都能绕过采样并看到耗时明细，只在排查问题时开启）
+    TRACE_FILE: Optional[str] = None  # 追踪记录JSONL文件路径（为空则只输出 Server-Timing 响应头）
+    
+    # SQL调试配置
+    QUERY_DEBUG: bool = False  # 记录慢查询和N+1查询（结果见 /api/debug/queries）
+    SLOW_QUERY_THRESHOLD: float = 0.1  # 慢查询阈值（秒），超过时记录查询计划
+    N_PLUS_ONE_THRESHOLD: int = 5  # 单个请求中同一语句执行达到该次数时视为N+1
+    QUERY_LOG_SIZE: int = 100  # 保留的慢查询和N+1记录条数
+    QUERY_LOG_PARAMETERS: bool = False  # 慢查询记录中保留绑定参数（可能包含密码哈希、API密钥，只在排查问题时开启）
+    
+    # 事件循环监控配置
+    LOOP_MONITOR_INTERVAL: float = 0.1  # 检查间隔（秒，0表示不启动）
+    LOOP_LAG_THRESHOLD: float = 0.2  # 调度延迟超过该值（秒）时记录阻塞位置
+    LOOP_BLOCK_LOG_SIZE: int = 50  # 保留的阻塞记录条数
+    
+    # 性能分析配置（仅管理员可用）
+    PROFILE_MAX_SECONDS: float = 60.0  # 单次采样或内存对比的最长时间（秒）
+    PROFILE_DEFAULT_INTERVAL: float = 0.005  # 默认采样间隔（秒）
+    
     class Config:
         env_file = ".env"
 
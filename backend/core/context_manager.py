@@ -1,8 +1,14 @@
 import re
+import time
 import jieba
 from typing import List, Dict, Any, Optional, Tuple
 from collections import Counter
 import json
+from backend.core.config import settings
+from backend.core.embedding import HashedEmbedder
+from backend.core.tokenizer import ensure_tokenizer_ready
+from backend.core.metrics import tokenize_duration
+from backend.core.tracing import traced
 
 class ContextManager:
     """上下文管理器"""
@@ -12,10 +18,16 @@ class ContextManager:
         self.stop_words = {
             '的', '了', '在', '是', '我', '有', '和', '就', '不', '人', '都', '一', '一个', '上', '也', '很', '到', '说', '要', '去', '你', '会', '着', '没有', '看', '好', '自己', '这'
         }
+        # 相关性评分方式：semantic（哈希向量余弦相似度）或 keyword（关键词重叠）
+        self.scorer = settings.CONTEXT_SCORER
+        self.embedder = HashedEmbedder(settings.CONTEXT_VECTOR_DIM, self.stop_words)
     
+    @traced()
     def extract_keywords(self, text: str, max_keywords: int = 10) -> List[str]:
         """提取文本关键词"""
-        # 使用jieba分词
+        # 使用jieba分词（预热未完成时等待，避免以默认配置重复加载词典）
+        ensure_tokenizer_ready()
+        started = time.perf_counter()
         words = jieba.cut(text)
         
         # 过滤停用词和短词
@@ -29,6 +41,7 @@ class ContextManager:
         
         # 统计词频
         word_count = Counter(keywords)
+        tokenize_duration.observe(value=time.perf_counter() - started)
         
         # 返回频率最高的关键词
         return [word for word, count in word_count.most_common(max_keywords)]
@@ -50,6 +63,29 @@ class ContextManager:
         # 返回0-100的评分
         return int((overlap / total_keywords) * 100)
     
+    def compute_message_vector(self, content: str) -> bytes:
+        """计算消息的语义向量（写入消息时存储）"""
+        return self.embedder.embed_bytes(content)
+    
+    def rank_by_semantic_relevance(self, candidates: List[Dict], recent_messages: List[Dict], limit: int) -> List[Dict]:
+        """选出与最近消息语义最相关的 limit 条候选消息（一次矩阵-向量乘法）"""
+        if not candidates or limit <= 0:
+            return []
+        
+        matrix = self.embedder.stack(
+            [msg.get('context_vector') for msg in candidates],
+            [msg.get('content', '') for msg in candidates]
+        )
+        recent_matrix = self.embedder.stack(
+            [msg.get('context_vector') for msg in recent_messages],
+            [msg.get('content', '') for msg in recent_messages]
+        )
+        query = self.embedder.query_vector(recent_matrix)
+        scores = self.embedder.cosine_scores(matrix, query)
+        
+        return [candidates[i] for i in self.embedder.top_k(scores, limit)]
+    
+    @traced()
     def select_relevant_messages(self, messages: List[Dict], 
                                window_size: int = 10,
                                smart_selection: bool = True) -> List[Dict]:
@@ -64,6 +100,14 @@ class ContextManager:
         # 智能选择：结合最近消息和相关消息
         recent_messages = messages[-window_size//2:]  # 最近的一半消息
         
+        if self.scorer == 'semantic':
+            relevant_messages = self.rank_by_semantic_relevance(
+                messages[:-window_size//2], recent_messages, window_size//2
+            )
+            selected_messages = relevant_messages + recent_messages
+            selected_messages.sort(key=lambda x: x.get('created_at', ''))
+            return selected_messages
+        
         # 计算所有消息的相关性评分
         all_keywords = []
         for msg in messages:
@@ -88,6 +132,7 @@ class ContextManager:
         
         return selected_messages
     
+    @traced()
     def generate_context_summary(self, messages: List[Dict], max_length: int = 200) -> str:
         """生成上下文摘要"""
         if not messages:
@@ -134,6 +179,7 @@ class ContextManager:
         
         return summary
     
+    @traced()
     def process_message_for_context(self, message: Dict) -> Dict:
         """处理消息以提取上下文信息"""
         content = message.get('content', '')
@@ -143,6 +189,7 @@ class ContextManager:
         
         # 更新消息
         message['context_keywords'] = keywords
+        message['context_vector'] = self.compute_message_vector(content)
         message['context_relevance_score'] = 0  # 初始评分，后续会更新
         
         return message
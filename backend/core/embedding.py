@@ -0,0 +1,120 @@
+import re
+import zlib
+from typing import Iterable, List, Optional, Sequence
+
+import numpy as np
+
+# 中文连续片段 / 英文、数字、代码标识符
+_TOKEN_PATTERN = re.compile(r'[\u4e00-\u9fff]+|[A-Za-z0-9_]+')
+# 拆分驼峰和下划线命名：getChatHistory -> get, chat, history
+_SUBWORD_PATTERN = re.compile(r'[A-Z]?[a-z]+|[A-Z]+(?![a-z])|\d+')
+
+
+class HashedEmbedder:
+    """基于特征哈希的本地文本向量（无需网络和GPU）
+
+    中文使用字的 unigram/bigram，英文和代码使用小写词、子词和字符 trigram，
+    通过 crc32 哈希到固定维度并做 L2 归一化，余弦相似度即为向量点积。
+    """
+
+    def __init__(self, dim: int = 256, stop_words: Optional[Iterable[str]] = None):
+        self.dim = dim
+        self.stop_words = set(stop_words or ())
+        # 存储与计算都使用 float32，读取时可零拷贝构造矩阵
+        self.storage_dtype = np.float32
+        self.vector_bytes = dim * np.dtype(self.storage_dtype).itemsize
+
+    def _features(self, text: str) -> List[tuple]:
+        """提取 (特征, 权重) 列表"""
+        features = []
+        for token in _TOKEN_PATTERN.findall(text or ""):
+            if '\u4e00' <= token[0] <= '\u9fff':
+                for i, char in enumerate(token):
+                    if char not in self.stop_words:
+                        features.append(("c:" + char, 0.5))
+                    if i + 1 < len(token):
+                        features.append(("b:" + token[i:i + 2], 1.0))
+            else:
+                word = token.lower()
+                if len(word) < 2:
+                    continue
+                features.append(("w:" + word, 1.0))
+                subwords = _SUBWORD_PATTERN.findall(token)
+                if len(subwords) > 1 or "_" in token:
+                    for sub in subwords or token.split("_"):
+                        if len(sub) > 1:
+                            features.append(("w:" + sub.lower(), 0.7))
+                if len(word) > 3:
+                    padded = f"<{word}>"
+                    for i in range(len(padded) - 2):
+                        features.append(("t:" + padded[i:i + 3], 0.3))
+        return features
+
+    def embed(self, text: str) -> np.ndarray:
+        """计算文本的归一化向量（float32）"""
+        features = self._features(text)
+        if not features:
+            return np.zeros(self.dim, dtype=np.float32)
+
+        indices = np.empty(len(features), dtype=np.int64)
+        weights = np.empty(len(features), dtype=np.float32)
+        for i, (feature, weight) in enumerate(features):
+            h = zlib.crc32(feature.encode("utf-8"))
+            indices[i] = h % self.dim
+            # 使用哈希的高位决定符号，减少碰撞带来的偏差
+            weights[i] = weight if (h >> 31) & 1 else -weight
+
+        vector = np.bincount(indices, weights=weights, minlength=self.dim).astype(np.float32)
+        # 次线性词频缩放
+        vector = np.sign(vector) * np.log1p(np.abs(vector))
+        norm = float(np.linalg.norm(vector))
+        if norm > 0:
+            vector /= norm
+        return vector
+
+    def to_bytes(self, vector: np.ndarray) -> bytes:
+        """向量序列化为存储格式"""
+        return vector.astype(self.storage_dtype).tobytes()
+
+    def embed_bytes(self, text: str) -> bytes:
+        """计算文本向量并序列化"""
+        return self.to_bytes(self.embed(text))
+
+    def stack(self, blobs: Sequence[Optional[bytes]], texts: Sequence[str]) -> np.ndarray:
+        """把存储的向量拼成矩阵；缺失或维度不符的向量即时计算"""
+        buffer = []
+        for blob, text in zip(blobs, texts):
+            if not blob or len(blob) != self.vector_bytes:
+                blob = self.embed_bytes(text)
+            buffer.append(blob)
+        if not buffer:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        matrix = np.frombuffer(b"".join(buffer), dtype=self.storage_dtype)
+        return matrix.reshape(len(buffer), self.dim)
+
+    @staticmethod
+    def query_vector(matrix: np.ndarray, decay: float = 0.8) -> np.ndarray:
+        """由若干条消息向量生成查询向量（越新的消息权重越高）"""
+        if matrix.shape[0] == 0:
+            return np.zeros(matrix.shape[1], dtype=np.float32)
+        weights = np.power(decay, np.arange(matrix.shape[0] - 1, -1, -1, dtype=np.float32))
+        query = weights @ matrix
+        norm = float(np.linalg.norm(query))
+        return query / norm if norm > 0 else query
+
+    @staticmethod
+    def cosine_scores(matrix: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """一次矩阵-向量乘法计算所有消息的余弦相似度（向量已归一化）"""
+        return matrix @ query
+
+    @staticmethod
+    def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+        """返回得分最高的 k 个下标（按得分降序，得分相同时下标小的在前）"""
+        if k <= 0 or scores.size == 0:
+            return np.empty(0, dtype=np.int64)
+        if k < scores.size:
+            candidates = np.argpartition(-scores, k - 1)[:k]
+        else:
+            candidates = np.arange(scores.size)
+        return candidates[np.lexsort((candidates, -scores[candidates]))]
+
@@ -0,0 +1,79 @@
+import time
+import asyncio
+from typing import Any, Dict, Optional
+
+import httpx
+
+from backend.core.config import settings
+
+# 每个工作进程（事件循环）共享一个连接池，复用到模型服务的 TCP/TLS 连接
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+# base_url -> 最近一次使用或预热连接的时间（monotonic）
+_last_active: Dict[str, float] = {}
+
+
+def get_upstream_client() -> httpx.AsyncClient:
+    """获取共享的上游 HTTP 客户端（超时由每次请求单独指定）"""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(30.0),
+            limits=httpx.Limits(
+                max_connections=settings.UPSTREAM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.UPSTREAM_MAX_KEEPALIVE,
+                keepalive_expiry=settings.UPSTREAM_KEEPALIVE_EXPIRY,
+            ),
+        )
+        _client_loop = loop
+    return _client
+
+
+async def close_upstream_client():
+    """关闭共享客户端（应用退出时调用）"""
+    global _client, _client_loop
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+    _client_loop = None
+
+
+def mark_upstream_active(base_url: str):
+    """记录与模型服务的连接刚被使用过"""
+    _last_active[base_url.rstrip("/")] = time.monotonic()
+
+
+def is_connection_warm(base_url: str) -> bool:
+    """连接池中是否很可能还有可复用的空闲连接"""
+    last_active = _last_active.get(base_url.rstrip("/"))
+    if last_active is None:
+        return False
+    return time.monotonic() - last_active < settings.UPSTREAM_PREWARM_INTERVAL
+
+
+async def prewarm_upstream(base_url: str, api_key: str) -> Dict[str, Any]:
+    """预先建立到模型服务的连接（DNS、TCP、TLS），供随后的聊天请求复用
+
+    请求 /v1/models 不消耗token；最近用过的连接直接复用，不重复请求。
+    """
+    if is_connection_warm(base_url):
+        return {"connection": "reused", "latency": None, "error": None}
+
+    client = get_upstream_client()
+    started = time.perf_counter()
+    try:
+        response = await client.get(
+            f"{base_url}/v1/models",
+            headers={"Authorization": f"Bearer {api_key}"},
+            timeout=settings.UPSTREAM_PREWARM_TIMEOUT,
+        )
+        latency = time.perf_counter() - started
+    except httpx.HTTPError as e:
+        return {"connection": "failed", "latency": time.perf_counter() - started, "error": f"{type(e).__name__}: {e}"}
+
+    # 无论状态码如何，连接已经建立并回到连接池
+    mark_upstream_active(base_url)
+    error = None if response.status_code < 400 else f"HTTP {response.status_code}"
+    return {"connection": "warmed", "latency": latency, "error": error}
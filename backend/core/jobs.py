@@ -0,0 +1,351 @@
+"""
+基于数据库的后台任务队列
+
+请求中调用 enqueue_job 往 jobs 表写入一条任务（可以与业务数据在同一个会话中提交），
+工作协程轮询到期的任务并调用注册的处理函数。失败的任务按指数退避重新排队，
+超过最多执行次数后标记为 failed。多个工作进程通过条件更新（只有 pending 状态才能领取）
+保证同一任务只被执行一次；执行中进程退出的任务在超过 JOB_LOCK_TIMEOUT 后重新排队。
+
+处理函数用 job_handler 注册，参数用 Pydantic 模型声明：
+
+    @job_handler("chat.summary", ChatSummaryJob)
+    def refresh_chat_summary(db: Session, payload: ChatSummaryJob):
+        ...
+"""
+
+import os
+import time
+import socket
+import asyncio
+import logging
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Type
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import func, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from backend.core.config import settings
+from backend.core.metrics import jobs_processed, job_duration
+from backend.database.database import SessionLocal
+from backend.models.chat import get_current_time
+from backend.models.job import Job, JOB_PENDING, JOB_RUNNING, JOB_SUCCEEDED, JOB_FAILED
+
+logger = logging.getLogger(__name__)
+
+
+class JobHandler(NamedTuple):
+    kind: str
+    func: Callable[[Session, BaseModel], Any]
+    payload_model: Type[BaseModel]
+    max_attempts: Optional[int]
+
+
+_handlers: Dict[str, JobHandler] = {}
+
+
+def job_handler(kind: str, payload_model: Type[BaseModel], max_attempts: Optional[int] = None):
+    """注册任务处理函数（在工作线程中执行，参数为数据库会话和校验后的任务参数）"""
+    def decorator(func):
+        _handlers[kind] = JobHandler(kind, func, payload_model, max_attempts)
+        return func
+    return decorator
+
+
+def get_job_handlers() -> List[str]:
+    return sorted(_handlers)
+
+
+def enqueue_job(
+    db: Session,
+    kind: str,
+    payload: BaseModel,
+    idempotency_key: Optional[str] = None,
+    delay: float = 0.0,
+    commit: bool = True
+) -> int:
+    """写入一个任务，返回任务ID
+
+    指定幂等键时，已有相同键的任务（无论是否执行完，成功的任务保留 JOB_RETENTION_DAYS 天）直接返回已有任务的ID。
+    commit=False 时由调用方提交，任务与业务数据一起生效。
+    """
+    handler = _handlers.get(kind)
+    if handler is None:
+        raise ValueError(f"未注册的任务类型: {kind}")
+
+    values = {
+        "kind": kind,
+        "payload": payload.model_dump(mode="json"),
+        "idempotency_key": idempotency_key,
+        "status": JOB_PENDING,
+        "attempts": 0,
+        "max_attempts": handler.max_attempts or settings.JOB_MAX_ATTEMPTS,
+        "run_at": get_current_time() + timedelta(seconds=delay),
+    }
+    if idempotency_key is None:
+        job_id = db.execute(insert(Job).values(**values)).inserted_primary_key[0]
+    else:
+        dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+        db.execute(
+            dialect.insert(Job.__table__).values(**values)
+            .on_conflict_do_nothing(index_elements=["idempotency_key"])
+        )
+        job_id = db.query(Job.id).filter(Job.idempotency_key == idempotency_key).scalar()
+    if commit:
+        db.commit()
+    if _pool is not None:
+        _pool.wake()
+    return job_id
+
+
+def retry_delay(attempts: int) -> float:
+    """第 attempts 次失败后的重试等待时间（指数退避）"""
+    return min(settings.JOB_RETRY_MAX_DELAY, settings.JOB_RETRY_BASE_DELAY * 2 ** max(0, attempts - 1))
+
+
+def claim_job(worker_id: str) -> Optional[Dict[str, Any]]:
+    """领取一个到期的任务，没有可执行的任务时返回 None"""
+    db = SessionLocal()
+    try:
+        # 候选任务可能被其它进程抢先领取，换一个再试
+        for _ in range(3):
+            now = get_current_time()
+            job_id = db.query(Job.id).filter(
+                Job.status == JOB_PENDING, Job.run_at <= now
+            ).order_by(Job.run_at, Job.id).limit(1).scalar()
+            if job_id is None:
+                return None
+            claimed = db.query(Job).filter(Job.id == job_id, Job.status == JOB_PENDING).update({
+                Job.status: JOB_RUNNING,
+                Job.locked_by: worker_id,
+                Job.locked_at: now,
+                Job.attempts: Job.attempts + 1,
+            }, synchronize_session=False)
+            db.commit()
+            if claimed:
+                job = db.get(Job, job_id)
+                return {
+                    "id": job.id,
+                    "kind": job.kind,
+                    "payload": job.payload,
+                    "attempts": job.attempts,
+                    "max_attempts": job.max_attempts,
+                }
+        return None
+    finally:
+        db.close()
+
+
+def run_job(job: Dict[str, Any]) -> bool:
+    """执行一个已领取的任务并记录结果，返回是否成功"""
+    handler = _handlers.get(job["kind"])
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        if handler is None:
+            raise LookupError(f"未注册的任务类型: {job['kind']}")
+        handler.func(db, handler.payload_model.model_validate(job["payload"] or {}))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        error = f"{type(e).__name__}: {e}"[:2000]
+        # 参数不合法或没有处理函数的任务重试也不会成功
+        permanent = isinstance(e, (LookupError, ValidationError)) or job["attempts"] >= job["max_attempts"]
+        values = {Job.last_error: error, Job.locked_by: None}
+        if permanent:
+            values.update({Job.status: JOB_FAILED, Job.finished_at: get_current_time()})
+            logger.error(f"任务 {job['id']}（{job['kind']}）失败，不再重试: {error}")
+        else:
+            delay = retry_delay(job["attempts"])
+            values.update({Job.status: JOB_PENDING, Job.run_at: get_current_time() + timedelta(seconds=delay)})
+            logger.warning(f"任务 {job['id']}（{job['kind']}）第 {job['attempts']} 次执行失败，{delay:.1f}s 后重试: {error}")
+        db.query(Job).filter(Job.id == job["id"]).update(values, synchronize_session=False)
+        db.commit()
+        jobs_processed.inc(job["kind"], "failed" if permanent else "retry")
+        return False
+    else:
+        db.query(Job).filter(Job.id == job["id"]).update({
+            Job.status: JOB_SUCCEEDED,
+            Job.finished_at: get_current_time(),
+            Job.locked_by: None,
+            Job.last_error: None,
+        }, synchronize_session=False)
+        db.commit()
+        jobs_processed.inc(job["kind"], "succeeded")
+        return True
+    finally:
+        job_duration.observe(job["kind"], value=time.perf_counter() - started)
+        db.close()
+
+
+def recover_stale_jobs() -> Dict[str, int]:
+    """把执行超时（工作进程已退出）的任务重新排队，并清理过期的已完成任务"""
+    db = SessionLocal()
+    try:
+        now = get_current_time()
+        stale = (Job.status == JOB_RUNNING) & (Job.locked_at < now - timedelta(seconds=settings.JOB_LOCK_TIMEOUT))
+        failed = db.query(Job).filter(stale, Job.attempts >= Job.max_attempts).update({
+            Job.status: JOB_FAILED,
+            Job.finished_at: now,
+            Job.locked_by: None,
+            Job.last_error: "执行超时",
+        }, synchronize_session=False)
+        requeued = db.query(Job).filter(stale).update({
+            Job.status: JOB_PENDING,
+            Job.run_at: now,
+            Job.locked_by: None,
+            Job.last_error: "执行超时",
+        }, synchronize_session=False)
+        purged = db.query(Job).filter(
+            Job.status == JOB_SUCCEEDED,
+            Job.finished_at < now - timedelta(days=settings.JOB_RETENTION_DAYS)
+        ).delete(synchronize_session=False)
+        db.commit()
+        return {"requeued": requeued, "failed": failed, "purged": purged}
+    finally:
+        db.close()
+
+
+class JobWorkerPool:
+    """在事件循环中运行若干工作协程，任务本身在线程中执行"""
+
+    def __init__(self, concurrency: int, poll_interval: float):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+        self._tasks.append(asyncio.create_task(self._maintain()))
+
+    def wake(self):
+        """有新任务时唤醒空闲的工作协程（可以在其它线程中调用）"""
+        if self._loop is None:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        except RuntimeError:
+            pass
+
+    async def _work(self):
+        while True:
+            try:
+                job = await asyncio.to_thread(claim_job, self.worker_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("领取后台任务失败")
+                job = None
+            if job is not None:
+                try:
+                    await asyncio.to_thread(run_job, job)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    # 更新任务状态失败（例如数据库被锁、连接断开）：任务保持 running，
+                    # 超过 JOB_LOCK_TIMEOUT 后由 recover_stale_jobs 重新排队
+                    logger.exception(f"执行后台任务 {job['id']}（{job['kind']}）失败")
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _maintain(self):
+        while True:
+            try:
+                result = await asyncio.to_thread(recover_stale_jobs)
+                if result["requeued"] or result["failed"]:
+                    logger.warning(f"重新排队 {result['requeued']} 个执行超时的任务，{result['failed']} 个超过重试次数")
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("清理后台任务失败")
+            await asyncio.sleep(max(self.poll_interval, settings.JOB_LOCK_TIMEOUT / 10))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        self._loop = None
+
+
+_pool: Optional[JobWorkerPool] = None
+
+
+def start_job_workers() -> Optional[JobWorkerPool]:
+    """启动后台任务工作协程（应用启动时调用）"""
+    global _pool
+    if settings.JOB_WORKERS <= 0 or _pool is not None:
+        return _pool
+    _pool = JobWorkerPool(settings.JOB_WORKERS, settings.JOB_POLL_INTERVAL)
+    _pool.start()
+    return _pool
+
+
+async def stop_job_workers():
+    """停止工作协程（正在执行的任务在线程中继续运行到结束，未完成的会在超时后重新排队）"""
+    global _pool
+    if _pool is None:
+        return
+    pool, _pool = _pool, None
+    await pool.stop()
+
+
+def _job_dict(job: Job) -> Dict[str, Any]:
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "idempotency_key": job.idempotency_key,
+        "payload": job.payload,
+        "run_at": job.run_at,
+        "locked_by": job.locked_by,
+        "last_error": job.last_error,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at,
+    }
+
+
+def get_job_summary(db: Session, limit: int = 20, status: Optional[str] = None, kind: Optional[str] = None) -> Dict[str, Any]:
+    """各类型任务的状态统计和最近的任务"""
+    counts: Dict[str, Dict[str, int]] = {}
+    for job_kind, job_status, count in db.query(Job.kind, Job.status, func.count(Job.id)).group_by(Job.kind, Job.status):
+        counts.setdefault(job_kind, {})[job_status] = count
+
+    oldest_pending = db.query(func.min(Job.run_at)).filter(
+        Job.status == JOB_PENDING, Job.run_at <= get_current_time()
+    ).scalar()
+
+    query = db.query(Job)
+    if status:
+        query = query.filter(Job.status == status)
+    if kind:
+        query = query.filter(Job.kind == kind)
+    recent = query.order_by(Job.id.desc()).limit(limit).all()
+
+    return {
+        "workers": {
+            "running": _pool is not None,
+            "concurrency": _pool.concurrency if _pool else 0,
+            "worker_id": _pool.worker_id if _pool else None,
+        },
+        "handlers": get_job_handlers(),
+        "counts": counts,
+        "oldest_due_at": oldest_pending,
+        "jobs": [_job_dict(job) for job in recent],
+    }
@@ -0,0 +1,225 @@
+import sys
+import time
+import asyncio
+import logging
+import threading
+import weakref
+import traceback
+from collections import deque
+from typing import Any, Dict, Optional
+
+from backend.core.config import settings
+from backend.core.metrics import event_loop_lag, event_loop_blocks
+
+logger = logging.getLogger(__name__)
+
+# 任务 -> 所属请求的 ASGI scope，监控线程据此定位阻塞的路由
+# （请求中创建的子任务，例如流式响应的发送任务，通过任务工厂继承父任务的请求）
+_task_scopes: "weakref.WeakKeyDictionary[asyncio.Task, Dict[str, Any]]" = weakref.WeakKeyDictionary()
+
+STACK_LIMIT = 30
+
+
+def _task_scope(task: Optional[asyncio.Task]) -> Optional[Dict[str, Any]]:
+    if task is None:
+        return None
+    try:
+        return _task_scopes.get(task)
+    except RuntimeError:
+        # 监控线程读取时字典正在被事件循环线程修改
+        return None
+
+
+def _install_task_factory(loop: asyncio.AbstractEventLoop):
+    """包装事件循环的任务工厂，让子任务继承父任务所属的请求"""
+    previous = loop.get_task_factory()
+
+    def factory(loop, coro, **kwargs):
+        if previous is not None:
+            task = previous(loop, coro, **kwargs)
+        else:
+            task = asyncio.Task(coro, loop=loop, **kwargs)
+        parent = asyncio.current_task(loop)
+        scope = _task_scopes.get(parent) if parent is not None else None
+        if scope is not None:
+            _task_scopes[task] = scope
+        return task
+
+    loop.set_task_factory(factory)
+    return previous
+
+
+def _scope_route(scope: Optional[Dict[str, Any]]) -> str:
+    if scope is None:
+        return "-"
+    route = getattr(scope.get("route"), "path", None) or scope.get("path", "-")
+    return f"{scope.get('method', '')} {route}".strip()
+
+
+class LoopMonitor:
+    """事件循环延迟监控
+
+    协程每隔 interval 醒来一次，实际醒来时间与预期的差值就是调度延迟；
+    另有一个守护线程检查协程的心跳，超过阈值未更新时说明事件循环被同步代码阻塞，
+    立即抓取事件循环线程的调用栈和当前任务所属的路由。
+    """
+
+    def __init__(self, interval: float, threshold: float, history_size: int):
+        self.interval = interval
+        self.threshold = threshold
+        self.blocks: deque = deque(maxlen=history_size)
+        self.route_counts: Dict[str, int] = {}
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.samples = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat = time.monotonic()
+        self._pending: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._previous_factory = None
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._previous_factory = _install_task_factory(self._loop)
+        self._task = asyncio.create_task(self._run())
+        self._thread = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._thread.start()
+
+    async def stop(self):
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._loop is not None:
+            self._loop.set_task_factory(self._previous_factory)
+        if self._thread is not None:
+            await asyncio.to_thread(self._thread.join, self.interval * 2)
+            self._thread = None
+
+    async def _run(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._heartbeat = now
+            lag = max(0.0, now - expected)
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            self.samples += 1
+            event_loop_lag.observe(value=lag)
+            if lag >= self.threshold:
+                self._record_block(lag)
+
+    def _watch(self):
+        """监控线程：心跳超时时抓取事件循环线程当前的调用栈（每次阻塞只抓一次）"""
+        captured_for = None
+        while not self._stopped.wait(self.interval / 2):
+            heartbeat = self._heartbeat
+            if time.monotonic() - heartbeat - self.interval < self.threshold or captured_for == heartbeat:
+                continue
+            captured_for = heartbeat
+            try:
+                self._capture()
+            except Exception:
+                logger.exception("抓取事件循环调用栈失败")
+
+    def _capture(self):
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = traceback.format_stack(frame, limit=None)[-STACK_LIMIT:] if frame is not None else []
+        task = asyncio.current_task(self._loop)
+        coro = task.get_coro() if task is not None else None
+        with self._lock:
+            self._pending = {
+                "route": _scope_route(_task_scope(task)),
+                "task": getattr(coro, "__qualname__", None),
+                "stack": [line.rstrip() for line in stack],
+            }
+
+    def _record_block(self, lag: float):
+        with self._lock:
+            pending, self._pending = self._pending, None
+        block = pending or {"route": "-", "task": None, "stack": []}
+        block["lag_ms"] = round(lag * 1000, 3)
+        block["at"] = time.time()
+        route = block["route"]
+        event_loop_blocks.inc(route)
+        with self._lock:
+            self.blocks.append(block)
+            self.route_counts[route] = self.route_counts.get(route, 0) + 1
+        location = block["stack"][-1].strip().splitlines()[0] if block["stack"] else "未知位置"
+        logger.warning("事件循环阻塞 %.0fms，路由 %s，位置 %s", lag * 1000, route, location)
+
+    def summary(self, limit: int = 20) -> Dict[str, Any]:
+        with self._lock:
+            blocks = list(self.blocks)[-limit:][::-1]
+            route_counts = dict(self.route_counts)
+        return {
+            "enabled": True,
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "samples": self.samples,
+            "last_lag_ms": round(self.last_lag * 1000, 3),
+            "max_lag_ms": round(self.max_lag * 1000, 3),
+            "blocks_by_route": dict(sorted(route_counts.items(), key=lambda item: item[1], reverse=True)),
+            "recent_blocks": blocks,
+        }
+
+
+_monitor: Optional[LoopMonitor] = None
+
+
+def start_loop_monitor() -> Optional[LoopMonitor]:
+    """启动事件循环监控（应用启动时调用，LOOP_MONITOR_INTERVAL 为0时不启动）"""
+    global _monitor
+    if settings.LOOP_MONITOR_INTERVAL <= 0 or _monitor is not None:
+        return _monitor
+    _monitor = LoopMonitor(settings.LOOP_MONITOR_INTERVAL, settings.LOOP_LAG_THRESHOLD, settings.LOOP_BLOCK_LOG_SIZE)
+    _monitor.start()
+    return _monitor
+
+
+async def stop_loop_monitor():
+    global _monitor
+    if _monitor is None:
+        return
+    await _monitor.stop()
+    _monitor = None
+
+
+def get_loop_summary(limit: int = 20) -> Dict[str, Any]:
+    if _monitor is None:
+        return {"enabled": False}
+    return _monitor.summary(limit)
+
+
+class LoopMonitorMiddleware:
+    """记录当前任务所属的请求，供事件循环监控定位阻塞的路由（纯ASGI中间件）"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        task = asyncio.current_task()
+        previous = _task_scopes.get(task)
+        _task_scopes[task] = scope
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if previous is None:
+                _task_scopes.pop(task, None)
+            else:
+                _task_scopes[task] = previous
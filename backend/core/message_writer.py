@@ -0,0 +1,449 @@
+"""
+聊天消息的异步批量写入（write-behind）
+
+请求只把消息追加到本进程的日志文件并放入队列，后台任务每隔几毫秒把队列中的消息
+合并成一个事务批量插入，提交后通过 Future 返回消息ID。调用方可以等待结果，也可以不等待。
+
+日志文件位于 MESSAGE_JOURNAL_DIR/<pid>.jsonl，每条消息一行，写入数据库后追加一行完成标记，
+队列清空时截断文件。进程崩溃后，下次启动时重放已退出进程的日志中没有完成标记的消息，
+条目ID同时写入 chat_messages.write_id，已经提交的消息不会重复写入。
+写入失败的消息按退避时间重试 MESSAGE_WRITE_RETRIES 次，仍然失败则转存到 failed-<pid>.jsonl 供人工处理；
+Future 只在得到最终结果（写入成功或转存）后完成，调用方不会把稍后写入成功的消息当作失败。
+日志只写入操作系统缓冲区（不 fsync），可以防止进程崩溃丢失消息，但不能防止机器断电。
+"""
+
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert
+
+from backend.core.config import settings
+from backend.core.metrics import message_write_batch_size, message_write_queue
+from backend.crud.chat import (
+    add_chat_message, context_manager, invalidate_context_cache, enqueue_summary_refresh
+)
+from backend.crud.usage import record_usage
+from backend.database.database import SessionLocal
+from backend.database.engine import begin_immediate
+from backend.database.routing import current_sticky_key, mark_write
+from backend.models.chat import ChatHistory, ChatMessage, get_current_time
+from backend.schemas.chat import ChatMessageCreate
+
+logger = logging.getLogger(__name__)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _written_ids(db, entries: List[Dict[str, Any]]) -> set:
+    """重放日志时找出已经写入的条目（提交后、写完成标记前崩溃的情况）"""
+    rows = db.query(ChatMessage.write_id).filter(
+        ChatMessage.write_id.in_([entry["id"] for entry in entries])
+    ).all()
+    return {row.write_id for row in rows}
+
+
+def _message_row(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """把日志条目转换为 chat_messages 的一行（与 add_chat_message 的字段一致）"""
+    message = entry["message"]
+    processed_message = context_manager.process_message_for_context({
+        'content': message["content"],
+        'role': message["role"],
+        'created_at': entry["created_at"]
+    })
+    return {
+        "chat_history_id": entry["chat_id"],
+        "role": message["role"],
+        "content": message["content"],
+        "created_at": datetime.fromisoformat(entry["created_at"]),
+        "message_metadata": message.get("message_metadata"),
+        "context_keywords": processed_message.get('context_keywords'),
+        "context_vector": processed_message.get('context_vector'),
+        "context_relevance_score": processed_message.get('context_relevance_score', 0),
+        "prompt_tokens": message.get("prompt_tokens"),
+        "completion_tokens": message.get("completion_tokens"),
+        "usage_estimated": message.get("usage_estimated"),
+        "ttft": message.get("ttft"),
+        "tokens_per_second": message.get("tokens_per_second"),
+        "write_id": entry["id"],
+    }
+
+
+def write_messages(entries: List[Dict[str, Any]], skip_existing: bool = False,
+                   rows: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """在一个事务中写入一批消息，返回 日志ID -> 消息ID（聊天不存在时为 None）
+
+    整批失败时事务整体回滚，再逐条重试，单条仍然失败的返回异常对象。
+    skip_existing 用于重放日志，跳过 write_id 已经存在的条目。
+    """
+    if rows is None:
+        # 分词和向量在事务开始前计算，不占用 SQLite 写锁；逐条重试时复用
+        rows = {}
+        for entry in entries:
+            try:
+                rows[entry["id"]] = _message_row(entry)
+            except Exception as e:
+                rows[entry["id"]] = e
+
+    db = SessionLocal()
+    try:
+        begin_immediate(db.connection())
+        existing = _written_ids(db, entries) if skip_existing else set()
+        chat_ids = {entry["chat_id"] for entry in entries}
+        chats = {
+            chat.id: chat for chat in db.query(ChatHistory).filter(
+                ChatHistory.id.in_(chat_ids), ChatHistory.is_deleted == False
+            ).all()
+        }
+        results: Dict[str, Any] = {}
+        accepted = []
+        for entry in entries:
+            chat = chats.get(entry["chat_id"])
+            if isinstance(rows[entry["id"]], Exception):
+                results[entry["id"]] = rows[entry["id"]]
+            elif chat is None or chat.user_id != entry["user_id"] or entry["id"] in existing:
+                results[entry["id"]] = None
+            else:
+                accepted.append(entry)
+
+        if accepted:
+            accepted_rows = [rows[entry["id"]] for entry in accepted]
+            message_ids = db.scalars(
+                insert(ChatMessage).returning(ChatMessage.id, sort_by_parameter_order=True), accepted_rows
+            ).all()
+            # 服务端记录了token数的助手回复计入按小时汇总的用量统计（接口提交的消息没有用量字段）
+            for entry, row in zip(accepted, accepted_rows):
+                if row["role"] != "assistant" or row["completion_tokens"] is None:
+                    continue
+                metadata = row["message_metadata"] or {}
+                config_id = metadata.get("config_id")
+                latency = metadata.get("response_time")
+                record_usage(
+                    db,
+                    user_id=entry["user_id"],
+                    config_id=config_id if isinstance(config_id, int) else chats[entry["chat_id"]].config_id,
+                    created_at=row["created_at"],
+                    prompt_tokens=row["prompt_tokens"],
+                    completion_tokens=row["completion_tokens"],
+                    estimated=bool(row["usage_estimated"]),
+                    latency=latency if isinstance(latency, (int, float)) else None,
+                    ttft=row["ttft"]
+                )
+            # 每个聊天按这一批中最新的消息写入一个摘要刷新任务
+            last_message_ids = {}
+            for entry, message_id in zip(accepted, message_ids):
+                last_message_ids[entry["chat_id"]] = max(message_id, last_message_ids.get(entry["chat_id"], 0))
+            for chat_id, last_message_id in last_message_ids.items():
+                chat = chats[chat_id]
+                if chat.enable_context_summary:
+                    enqueue_summary_refresh(db, chat_id, chat.user_id, last_message_id)
+            db.commit()
+            results.update((entry["id"], message_id) for entry, message_id in zip(accepted, message_ids))
+    except Exception as e:
+        db.rollback()
+        db.close()
+        if len(entries) == 1:
+            return {entries[0]["id"]: e}
+        logger.warning(f"批量写入 {len(entries)} 条消息失败，逐条重试: {e}")
+        results = {}
+        for entry in entries:
+            results.update(write_messages([entry], skip_existing, rows))
+        return results
+
+    db.close()
+    # 每个聊天只清除一次缓存
+    for chat_id in {entry["chat_id"] for entry in accepted}:
+        invalidate_context_cache(chat_id)
+    return results
+
+
+def _read_journal(path: str) -> List[Dict[str, Any]]:
+    """读取日志中没有完成标记的消息（忽略崩溃时写了一半的最后一行）"""
+    pending: Dict[str, Dict[str, Any]] = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("op") == "add":
+                pending[record["id"]] = record
+            elif record.get("op") == "done":
+                for entry_id in record["ids"]:
+                    pending.pop(entry_id, None)
+    return list(pending.values())
+
+
+def recover_journals(directory: str) -> int:
+    """重放已退出进程留下的日志，返回写入的消息数"""
+    if not os.path.isdir(directory):
+        return 0
+    recovered = 0
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".jsonl"):
+            continue
+        try:
+            pid = int(filename[:-6])
+        except ValueError:
+            continue
+        # 与当前进程相同的 pid 只可能是上一次运行留下的（例如容器中的 1 号进程）
+        if pid != os.getpid() and _pid_alive(pid):
+            continue
+        path = os.path.join(directory, filename)
+        # 先改名再重放，多个工作进程同时启动时只有一个能拿到文件
+        claimed = f"{path}.recovering.{os.getpid()}"
+        try:
+            os.rename(path, claimed)
+        except OSError:
+            continue
+        entries = _read_journal(claimed)
+        failed = []
+        for start in range(0, len(entries), settings.MESSAGE_BATCH_SIZE):
+            batch = entries[start:start + settings.MESSAGE_BATCH_SIZE]
+            for entry_id, result in write_messages(batch, skip_existing=True).items():
+                if isinstance(result, Exception):
+                    failed.append(entry_id)
+                elif result is not None:
+                    recovered += 1
+        if failed:
+            # 保留文件以便人工处理
+            logger.error(f"重放日志 {filename} 时有 {len(failed)} 条消息写入失败，文件保留在 {claimed}")
+        else:
+            os.remove(claimed)
+    return recovered
+
+
+class MessageWriter:
+    """消息写入队列：追加日志、攒批写入数据库、通过 Future 通知调用方"""
+
+    def __init__(self, journal_dir: str, flush_interval: float, batch_size: int):
+        self.journal_dir = journal_dir
+        self.flush_interval = flush_interval
+        self.batch_size = max(1, batch_size)
+        self.journal_path = os.path.join(journal_dir, f"{os.getpid()}.jsonl")
+        self.failed_path = os.path.join(journal_dir, f"failed-{os.getpid()}.jsonl")
+        self._journal = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._futures: Dict[str, asyncio.Future] = {}
+        # 日志ID -> 提交消息的请求的粘滞键（写入后台任务中没有请求上下文，提交后代为记录写入）
+        self._sticky_keys: Dict[str, str] = {}
+        # 写入失败、等待重试的条目：日志ID -> (条目, 已重试次数)（存在时不截断日志）
+        self._failed: Dict[str, Tuple[Dict[str, Any], int]] = {}
+        self._retry_at = 0.0
+
+    def start(self):
+        os.makedirs(self.journal_dir, exist_ok=True)
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    def _append(self, record: Dict[str, Any]):
+        self._journal.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        self._journal.flush()
+
+    def submit(self, chat_id: int, message_data: ChatMessageCreate, user_id: int) -> asyncio.Future:
+        """写入日志并加入队列，返回的 Future 在提交后得到消息ID（聊天不存在时为 None）"""
+        entry = {
+            "op": "add",
+            # 同时写入 chat_messages.write_id，重放日志时据此去重
+            "id": uuid.uuid4().hex,
+            "chat_id": chat_id,
+            "user_id": user_id,
+            "created_at": get_current_time().isoformat(),
+            "message": message_data.model_dump(),
+        }
+        self._append(entry)
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(_log_failure)
+        self._futures[entry["id"]] = future
+        sticky_key = current_sticky_key()
+        if sticky_key:
+            self._sticky_keys[entry["id"]] = sticky_key
+        self._queue.put_nowait(entry)
+        message_write_queue.inc()
+        return future
+
+    def _retry_timeout(self) -> Optional[float]:
+        """距离下次重试的秒数（没有待重试的条目时为 None，一直等待新消息）"""
+        if not self._failed:
+            return None
+        return max(0.0, self._retry_at - time.monotonic())
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            try:
+                entry = await asyncio.wait_for(self._queue.get(), self._retry_timeout())
+            except asyncio.TimeoutError:
+                # 没有新消息时也按时重试失败的条目
+                await self._flush([])
+                continue
+            if entry is None:
+                break
+            batch = [entry]
+            if self.flush_interval > 0:
+                await asyncio.sleep(self.flush_interval)
+            while len(batch) < self.batch_size and not self._queue.empty():
+                entry = self._queue.get_nowait()
+                if entry is None:
+                    # 停止标记是最后一个条目，写完这一批后退出
+                    stopping = True
+                    break
+                batch.append(entry)
+            await self._flush(batch)
+        if self._failed:
+            # 停止前最后重试一次，仍然失败的留在日志中，下次启动时重放
+            await self._flush([], final=True)
+
+    async def _flush(self, batch: List[Dict[str, Any]], final: bool = False):
+        if batch:
+            message_write_queue.dec(amount=len(batch))
+            message_write_batch_size.observe(value=len(batch))
+        # 到了重试时间时，之前写入失败的条目随这一批重试，已经写入的按 write_id 跳过
+        retrying = bool(self._failed) and (final or time.monotonic() >= self._retry_at)
+        entries = batch + ([entry for entry, _ in self._failed.values()] if retrying else [])
+        if not entries:
+            return
+        try:
+            results = await asyncio.to_thread(write_messages, entries, retrying)
+        except Exception as e:
+            results = {entry["id"]: e for entry in entries}
+
+        done = []
+        written_keys = set()
+        for entry in entries:
+            result = results.get(entry["id"])
+            if isinstance(result, Exception):
+                _, retries = self._failed.get(entry["id"], (entry, -1))
+                if final:
+                    # 进程即将退出，等待的调用方得到异常，条目留在日志中
+                    self._resolve(entry["id"], error=result)
+                    continue
+                if retries < settings.MESSAGE_WRITE_RETRIES:
+                    # 调用方继续等待重试结果
+                    self._failed[entry["id"]] = (entry, retries + 1)
+                    continue
+                self._dead_letter(entry, result)
+                self._resolve(entry["id"], error=result)
+            else:
+                if result is not None and entry["id"] in self._sticky_keys:
+                    written_keys.add(self._sticky_keys[entry["id"]])
+                self._resolve(entry["id"], result=result)
+            self._failed.pop(entry["id"], None)
+            self._sticky_keys.pop(entry["id"], None)
+            done.append(entry["id"])
+        if done:
+            self._append({"op": "done", "ids": done})
+        # 之后该用户的读取走主库，能读到刚写入的消息
+        for key in written_keys:
+            mark_write(key)
+        if self._failed and not final:
+            # 按重试次数最少的条目计算退避时间
+            retries = min(count for _, count in self._failed.values())
+            self._retry_at = time.monotonic() + settings.MESSAGE_RETRY_DELAY * (2 ** retries)
+        if not self._futures and not self._failed and self._queue.empty():
+            # 全部写入完成，截断日志避免无限增长
+            self._journal.seek(0)
+            self._journal.truncate()
+
+    def _resolve(self, entry_id: str, result: Any = None, error: Optional[Exception] = None):
+        future = self._futures.pop(entry_id, None)
+        if future is None or future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def _dead_letter(self, entry: Dict[str, Any], error: Exception):
+        """多次重试仍然失败的消息转存到失败文件，从日志中移除"""
+        logger.error(f"聊天消息 {entry['id']} 重试 {settings.MESSAGE_WRITE_RETRIES} 次后仍然写入失败，已转存到 {self.failed_path}: {error}")
+        with open(self.failed_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(dict(entry, error=str(error)), ensure_ascii=False, default=str) + "\n")
+
+    async def stop(self):
+        """写完队列中剩余的消息后停止"""
+        if self._task is None:
+            return
+        self._queue.put_nowait(None)
+        try:
+            await self._task
+        finally:
+            self._task = None
+            self._journal.close()
+            if not self._failed:
+                try:
+                    os.remove(self.journal_path)
+                except OSError:
+                    pass
+
+
+def _log_failure(future: asyncio.Future):
+    """不等待结果的调用方看不到异常，在这里记录"""
+    if not future.cancelled() and future.exception() is not None:
+        logger.error(f"写入聊天消息失败: {future.exception()}")
+
+
+_writer: Optional[MessageWriter] = None
+
+
+async def start_message_writer() -> Optional[MessageWriter]:
+    """重放崩溃留下的日志并启动写入队列（应用启动时调用）"""
+    global _writer
+    if not settings.MESSAGE_WRITE_BEHIND or _writer is not None:
+        return _writer
+    recovered = await asyncio.to_thread(recover_journals, settings.MESSAGE_JOURNAL_DIR)
+    if recovered:
+        logger.warning(f"从日志中恢复了 {recovered} 条未写入的聊天消息")
+    _writer = MessageWriter(settings.MESSAGE_JOURNAL_DIR, settings.MESSAGE_FLUSH_INTERVAL, settings.MESSAGE_BATCH_SIZE)
+    _writer.start()
+    return _writer
+
+
+async def stop_message_writer():
+    """写完剩余消息并停止写入队列"""
+    global _writer
+    if _writer is None:
+        return
+    writer, _writer = _writer, None
+    await writer.stop()
+
+
+def enqueue_message(chat_id: int, message_data: ChatMessageCreate, user_id: int) -> asyncio.Future:
+    """提交消息，不需要等待写入时直接忽略返回的 Future
+
+    写入队列没有启动时（关闭了 MESSAGE_WRITE_BEHIND 或在脚本中使用）在线程中直接写入。
+    """
+    if _writer is not None:
+        return _writer.submit(chat_id, message_data, user_id)
+    future = asyncio.ensure_future(asyncio.to_thread(_add_message_directly, chat_id, message_data, user_id))
+    future.add_done_callback(_log_failure)
+    return future
+
+
+async def save_message(chat_id: int, message_data: ChatMessageCreate, user_id: int) -> Optional[int]:
+    """提交消息并等待写入，返回消息ID（聊天不存在时为 None）"""
+    return await enqueue_message(chat_id, message_data, user_id)
+
+
+def _add_message_directly(chat_id: int, message_data: ChatMessageCreate, user_id: int) -> Optional[int]:
+    db = SessionLocal()
+    try:
+        message = add_chat_message(db, chat_id, message_data, user_id)
+        return message.id if message else None
+    finally:
+        db.close()
@@ -0,0 +1,499 @@
+import os
+import json
+import time
+import asyncio
+import bisect
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from backend.core.config import settings
+from backend.core.tracing import record_span
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# 所有指标，按名称注册
+_metrics: Dict[str, "_Metric"] = {}
+# 采集时才计算的指标（例如缓存命中数），返回与 snapshot 相同格式的字典
+_collectors: List[Callable[[], Dict[str, Dict[str, Any]]]] = []
+_registry_lock = threading.Lock()
+
+
+class _Metric:
+    """指标基类：每个线程写自己的分片，采集时汇总所有分片
+
+    热路径上只访问线程本地的字典，不需要加锁。
+    """
+
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[Dict[Tuple[str, ...], Any]] = []
+        self._shards_lock = threading.Lock()
+        with _registry_lock:
+            _metrics[name] = self
+
+    def _values(self) -> Dict[Tuple[str, ...], Any]:
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            with self._shards_lock:
+                self._shards.append(values)
+            return values
+
+    def _merge(self, total, value):
+        return total + value
+
+    def collect(self) -> Dict[Tuple[str, ...], Any]:
+        """汇总所有线程分片"""
+        with self._shards_lock:
+            shards = list(self._shards)
+        merged: Dict[Tuple[str, ...], Any] = {}
+        for shard in shards:
+            for labels, value in list(shard.items()):
+                merged[labels] = self._merge(merged[labels], value) if labels in merged else _copy(value)
+        return merged
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "type": self.type,
+            "help": self.documentation,
+            "labels": list(self.labelnames),
+            "samples": [[list(labels), value] for labels, value in self.collect().items()],
+        }
+
+
+class Counter(_Metric):
+    """只增计数器"""
+
+    type = "counter"
+
+    def inc(self, *labelvalues: str, amount: float = 1.0):
+        values = self._values()
+        values[labelvalues] = values.get(labelvalues, 0) + amount
+
+
+class Gauge(_Metric):
+    """可增可减的数值（各分片求和）"""
+
+    type = "gauge"
+
+    def inc(self, *labelvalues: str, amount: float = 1.0):
+        values = self._values()
+        values[labelvalues] = values.get(labelvalues, 0) + amount
+
+    def dec(self, *labelvalues: str, amount: float = 1.0):
+        self.inc(*labelvalues, amount=-amount)
+
+
+class Histogram(_Metric):
+    """直方图：各桶独立计数，输出时转换为 Prometheus 的累计格式"""
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, *labelvalues: str, value: float):
+        values = self._values()
+        data = values.get(labelvalues)
+        if data is None:
+            # [各桶计数..., +Inf 桶计数, 总和]
+            data = values[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+        data[bisect.bisect_left(self.buckets, value)] += 1
+        data[-1] += value
+
+    def _merge(self, total, value):
+        return [a + b for a, b in zip(total, value)]
+
+    def snapshot(self) -> Dict[str, Any]:
+        snapshot = super().snapshot()
+        snapshot["buckets"] = list(self.buckets)
+        return snapshot
+
+
+def _copy(value):
+    return list(value) if isinstance(value, list) else value
+
+
+def register_collector(collector: Callable[[], Dict[str, Dict[str, Any]]]):
+    """注册采集时计算的指标"""
+    with _registry_lock:
+        _collectors.append(collector)
+
+
+def snapshot_metrics() -> Dict[str, Dict[str, Any]]:
+    """当前进程所有指标的快照（可序列化为JSON）"""
+    with _registry_lock:
+        metrics = list(_metrics.values())
+        collectors = list(_collectors)
+    snapshot = {metric.name: metric.snapshot() for metric in metrics}
+    for collector in collectors:
+        try:
+            snapshot.update(collector())
+        except Exception:
+            logger.exception("采集指标失败")
+    return snapshot
+
+
+# ---------------------------------------------------------------------------
+# 多进程汇总：每个工作进程把快照写入 METRICS_DIR/<pid>.json，抓取时合并所有存活进程的文件
+# ---------------------------------------------------------------------------
+
+_flush_task: Optional[asyncio.Task] = None
+
+
+def write_snapshot(directory: str):
+    """把当前进程的指标快照写入目录（先写临时文件再重命名，避免读到半个文件）"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{os.getpid()}.json")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(snapshot_metrics(), f)
+    os.replace(tmp_path, path)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def read_snapshots(directory: str) -> List[Dict[str, Dict[str, Any]]]:
+    """读取所有存活工作进程的快照，并清理已退出进程的文件"""
+    snapshots = []
+    for filename in os.listdir(directory):
+        if not filename.endswith(".json"):
+            continue
+        path = os.path.join(directory, filename)
+        try:
+            pid = int(filename[:-5])
+        except ValueError:
+            continue
+        if pid != os.getpid() and not _pid_alive(pid):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        try:
+            with open(path) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+
+def merge_snapshots(snapshots: List[Dict[str, Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+    """合并多个进程的快照（计数器、直方图和仪表值都按标签求和）"""
+    merged: Dict[str, Dict[str, Any]] = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.get(name)
+            if target is None:
+                target = merged[name] = {**metric, "samples": {}}
+            samples = target["samples"]
+            for labels, value in metric["samples"]:
+                key = tuple(labels)
+                if key not in samples:
+                    samples[key] = _copy(value)
+                elif isinstance(value, list):
+                    samples[key] = [a + b for a, b in zip(samples[key], value)]
+                else:
+                    samples[key] += value
+    for metric in merged.values():
+        metric["samples"] = [[list(labels), value] for labels, value in metric["samples"].items()]
+    return merged
+
+
+def collect_all() -> Dict[str, Dict[str, Any]]:
+    """采集指标：配置了 METRICS_DIR 时汇总所有工作进程，否则只返回当前进程"""
+    directory = settings.METRICS_DIR
+    if not directory:
+        return snapshot_metrics()
+    write_snapshot(directory)
+    return merge_snapshots(read_snapshots(directory))
+
+
+async def _flush_loop(directory: str, interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(write_snapshot, directory)
+        except Exception:
+            logger.exception("写入指标快照失败")
+
+
+def start_metrics_flusher() -> Optional[asyncio.Task]:
+    """多进程部署时定期写入本进程的指标快照（应用启动时调用）"""
+    global _flush_task
+    if not settings.METRICS_DIR or _flush_task is not None:
+        return _flush_task
+    _flush_task = asyncio.create_task(_flush_loop(settings.METRICS_DIR, settings.METRICS_FLUSH_INTERVAL))
+    return _flush_task
+
+
+async def stop_metrics_flusher():
+    """停止定期写入，并删除本进程的快照文件"""
+    global _flush_task
+    if _flush_task is None:
+        return
+    _flush_task.cancel()
+    try:
+        await _flush_task
+    except asyncio.CancelledError:
+        pass
+    _flush_task = None
+    try:
+        os.remove(os.path.join(settings.METRICS_DIR, f"{os.getpid()}.json"))
+    except OSError:
+        pass
+
+
+# ---------------------------------------------------------------------------
+# Prometheus 文本格式输出
+# ---------------------------------------------------------------------------
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: List[str], values: List[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def render_prometheus(metrics: Dict[str, Dict[str, Any]]) -> str:
+    """按 Prometheus 文本格式（0.0.4）输出指标"""
+    lines = []
+    for name in sorted(metrics):
+        metric = metrics[name]
+        labelnames = metric.get("labels", [])
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        for labels, value in sorted(metric["samples"], key=lambda sample: sample[0]):
+            if metric["type"] == "histogram":
+                cumulative = 0
+                for upper, count in zip(list(metric["buckets"]) + [float("inf")], value[:-1]):
+                    cumulative += count
+                    le = 'le="' + _format_value(float(upper)) + '"'
+                    lines.append(f"{name}_bucket{_format_labels(labelnames, labels, le)} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labelnames, labels)} {_format_value(value[-1])}")
+                lines.append(f"{name}_count{_format_labels(labelnames, labels)} {cumulative}")
+            else:
+                lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# ---------------------------------------------------------------------------
+# 应用指标
+# ---------------------------------------------------------------------------
+
+http_request_duration = Histogram(
+    "allin_http_request_duration_seconds", "HTTP请求处理时间（流式响应包含完整传输时间）",
+    ("method", "route", "status"),
+)
+active_streams = Gauge("allin_active_streams", "正在传输的流式响应数", ("route",))
+sse_bytes_sent = Counter("allin_sse_bytes_sent_total", "流式响应发送的字节数", ("route",))
+
+upstream_ttft = Histogram(
+    "allin_upstream_ttft_seconds", "模型服务首token延迟", ("upstream",),
+)
+upstream_duration = Histogram(
+    "allin_upstream_duration_seconds", "模型服务请求总耗时", ("upstream", "mode"),
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0),
+)
+
+# 已出现过的模型服务标签（base_url 由用户填写，需要限制标签数量）
+_upstream_labels: set = set()
+_upstream_labels_lock = threading.Lock()
+
+
+def upstream_label(base_url: str) -> str:
+    """模型服务的指标标签：只保留协议、主机和端口（去掉账号密码、路径和查询参数），
+    不同的主机超过 METRICS_MAX_UPSTREAMS 个后归入 other"""
+    try:
+        parts = urlsplit(base_url)
+        host = parts.hostname
+        if not host:
+            return "invalid"
+        label = f"{parts.scheme}://" + (f"[{host}]" if ":" in host else host) + (f":{parts.port}" if parts.port else "")
+    except ValueError:
+        return "invalid"
+    with _upstream_labels_lock:
+        if label in _upstream_labels:
+            return label
+        if len(_upstream_labels) >= settings.METRICS_MAX_UPSTREAMS:
+            return "other"
+        _upstream_labels.add(label)
+    return label
+
+
+db_statements = Counter("allin_db_statements_total", "执行的SQL语句数", ("operation",))
+db_read_sessions = Counter("allin_db_read_sessions_total", "只读会话的路由（replica: 只读连接，primary: 主库）", ("target",))
+db_statement_duration = Histogram(
+    "allin_db_statement_duration_seconds", "SQL语句执行时间", ("operation",), buckets=DB_BUCKETS,
+)
+
+tokenize_duration = Histogram(
+    "allin_tokenize_duration_seconds", "jieba分词和关键词提取耗时", (), buckets=DB_BUCKETS,
+)
+
+event_loop_lag = Histogram(
+    "allin_event_loop_lag_seconds", "事件循环调度延迟", (),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+event_loop_blocks = Counter("allin_event_loop_blocks_total", "事件循环阻塞超过阈值的次数", ("route",))
+
+message_write_queue = Gauge("allin_message_write_queue", "等待批量写入的聊天消息数")
+message_write_batch_size = Histogram(
+    "allin_message_write_batch_size", "每批写入的聊天消息数", (),
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+
+jobs_processed = Counter("allin_jobs_total", "执行的后台任务数（succeeded/retry/failed）", ("kind", "result"))
+job_duration = Histogram("allin_job_duration_seconds", "后台任务执行时间", ("kind",))
+
+
+def _cache_metrics() -> Dict[str, Dict[str, Any]]:
+    """进程内缓存的命中数、未命中数和当前大小"""
+    from backend.core.cache import get_cache_stats
+
+    stats = get_cache_stats()
+    def metric(metric_type, documentation, field):
+        return {
+            "type": metric_type,
+            "help": documentation,
+            "labels": ["cache"],
+            "samples": [[[name], values[field]] for name, values in stats.items()],
+        }
+    return {
+        "allin_cache_hits_total": metric("counter", "缓存命中次数", "hits"),
+        "allin_cache_misses_total": metric("counter", "缓存未命中次数", "misses"),
+        "allin_cache_entries": metric("gauge", "缓存条目数", "size"),
+    }
+
+
+def _cache_hit_ratio(metrics: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """由合并后的命中数和未命中数计算命中率"""
+    hits = {labels[0]: value for labels, value in metrics.get("allin_cache_hits_total", {}).get("samples", [])}
+    misses = {labels[0]: value for labels, value in metrics.get("allin_cache_misses_total", {}).get("samples", [])}
+    samples = []
+    for name in sorted(set(hits) | set(misses)):
+        total = hits.get(name, 0) + misses.get(name, 0)
+        samples.append([[name], hits.get(name, 0) / total if total else 0.0])
+    return {"type": "gauge", "help": "缓存命中率", "labels": ["cache"], "samples": samples}
+
+
+register_collector(_cache_metrics)
+
+
+def render_metrics() -> str:
+    """采集并输出所有指标"""
+    metrics = collect_all()
+    metrics["allin_cache_hit_ratio"] = _cache_hit_ratio(metrics)
+    return render_prometheus(metrics)
+
+
+# ---------------------------------------------------------------------------
+# 采集钩子
+# ---------------------------------------------------------------------------
+
+def _statement_operation(statement: str) -> str:
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return operation if operation in ("SELECT", "INSERT", "UPDATE", "DELETE", "PRAGMA") else "OTHER"
+
+
+def instrument_engine(engine):
+    """统计数据库语句数量和耗时"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("metrics_query_start")
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        operation = _statement_operation(statement)
+        db_statements.inc(operation)
+        db_statement_duration.observe(operation, value=elapsed)
+        record_span("db", elapsed)
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("metrics_query_start"):
+            conn.info["metrics_query_start"].pop()
+
+
+class MetricsMiddleware:
+    """记录每个路由的处理时间，以及流式响应的并发数和发送字节数（纯ASGI中间件，不缓冲响应体）"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        state = {"status": 500, "streaming": False}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+                for key, value in message.get("headers", []):
+                    if key.lower() == b"content-type" and value.startswith(b"text/event-stream"):
+                        state["streaming"] = True
+                        active_streams.inc(_route_path(scope))
+                        break
+            elif message["type"] == "http.response.body" and state["streaming"]:
+                sse_bytes_sent.inc(_route_path(scope), amount=len(message.get("body", b"")))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = _route_path(scope)
+            if state["streaming"]:
+                active_streams.dec(route)
+            http_request_duration.observe(
+                scope["method"], route, str(state["status"]), value=time.perf_counter() - started
+            )
+
+
+def _route_path(scope) -> str:
+    """使用路由模板（如 /api/models/{model_id}）作为标签，避免标签基数无限增长"""
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    return path if path else "unmatched"
@@ -0,0 +1,196 @@
+import time
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import httpx
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from backend.core.config import settings
+from backend.database.database import SessionLocal
+from backend.models.chat import get_current_time, shanghai_tz
+from backend.models.model import ModelConfig, ModelInstance
+
+logger = logging.getLogger(__name__)
+
+# 健康检查结果在 model_instances 表中使用的实例名
+HEALTH_INSTANCE_NAME = "health"
+
+# 最近一次探测的耗时和错误信息（表中没有对应字段，只保存在进程内）
+_probe_details: Dict[int, Dict[str, Any]] = {}
+
+_refresher_task: Optional[asyncio.Task] = None
+
+
+def _as_aware(value: Optional[datetime]) -> Optional[datetime]:
+    """SQLite 读回的时间不带时区，按写入时使用的上海时区处理"""
+    if value is None or value.tzinfo is not None:
+        return value
+    return shanghai_tz.localize(value)
+
+
+def is_health_stale(instance: Optional[ModelInstance], ttl: Optional[float] = None) -> bool:
+    """健康状态是否需要重新探测"""
+    ttl = settings.MODEL_HEALTH_TTL if ttl is None else ttl
+    if instance is None or instance.last_used is None:
+        return True
+    return get_current_time() - _as_aware(instance.last_used) > timedelta(seconds=ttl)
+
+
+async def probe_model_endpoint(client: httpx.AsyncClient, base_url: str, api_key: str) -> Dict[str, Any]:
+    """探测模型服务是否可用（请求 /v1/models，不消耗token）"""
+    started = time.perf_counter()
+    try:
+        response = await client.get(
+            f"{base_url}/v1/models",
+            headers={"Authorization": f"Bearer {api_key}"}
+        )
+        latency = time.perf_counter() - started
+        if response.status_code < 400:
+            return {"status": "running", "latency": latency, "error": None}
+        return {"status": "error", "latency": latency, "error": f"HTTP {response.status_code}"}
+    except Exception as e:
+        return {"status": "error", "latency": time.perf_counter() - started, "error": f"{type(e).__name__}: {e}"}
+
+
+async def probe_model_configs(configs: List[Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+    """并发探测多个模型配置，返回 config_id -> 探测结果"""
+    if not configs:
+        return {}
+
+    semaphore = asyncio.Semaphore(settings.MODEL_HEALTH_CONCURRENCY)
+    timeout = httpx.Timeout(settings.MODEL_HEALTH_TIMEOUT, connect=min(settings.MODEL_HEALTH_TIMEOUT, 3.0))
+
+    async with httpx.AsyncClient(timeout=timeout) as client:
+        async def probe(config):
+            async with semaphore:
+                return config["id"], await probe_model_endpoint(client, config["base_url"], config["api_key"])
+
+        results = await asyncio.gather(*(probe(config) for config in configs))
+
+    checked_at = get_current_time()
+    for config_id, result in results:
+        result["checked_at"] = checked_at
+        _probe_details[config_id] = result
+    return dict(results)
+
+
+def get_health_instances(db: Session, config_ids: List[int]) -> Dict[int, ModelInstance]:
+    """读取模型配置对应的健康状态记录"""
+    if not config_ids:
+        return {}
+    instances = db.query(ModelInstance).filter(
+        ModelInstance.config_id.in_(config_ids),
+        ModelInstance.instance_name == HEALTH_INSTANCE_NAME
+    ).all()
+    return {instance.config_id: instance for instance in instances}
+
+
+def save_health_results(db: Session, results: Dict[int, Dict[str, Any]]):
+    """把探测结果写入 model_instances（status 为状态，last_used 为探测时间，loaded_at 为最近一次可用时间）
+
+    后台刷新和 /api/models/health 可能同时写入同一模型，按 (config_id, instance_name) 唯一索引 upsert。
+    """
+    if not results:
+        return
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    table = ModelInstance.__table__
+    for config_id, result in results.items():
+        values = {"status": result["status"], "last_used": result["checked_at"]}
+        if result["status"] == "running":
+            values["loaded_at"] = result["checked_at"]
+        statement = dialect.insert(table).values(config_id=config_id, instance_name=HEALTH_INSTANCE_NAME, **values)
+        db.execute(statement.on_conflict_do_update(
+            index_elements=["config_id", "instance_name"],
+            set_={**values, "updated_at": func.now()}
+        ))
+    db.commit()
+
+
+def build_health_entry(config: Dict[str, Any], instance: Optional[ModelInstance], cached: bool) -> Dict[str, Any]:
+    """组装单个模型的健康状态"""
+    details = _probe_details.get(config["id"], {})
+    return {
+        "config_id": config["id"],
+        "name": config["name"],
+        "status": instance.status if instance else "unknown",
+        "checked_at": _as_aware(instance.last_used) if instance else None,
+        "last_healthy_at": _as_aware(instance.loaded_at) if instance else None,
+        "latency": details.get("latency"),
+        "error": details.get("error"),
+        "cached": cached,
+    }
+
+
+def _config_probe_info(config: ModelConfig) -> Dict[str, Any]:
+    return {"id": config.id, "name": config.name, "base_url": config.base_url, "api_key": config.api_key}
+
+
+def _load_stale_configs(ttl: float) -> List[Dict[str, Any]]:
+    """读取所有健康状态已过期的激活模型配置"""
+    db = SessionLocal()
+    try:
+        configs = db.query(ModelConfig).filter(ModelConfig.is_active == True).all()
+        instances = get_health_instances(db, [config.id for config in configs])
+        return [
+            _config_probe_info(config) for config in configs
+            if is_health_stale(instances.get(config.id), ttl)
+        ]
+    finally:
+        db.close()
+
+
+def _save_results_in_new_session(results: Dict[int, Dict[str, Any]]):
+    db = SessionLocal()
+    try:
+        save_health_results(db, results)
+    finally:
+        db.close()
+
+
+async def refresh_model_health() -> int:
+    """刷新所有过期的健康状态，返回探测数量
+
+    多个工作进程都会运行刷新任务，只探测已过期的记录可避免重复探测。
+    """
+    configs = await asyncio.to_thread(_load_stale_configs, settings.MODEL_HEALTH_TTL)
+    results = await probe_model_configs(configs)
+    await asyncio.to_thread(_save_results_in_new_session, results)
+    return len(results)
+
+
+async def _refresh_loop(interval: float):
+    while True:
+        try:
+            await refresh_model_health()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("刷新模型健康状态失败")
+        await asyncio.sleep(interval)
+
+
+def start_health_refresher() -> Optional[asyncio.Task]:
+    """启动后台健康检查任务（应用启动时调用）"""
+    global _refresher_task
+    interval = settings.MODEL_HEALTH_REFRESH_INTERVAL
+    if interval <= 0 or _refresher_task is not None:
+        return _refresher_task
+    _refresher_task = asyncio.create_task(_refresh_loop(interval))
+    return _refresher_task
+
+
+async def stop_health_refresher():
+    """停止后台健康检查任务"""
+    global _refresher_task
+    if _refresher_task is None:
+        return
+    _refresher_task.cancel()
+    try:
+        await _refresher_task
+    except asyncio.CancelledError:
+        pass
+    _refresher_task = None
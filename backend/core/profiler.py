@@ -0,0 +1,129 @@
+import os
+import sys
+import time
+import asyncio
+import threading
+import tracemalloc
+from collections import Counter
+from typing import Any, Dict, List
+
+from backend.core.config import settings
+
+# 同一时间只允许一个分析任务，避免互相干扰
+_profile_lock = asyncio.Lock()
+
+_project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_MEMORY_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+
+class ProfilerBusyError(RuntimeError):
+    """已有分析任务在运行"""
+
+
+def _short_path(filename: str) -> str:
+    if filename.startswith(_project_root):
+        return os.path.relpath(filename, _project_root)
+    marker = "site-packages" + os.sep
+    index = filename.find(marker)
+    if index >= 0:
+        return filename[index + len(marker):]
+    return os.path.basename(filename)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _collapse(frame, thread_name: str) -> str:
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.append(thread_name)
+    return ";".join(reversed(labels))
+
+
+def sample_stacks(duration: float, interval: float) -> Dict[str, Any]:
+    """在当前线程中定时采样其它所有线程的调用栈，返回折叠格式的计数
+
+    只读取 sys._current_frames()，被采样的线程不需要任何改动，开销与采样频率成正比。
+    """
+    own_ident = threading.get_ident()
+    stacks: Counter = Counter()
+    samples = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            stacks[_collapse(frame, names.get(ident, f"thread-{ident}"))] += 1
+        samples += 1
+        time.sleep(interval)
+    return {"samples": samples, "stacks": stacks}
+
+
+def render_collapsed(stacks: Counter) -> str:
+    """flamegraph.pl / speedscope 可直接读取的折叠栈文本"""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+async def run_cpu_profile(duration: float, interval: float) -> Dict[str, Any]:
+    if _profile_lock.locked():
+        raise ProfilerBusyError("已有分析任务在运行")
+    async with _profile_lock:
+        return await asyncio.to_thread(sample_stacks, duration, interval)
+
+
+def _memory_location(traceback) -> List[str]:
+    return [f"{_short_path(frame.filename)}:{frame.lineno}" for frame in traceback]
+
+
+async def run_memory_diff(duration: float, limit: int, frames: int, group_by: str = "lineno") -> Dict[str, Any]:
+    """间隔 duration 秒拍两次 tracemalloc 快照，返回增长最多的分配位置
+
+    如果 tracemalloc 未开启，则临时开启并在结束后关闭（开启期间分配会变慢）。
+    """
+    if _profile_lock.locked():
+        raise ProfilerBusyError("已有分析任务在运行")
+    async with _profile_lock:
+        started_here = not tracemalloc.is_tracing()
+        if started_here:
+            tracemalloc.start(frames)
+        try:
+            before = tracemalloc.take_snapshot().filter_traces(_MEMORY_FILTERS)
+            await asyncio.sleep(duration)
+            after = tracemalloc.take_snapshot().filter_traces(_MEMORY_FILTERS)
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            if started_here:
+                tracemalloc.stop()
+
+    stats = after.compare_to(before, group_by)
+    return {
+        "duration": duration,
+        "group_by": group_by,
+        "traced_current_kb": round(current / 1024, 1),
+        "traced_peak_kb": round(peak / 1024, 1),
+        "top": [
+            {
+                "location": _memory_location(stat.traceback),
+                "size_diff_kb": round(stat.size_diff / 1024, 1),
+                "size_kb": round(stat.size / 1024, 1),
+                "count_diff": stat.count_diff,
+                "count": stat.count,
+            }
+            for stat in stats[:limit]
+        ],
+    }
+
+
+def clamp_duration(seconds: float) -> float:
+    return max(0.1, min(seconds, settings.PROFILE_MAX_SECONDS))
+
@@ -0,0 +1,175 @@
+import time
+import logging
+import threading
+import contextvars
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from backend.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 当前请求执行过的语句计数（语句文本 -> [次数, 总耗时]），不在请求中执行的语句为 None
+_request_queries: contextvars.ContextVar[Optional[Dict[str, List[float]]]] = contextvars.ContextVar(
+    "request_queries", default=None
+)
+
+_lock = threading.Lock()
+_slow_queries: deque = deque(maxlen=settings.QUERY_LOG_SIZE)
+_n_plus_one: deque = deque(maxlen=settings.QUERY_LOG_SIZE)
+# 全局语句统计：语句文本 -> {count, total, max}
+_statements: Dict[str, Dict[str, float]] = {}
+_requests = {"count": 0, "queries": 0}
+
+
+def _explain(conn, statement: str, parameters) -> Optional[List[str]]:
+    """获取查询计划（只对 SELECT 执行，使用独立游标，不影响当前结果集）"""
+    if not statement.lstrip().upper().startswith("SELECT"):
+        return None
+    prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return [" ".join(str(column) for column in row) for row in cursor.fetchall()]
+    except Exception as e:
+        return [f"EXPLAIN失败: {e}"]
+    finally:
+        cursor.close()
+
+
+def _record_statement(conn, statement: str, parameters, elapsed: float, executemany: bool):
+    with _lock:
+        stats = _statements.get(statement)
+        if stats is None:
+            stats = _statements[statement] = {"count": 0, "total": 0.0, "max": 0.0}
+        stats["count"] += 1
+        stats["total"] += elapsed
+        stats["max"] = max(stats["max"], elapsed)
+
+    queries = _request_queries.get()
+    if queries is not None:
+        entry = queries.setdefault(statement, [0, 0.0])
+        entry[0] += 1
+        entry[1] += elapsed
+
+    if elapsed >= settings.SLOW_QUERY_THRESHOLD:
+        plan = None if executemany else _explain(conn, statement, parameters)
+        logger.warning("慢查询 %.1fms: %s\n查询计划: %s", elapsed * 1000, statement, plan)
+        with _lock:
+            _slow_queries.append({
+                "statement": statement,
+                # 参数可能包含密码哈希和API密钥，默认不记录
+                "parameters": repr(parameters)[:500] if settings.QUERY_LOG_PARAMETERS else None,
+                "duration_ms": round(elapsed * 1000, 3),
+                "plan": plan,
+                "at": time.time(),
+            })
+
+
+def instrument_query_log(engine):
+    """记录慢查询和每个请求的重复语句（调试用，由 QUERY_DEBUG 开启）"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_log_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("query_log_start")
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        try:
+            _record_statement(conn, statement, parameters, elapsed, executemany)
+        except Exception:
+            logger.exception("记录SQL语句失败")
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_log_start"):
+            conn.info["query_log_start"].pop()
+
+
+def _finish_request(method: str, route: str, queries: Dict[str, List[float]]):
+    """请求结束：同一语句执行次数达到阈值时记为 N+1"""
+    total = sum(count for count, _ in queries.values())
+    with _lock:
+        _requests["count"] += 1
+        _requests["queries"] += total
+    for statement, (count, duration) in queries.items():
+        if count < settings.N_PLUS_ONE_THRESHOLD:
+            continue
+        logger.warning("疑似N+1查询: %s %s 执行同一语句 %d 次: %s", method, route, count, statement)
+        with _lock:
+            _n_plus_one.append({
+                "method": method,
+                "route": route,
+                "statement": statement,
+                "count": count,
+                "duration_ms": round(duration * 1000, 3),
+                "request_queries": total,
+                "at": time.time(),
+            })
+
+
+def get_query_summary(limit: int = 20) -> Dict[str, Any]:
+    """慢查询、N+1 记录和耗时最多的语句"""
+    with _lock:
+        statements = [
+            {
+                "statement": statement,
+                "count": stats["count"],
+                "total_ms": round(stats["total"] * 1000, 3),
+                "avg_ms": round(stats["total"] * 1000 / stats["count"], 3),
+                "max_ms": round(stats["max"] * 1000, 3),
+            }
+            for statement, stats in _statements.items()
+        ]
+        slow_queries = list(_slow_queries)
+        n_plus_one = list(_n_plus_one)
+        requests = dict(_requests)
+    statements.sort(key=lambda item: item["total_ms"], reverse=True)
+    return {
+        "enabled": settings.QUERY_DEBUG,
+        "slow_query_threshold_ms": settings.SLOW_QUERY_THRESHOLD * 1000,
+        "n_plus_one_threshold": settings.N_PLUS_ONE_THRESHOLD,
+        "requests": requests["count"],
+        "avg_queries_per_request": round(requests["queries"] / requests["count"], 2) if requests["count"] else None,
+        "slow_queries": slow_queries[-limit:][::-1],
+        "n_plus_one": n_plus_one[-limit:][::-1],
+        "top_statements": statements[:limit],
+    }
+
+
+def reset_query_log():
+    with _lock:
+        _slow_queries.clear()
+        _n_plus_one.clear()
+        _statements.clear()
+        _requests.update(count=0, queries=0)
+
+
+class QueryLogMiddleware:
+    """统计每个请求执行的SQL语句（纯ASGI中间件）"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        queries: Dict[str, List[float]] = {}
+        token = _request_queries.set(queries)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_queries.reset(token)
+            route = getattr(scope.get("route"), "path", None) or scope["path"]
+            try:
+                _finish_request(scope["method"], route, queries)
+            except Exception:
+                logger.exception("统计请求SQL语句失败")
@@ -0,0 +1,20 @@
+"""
+快速 JSON 响应
+
+聊天详情和历史列表这类大响应直接用 SQLAlchemy Core 查询需要的列，组装成字典后用 orjson 序列化，
+跳过 ORM 对象构造和 Pydantic 校验。路由上仍然声明 response_model，OpenAPI 文档不变；
+直接返回 Response 时 FastAPI 不再按 response_model 处理，所以字典的字段和格式需要与响应模型一致。
+"""
+
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class FastJSONResponse(JSONResponse):
+    """使用 orjson 序列化的 JSON 响应（datetime 输出格式与 Pydantic 相同）"""
+
+    def render(self, content: Any) -> bytes:
+        # UTC 时间以 Z 结尾，与 Pydantic 一致
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
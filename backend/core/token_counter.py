@@ -0,0 +1,57 @@
+import math
+import re
+from typing import Any, Dict, List, Optional
+
+# 中文、日文、韩文字符 / 英文单词和数字 / 其他非空白字符（标点、符号）
+_CJK_PATTERN = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]')
+_WORD_PATTERN = re.compile(r'[A-Za-z]+|\d+')
+_SYMBOL_PATTERN = re.compile(r'[^\sA-Za-z0-9\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]')
+
+# 每条消息的格式开销（角色标记、分隔符），与 OpenAI 的计算方式接近
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 3
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """本地估算文本的token数（上游未返回usage时使用）
+
+    按常见BPE分词器的经验值：中日韩字符约1个token，
+    英文单词约每4个字母1个token，数字约每3位1个token，标点符号各1个token。
+    """
+    if not text:
+        return 0
+    tokens = len(_CJK_PATTERN.findall(text)) + len(_SYMBOL_PATTERN.findall(text))
+    for word in _WORD_PATTERN.findall(text):
+        tokens += math.ceil(len(word) / (3 if word.isdigit() else 4))
+    return tokens
+
+
+def estimate_prompt_tokens(messages: List[Dict[str, Any]]) -> int:
+    """估算对话消息列表作为输入时的token数"""
+    total = TOKENS_PER_REPLY
+    for message in messages:
+        total += TOKENS_PER_MESSAGE + estimate_tokens(str(message.get("content") or ""))
+    return total
+
+
+def normalize_usage(usage: Optional[Dict[str, Any]], messages: List[Dict[str, Any]], completion: str) -> Dict[str, Any]:
+    """整理上游返回的usage；缺失的字段用本地估算补齐，并标记 estimated"""
+    usage = dict(usage or {})
+    estimated = False
+    if usage.get("prompt_tokens") is None:
+        usage["prompt_tokens"] = estimate_prompt_tokens(messages)
+        estimated = True
+    if usage.get("completion_tokens") is None:
+        usage["completion_tokens"] = estimate_tokens(completion)
+        estimated = True
+    if usage.get("total_tokens") is None or estimated:
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+    usage["estimated"] = estimated
+    return usage
+
+
+def tokens_per_second(completion_tokens: Optional[int], duration: Optional[float]) -> Optional[float]:
+    """生成速度（token/秒）"""
+    if not completion_tokens or not duration or duration <= 0:
+        return None
+    return completion_tokens / duration
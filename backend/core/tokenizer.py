@@ -0,0 +1,137 @@
+import os
+import sys
+import time
+import hashlib
+import logging
+import marshal
+import threading
+from typing import Any, Dict, Optional
+
+import jieba
+
+from backend.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 预热状态
+_ready = threading.Event()
+_configured = False
+_config_lock = threading.Lock()
+_init_lock = threading.Lock()
+_warmup_thread: Optional[threading.Thread] = None
+_status: Dict[str, Any] = {
+    "state": "cold",  # cold, warming, ready, error
+    "cache_file": None,
+    "cache_hit": None,
+    "user_dict": None,
+    "load_seconds": None,
+    "error": None,
+}
+
+
+def _cache_file_name() -> str:
+    """生成带版本号的前缀词典缓存文件名
+
+    jieba 对默认词典的缓存不做过期校验，因此把 jieba 版本、marshal 版本
+    和词典文件的大小/修改时间编码进文件名，升级后自动使用新缓存。
+    """
+    dict_path = jieba.dt.dictionary or os.path.join(os.path.dirname(jieba.__file__), jieba.DEFAULT_DICT_NAME)
+    try:
+        stat = os.stat(dict_path)
+        dict_sig = f"{dict_path}:{stat.st_size}:{int(stat.st_mtime)}"
+    except OSError:
+        dict_sig = str(dict_path)
+    digest = hashlib.md5(
+        f"{jieba.__version__}|{marshal.version}|{sys.version_info[:2]}|{dict_sig}".encode("utf-8")
+    ).hexdigest()[:12]
+    return f"jieba-{jieba.__version__}-{digest}.cache"
+
+
+def configure_tokenizer():
+    """设置缓存目录和缓存文件（只执行一次，且必须在第一次分词前调用）"""
+    global _configured
+    with _config_lock:
+        if _configured:
+            return
+        cache_dir = settings.TOKENIZER_CACHE_DIR
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            jieba.dt.tmp_dir = cache_dir
+            jieba.dt.cache_file = _cache_file_name()
+            _status["cache_file"] = os.path.join(cache_dir, jieba.dt.cache_file)
+        except OSError as e:
+            # 缓存目录不可写时退回 jieba 默认的临时目录
+            logger.warning("分词缓存目录不可用，使用默认临时目录: %s", e)
+        jieba.setLogLevel(logging.INFO)
+        _configured = True
+
+
+def init_tokenizer():
+    """同步初始化分词器：加载前缀词典、用户词典并做一次预热分词"""
+    with _init_lock:
+        if _ready.is_set():
+            return
+        _init_tokenizer_locked()
+
+
+def _init_tokenizer_locked():
+    configure_tokenizer()
+    _status["state"] = "warming"
+    started = time.time()
+    try:
+        cache_file = _status["cache_file"]
+        _status["cache_hit"] = bool(cache_file and os.path.isfile(cache_file))
+
+        jieba.initialize()
+
+        user_dict = settings.TOKENIZER_USER_DICT
+        if user_dict:
+            if os.path.isfile(user_dict):
+                jieba.load_userdict(user_dict)
+                _status["user_dict"] = user_dict
+            else:
+                logger.warning("用户词典不存在: %s", user_dict)
+
+        # 预热一次，触发正则和HMM模型的加载
+        list(jieba.cut("预热分词器 warm up tokenizer"))
+
+        _status["load_seconds"] = round(time.time() - started, 3)
+        _status["state"] = "ready"
+        logger.info("分词器预热完成，耗时 %.3fs（缓存命中: %s）", _status["load_seconds"], _status["cache_hit"])
+    except Exception as e:
+        _status["state"] = "error"
+        _status["error"] = str(e)
+        logger.exception("分词器预热失败")
+    finally:
+        # 失败时也放行，后续分词由 jieba 自行懒加载
+        _ready.set()
+
+
+def start_tokenizer_warmup() -> threading.Thread:
+    """在后台线程中预热分词器（应用启动时调用）"""
+    global _warmup_thread
+    configure_tokenizer()
+    if _warmup_thread is None:
+        _warmup_thread = threading.Thread(target=init_tokenizer, name="jieba-warmup", daemon=True)
+        _warmup_thread.start()
+    return _warmup_thread
+
+
+def ensure_tokenizer_ready(timeout: Optional[float] = None) -> bool:
+    """确保分词器可用：预热进行中则等待，未启动则同步初始化"""
+    if _ready.is_set():
+        return True
+    if _warmup_thread is None:
+        init_tokenizer()
+        return True
+    return _ready.wait(timeout)
+
+
+def is_tokenizer_ready() -> bool:
+    """分词器是否已就绪"""
+    return _ready.is_set() and _status["state"] == "ready"
+
+
+def get_tokenizer_status() -> Dict[str, Any]:
+    """获取分词器状态"""
+    return {"ready": is_tokenizer_ready(), **_status}
@@ -0,0 +1,203 @@
+import os
+import re
+import json
+import time
+import asyncio
+import inspect
+import uuid
+import random
+import logging
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from backend.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 当前请求的追踪（未采样的请求为 None，span 直接跳过）
+_current_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("current_trace", default=None)
+# 当前所在的 span ID，用于记录父子关系
+_current_span: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("current_span", default=None)
+
+_file_lock = threading.Lock()
+_TOKEN_PATTERN = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+class Trace:
+    """一次请求的追踪记录"""
+
+    def __init__(self, method: str, path: str):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.method = method
+        self.path = path
+        self.route: Optional[str] = None
+        self.status: Optional[int] = None
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._started) * 1000
+
+    def start_span(self, name: str, parent: Optional[int]) -> Dict[str, Any]:
+        with self._lock:
+            span = {"id": len(self.spans), "parent": parent, "name": name, "start": self.elapsed_ms(), "dur": None}
+            self.spans.append(span)
+        return span
+
+    def server_timing(self) -> str:
+        """按名称汇总已完成的 span，生成 Server-Timing 响应头"""
+        totals: Dict[str, List[float]] = {}
+        for span in self.spans:
+            if span["dur"] is not None:
+                entry = totals.setdefault(span["name"], [0.0, 0])
+                entry[0] += span["dur"]
+                entry[1] += 1
+        parts = [f"total;dur={self.elapsed_ms():.1f}"]
+        for name, (duration, count) in totals.items():
+            part = f"{_TOKEN_PATTERN.sub('_', name)};dur={duration:.1f}"
+            if count > 1:
+                part += f';desc="x{count}"'
+            parts.append(part)
+        return ", ".join(parts)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status": self.status,
+            "started_at": self.started_at,
+            "duration_ms": round(self.elapsed_ms(), 3),
+            "spans": [
+                {**span, "start": round(span["start"], 3), "dur": None if span["dur"] is None else round(span["dur"], 3)}
+                for span in self.spans
+            ],
+        }
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str):
+    """记录一段代码的耗时（当前请求未采样时几乎没有开销）"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    record = trace.start_span(name, _current_span.get())
+    token = _current_span.set(record["id"])
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record["dur"] = (time.perf_counter() - started) * 1000
+        _current_span.reset(token)
+
+
+def record_span(name: str, duration: float):
+    """记录一段已经结束的耗时（秒），用于无法包裹成上下文的代码，例如数据库事件"""
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    record = trace.start_span(name, _current_span.get())
+    record["start"] -= duration * 1000
+    record["dur"] = duration * 1000
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """函数装饰器：把整个函数调用记录为一个 span（支持同步和异步函数）
+
+    默认名称为去掉 backend. 前缀的模块名加函数名，例如 crud.chat.get_chat_history。
+    """
+    def decorator(func: Callable) -> Callable:
+        span_name = name or f"{func.__module__.replace('backend.', '', 1)}.{func.__name__}"
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if _current_trace.get() is None:
+                    return await func(*args, **kwargs)
+                with span(span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_trace.get() is None:
+                return func(*args, **kwargs)
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _should_sample(headers: Dict[bytes, bytes]) -> bool:
+    if settings.TRACE_ALLOW_FORCE and headers.get(b"x-trace") in (b"1", b"true"):
+        return True
+    rate = settings.TRACE_SAMPLE_RATE
+    return rate > 0 and (rate >= 1 or random.random() < rate)
+
+
+def write_trace(trace: Trace, path: str):
+    """把追踪记录追加到 JSONL 文件（同步写文件，在事件循环中请通过线程调用）"""
+    line = json.dumps(trace.to_dict(), ensure_ascii=False)
+    with _file_lock:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+class TracingMiddleware:
+    """请求追踪中间件（纯ASGI）
+
+    按 TRACE_SAMPLE_RATE 采样（开启 TRACE_ALLOW_FORCE 时请求头 X-Trace: 1 强制采样），在响应头中加入
+    Server-Timing 和 X-Trace-Id；配置 TRACE_FILE 时请求结束后在线程中把完整记录写入 JSONL。
+    流式响应的响应头在传输开始时发送，之后完成的 span 只出现在 JSONL 中。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        if not _should_sample(headers):
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(scope["method"], scope["path"])
+        token = _current_trace.set(trace)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                trace.status = message["status"]
+                response_headers = list(message.get("headers", []))
+                response_headers.append((b"server-timing", trace.server_timing().encode("latin-1")))
+                response_headers.append((b"x-trace-id", trace.trace_id.encode("latin-1")))
+                message = {**message, "headers": response_headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_trace.reset(token)
+            route = scope.get("route")
+            trace.route = getattr(route, "path", None)
+            if settings.TRACE_FILE:
+                try:
+                    await asyncio.to_thread(write_trace, trace, settings.TRACE_FILE)
+                except OSError:
+                    logger.exception("写入追踪记录失败")
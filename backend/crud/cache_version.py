@@ -0,0 +1,59 @@
+import time
+import threading
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects import postgresql, sqlite
+from backend.models.cache_version import CacheVersion
+from backend.core.cache import LRUCache
+
+def get_cache_version(db: Session, name: str) -> int:
+    """读取缓存版本号"""
+    version = db.query(CacheVersion.version).filter(CacheVersion.name == name).scalar()
+    return version or 0
+
+def bump_cache_version(db: Session, name: str):
+    """递增缓存版本号（在调用方的事务中执行，随数据修改一起提交）
+
+    版本记录不存在时插入，多个进程同时写入第一条记录也不会主键冲突。
+    """
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    table = CacheVersion.__table__
+    statement = dialect.insert(table).values(name=name, version=1)
+    statement = statement.on_conflict_do_update(
+        index_elements=["name"],
+        set_={"version": table.c.version + 1, "updated_at": func.now()}
+    )
+    db.execute(statement)
+
+class CacheVersionSync:
+    """进程内缓存与数据库版本号同步
+
+    写入方在同一事务中递增版本号；读取方最多每 interval 秒检查一次版本号，
+    发现变化时清空本进程缓存，因此其他进程的修改最多延迟 interval 秒可见。
+    """
+    
+    def __init__(self, cache: LRUCache, name: str, interval: float = 1.0):
+        self.cache = cache
+        self.name = name
+        self.interval = interval
+        self._known_version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+    
+    def sync(self, db: Session):
+        """必要时检查版本号，过期则清空缓存"""
+        now = time.monotonic()
+        if now - self._checked_at < self.interval:
+            return
+        with self._lock:
+            if now - self._checked_at < self.interval:
+                return
+            version = get_cache_version(db, self.name)
+            if self._known_version is not None and version != self._known_version:
+                self.cache.clear()
+            self._known_version = version
+            self._checked_at = now
+    
+    def bump(self, db: Session):
+        """记录一次写入（需要调用方提交事务）"""
+        bump_cache_version(db, self.name)
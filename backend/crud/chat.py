@@ -1,20 +1,47 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, desc
+from sqlalchemy import and_, desc, func, select
 from backend.models.chat import ChatHistory, ChatMessage, get_current_time
-from backend.schemas.chat import ChatHistoryCreate, ChatHistoryUpdate, ChatMessageCreate
+from backend.schemas.chat import (
+    ChatHistoryCreate, ChatHistoryUpdate, ChatMessageCreate, ChatMessageRecord, ChatHistoryResponse, ChatMessageResponse
+)
+from backend.schemas.job import ChatSummaryJob, ChatContextCascadeJob
 from backend.core.context_manager import ContextManager
+from backend.crud.usage import record_usage
+from backend.core.cache import LRUCache
+from backend.core.config import settings
+from backend.core.tracing import traced
+from backend.core.jobs import job_handler, enqueue_job
 from typing import List, Optional
 import uuid
+import json
+import hashlib
 from datetime import datetime
 from backend.models.model import ModelConfig
 
 # 创建上下文管理器实例
 context_manager = ContextManager()
 
+# 上下文选择结果缓存：(chat_id, last_message_id, window_size, settings_hash) -> 选中的消息ID
+context_selection_cache = LRUCache("context_selection", maxsize=settings.CONTEXT_CACHE_SIZE)
+
+# 快速读取路径查询的列：与响应模型的字段一一对应，顺序也相同
+CHAT_HISTORY_FIELDS = tuple(ChatHistoryResponse.model_fields)
+CHAT_MESSAGE_FIELDS = tuple(ChatMessageResponse.model_fields)
+
+def _context_settings_hash(chat_history: ChatHistory) -> str:
+    """计算影响上下文选择的设置的哈希值"""
+    payload = json.dumps(chat_history.context_settings or {}, sort_keys=True, default=str)
+    return hashlib.md5(f"{context_manager.scorer}|{payload}".encode("utf-8")).hexdigest()
+
+def invalidate_context_cache(chat_id: int) -> int:
+    """清除指定聊天的上下文选择缓存"""
+    return context_selection_cache.invalidate_where(lambda key, value: key[0] == chat_id)
+
 def generate_chat_url() -> str:
     """生成唯一的聊天URL"""
     return f"chat_{uuid.uuid4().hex[:12]}"
 
+@traced()
 def create_chat_history(db: Session, chat_data: ChatHistoryCreate, user_id: int) -> ChatHistory:
     """创建聊天历史"""
     current_time = get_current_time()
@@ -40,12 +67,14 @@ def create_chat_history(db: Session, chat_data: ChatHistoryCreate, user_id: int)
     db.refresh(db_chat)
     return db_chat
 
+@traced()
 def get_chat_history(db: Session, chat_id: int, user_id: int) -> Optional[ChatHistory]:
     """根据ID获取聊天历史（用户只能访问自己的聊天）"""
     return db.query(ChatHistory).filter(
         and_(ChatHistory.id == chat_id, ChatHistory.user_id == user_id, ChatHistory.is_deleted == False)
     ).first()
 
+@traced()
 def get_chat_history_by_url(db: Session, url: str, user_id: int) -> Optional[ChatHistory]:
     """根据URL获取聊天历史（用户只能访问自己的聊天）"""
     return db.query(ChatHistory).filter(
@@ -69,6 +98,25 @@ def get_user_chat_histories(
     
     return query.order_by(desc(ChatHistory.updated_at)).offset(skip).limit(limit).all()
 
+@traced()
+def get_user_chat_history_rows(
+    db: Session,
+    user_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    config_id: Optional[int] = None
+) -> List[dict]:
+    """快速读取聊天历史列表：只查询响应需要的列，返回与 ChatHistoryResponse 字段顺序一致的字典"""
+    statement = select(*[ChatHistory.__table__.c[field] for field in CHAT_HISTORY_FIELDS]).where(
+        ChatHistory.user_id == user_id, ChatHistory.is_deleted == False
+    )
+    
+    if config_id:
+        statement = statement.where(ChatHistory.config_id == config_id)
+    
+    statement = statement.order_by(desc(ChatHistory.updated_at)).offset(skip).limit(limit)
+    return [dict(row) for row in db.execute(statement).mappings()]
+
 def update_chat_history(
     db: Session, 
     chat_id: int, 
@@ -86,8 +134,37 @@ def update_chat_history(
     
     db.commit()
     db.refresh(db_chat)
+    invalidate_context_cache(chat_id)
     return db_chat
 
+def bulk_update_chat_histories(
+    db: Session,
+    user_id: int,
+    values: dict,
+    config_id: Optional[int] = None,
+    chat_ids: Optional[List[int]] = None,
+    touch_updated_at: bool = False,
+    commit: bool = True
+) -> int:
+    """批量更新聊天历史（单条UPDATE语句，用户只能更新自己的聊天），返回更新行数"""
+    query = db.query(ChatHistory).filter(ChatHistory.user_id == user_id)
+    
+    if config_id is not None:
+        query = query.filter(ChatHistory.config_id == config_id)
+    if chat_ids is not None:
+        query = query.filter(ChatHistory.id.in_(chat_ids))
+    
+    values = dict(values)
+    if not touch_updated_at:
+        # 批量的设置变更不算聊天活动，保持侧边栏按updated_at的排序不变
+        values.setdefault(ChatHistory.updated_at, ChatHistory.updated_at)
+    
+    # 上下文选择缓存的键包含窗口大小和设置哈希，设置变化后旧条目不会再被命中，无需逐条失效
+    updated = query.update(values, synchronize_session=False)
+    if commit:
+        db.commit()
+    return updated
+
 def delete_chat_history(db: Session, chat_id: int, user_id: int) -> bool:
     """软删除聊天历史（用户只能删除自己的聊天）"""
     db_chat = get_chat_history(db, chat_id, user_id)
@@ -96,8 +173,10 @@ def delete_chat_history(db: Session, chat_id: int, user_id: int) -> bool:
     
     db_chat.is_deleted = True
     db.commit()
+    invalidate_context_cache(chat_id)
     return True
 
+@traced()
 def add_chat_message(db: Session, chat_id: int, message_data: ChatMessageCreate, user_id: int) -> Optional[ChatMessage]:
     """添加聊天消息"""
     # 验证聊天历史是否存在且属于当前用户
@@ -105,6 +184,10 @@ def add_chat_message(db: Session, chat_id: int, message_data: ChatMessageCreate,
     if not chat_history:
         return None
     
+    # 接口提交的消息没有用量字段，不计入用量统计
+    if not isinstance(message_data, ChatMessageRecord):
+        message_data = ChatMessageRecord(**message_data.model_dump())
+    
     current_time = get_current_time()
     
     # 处理消息的上下文信息
@@ -124,18 +207,46 @@ def add_chat_message(db: Session, chat_id: int, message_data: ChatMessageCreate,
         created_at=current_time,
         message_metadata=message_data.message_metadata,
         context_keywords=processed_message.get('context_keywords'),
-        context_relevance_score=processed_message.get('context_relevance_score', 0)
+        context_vector=processed_message.get('context_vector'),
+        context_relevance_score=processed_message.get('context_relevance_score', 0),
+        prompt_tokens=message_data.prompt_tokens,
+        completion_tokens=message_data.completion_tokens,
+        usage_estimated=message_data.usage_estimated,
+        ttft=message_data.ttft,
+        tokens_per_second=message_data.tokens_per_second
     )
     db.add(db_message)
-    db.commit()
-    db.refresh(db_message)
     
-    # 更新聊天历史的上下文摘要
+    # 服务端记录了token数的助手回复计入按小时汇总的用量统计
+    if message_data.role == "assistant" and message_data.completion_tokens is not None:
+        metadata = message_data.message_metadata or {}
+        config_id = metadata.get("config_id")
+        latency = metadata.get("response_time")
+        record_usage(
+            db,
+            user_id=user_id,
+            config_id=config_id if isinstance(config_id, int) else chat_history.config_id,
+            created_at=current_time,
+            prompt_tokens=message_data.prompt_tokens,
+            completion_tokens=message_data.completion_tokens,
+            estimated=bool(message_data.usage_estimated),
+            latency=latency if isinstance(latency, (int, float)) else None,
+            ttft=message_data.ttft
+        )
+    
+    db.flush()
+    
+    # 上下文摘要由后台任务更新，同一条最新消息只刷新一次
     if chat_history.enable_context_summary:
-        update_context_summary(db, chat_id, user_id)
+        enqueue_summary_refresh(db, chat_id, user_id, db_message.id)
+    
+    db.commit()
+    db.refresh(db_message)
+    invalidate_context_cache(chat_id)
     
     return db_message
 
+@traced()
 def get_chat_messages(db: Session, chat_id: int, user_id: int) -> List[ChatMessage]:
     """获取聊天消息列表（用户只能访问自己的聊天消息）"""
     chat_history = get_chat_history(db, chat_id, user_id)
@@ -146,24 +257,41 @@ def get_chat_messages(db: Session, chat_id: int, user_id: int) -> List[ChatMessa
         ChatMessage.chat_history_id == chat_id
     ).order_by(ChatMessage.created_at).all()
 
-def get_context_aware_messages(db: Session, chat_id: int, user_id: int) -> List[ChatMessage]:
-    """获取上下文感知的消息列表（智能选择相关消息）"""
-    chat_history = get_chat_history(db, chat_id, user_id)
-    if not chat_history:
-        return []
+@traced()
+def get_context_message_ids(db: Session, chat_history: ChatHistory) -> frozenset:
+    """选择与当前对话相关的消息ID（智能选择相关消息）"""
+    chat_id = chat_history.id
+    # 以最后一条消息ID作为版本号，聊天内容没有变化时直接复用选择结果
+    last_message_id = db.query(func.max(ChatMessage.id)).filter(
+        ChatMessage.chat_history_id == chat_id
+    ).scalar()
+    if last_message_id is None:
+        return frozenset()
+    
+    cache_key = (chat_id, last_message_id, chat_history.context_window_size, _context_settings_hash(chat_history))
+    selected_ids = context_selection_cache.get(cache_key)
+    if selected_ids is not None:
+        return selected_ids
     
-    all_messages = get_chat_messages(db, chat_id, user_id)
+    # 只查询选择需要的列
+    rows = db.execute(
+        select(
+            ChatMessage.id, ChatMessage.role, ChatMessage.content, ChatMessage.created_at,
+            ChatMessage.context_keywords, ChatMessage.context_vector, ChatMessage.context_relevance_score
+        ).where(ChatMessage.chat_history_id == chat_id).order_by(ChatMessage.created_at)
+    ).all()
     
     # 转换为字典格式
     messages_dict = []
-    for msg in all_messages:
+    for row in rows:
         msg_dict = {
-            'id': msg.id,
-            'role': msg.role,
-            'content': msg.content,
-            'created_at': msg.created_at.isoformat(),
-            'context_keywords': msg.context_keywords,
-            'context_relevance_score': msg.context_relevance_score
+            'id': row.id,
+            'role': row.role,
+            'content': row.content,
+            'created_at': row.created_at.isoformat(),
+            'context_keywords': row.context_keywords,
+            'context_vector': row.context_vector,
+            'context_relevance_score': row.context_relevance_score
         }
         messages_dict.append(msg_dict)
     
@@ -174,10 +302,35 @@ def get_context_aware_messages(db: Session, chat_id: int, user_id: int) -> List[
         chat_history.context_settings.get('smart_selection', True)
     )
     
-    # 转换回ChatMessage对象
-    selected_ids = [msg['id'] for msg in selected_messages]
-    return [msg for msg in all_messages if msg.id in selected_ids]
+    selected_ids = frozenset(msg['id'] for msg in selected_messages)
+    context_selection_cache.set(cache_key, selected_ids)
+    return selected_ids
+
+@traced()
+def get_context_aware_messages(db: Session, chat_id: int, user_id: int) -> List[ChatMessage]:
+    """获取上下文感知的消息列表（智能选择相关消息）"""
+    chat_history = get_chat_history(db, chat_id, user_id)
+    if not chat_history:
+        return []
+    
+    selected_ids = get_context_message_ids(db, chat_history)
+    if not selected_ids:
+        return []
+    return db.query(ChatMessage).filter(
+        ChatMessage.id.in_(selected_ids)
+    ).order_by(ChatMessage.created_at).all()
+
+@traced()
+def get_chat_message_rows(db: Session, chat_id: int, message_ids: Optional[frozenset] = None) -> List[dict]:
+    """快速读取聊天消息：只查询响应需要的列，返回与 ChatMessageResponse 字段顺序一致的字典"""
+    statement = select(*[ChatMessage.__table__.c[field] for field in CHAT_MESSAGE_FIELDS]).where(
+        ChatMessage.chat_history_id == chat_id
+    )
+    if message_ids is not None:
+        statement = statement.where(ChatMessage.id.in_(message_ids))
+    return [dict(row) for row in db.execute(statement.order_by(ChatMessage.created_at)).mappings()]
 
+@traced()
 def update_context_summary(db: Session, chat_id: int, user_id: int) -> Optional[str]:
     """更新聊天历史的上下文摘要"""
     chat_history = get_chat_history(db, chat_id, user_id)
@@ -211,6 +364,35 @@ def update_context_summary(db: Session, chat_id: int, user_id: int) -> Optional[
     
     return summary
 
+def enqueue_summary_refresh(db: Session, chat_id: int, user_id: int, last_message_id: int) -> int:
+    """写入刷新上下文摘要的任务（由调用方提交）"""
+    return enqueue_job(
+        db, "chat.summary", ChatSummaryJob(chat_id=chat_id, user_id=user_id),
+        idempotency_key=f"chat.summary:{chat_id}:{last_message_id}", commit=False
+    )
+
+def enqueue_context_cascade(db: Session, user_id: int, config_id: int) -> int:
+    """写入把模型的上下文开关同步到其聊天历史的任务"""
+    return enqueue_job(db, "chat.context_cascade", ChatContextCascadeJob(user_id=user_id, config_id=config_id))
+
+@job_handler("chat.summary", ChatSummaryJob)
+def refresh_summary_job(db: Session, payload: ChatSummaryJob):
+    update_context_summary(db, payload.chat_id, payload.user_id)
+
+@job_handler("chat.context_cascade", ChatContextCascadeJob)
+def context_cascade_job(db: Session, payload: ChatContextCascadeJob):
+    # 开关值在UPDATE语句内从模型配置读取，而不是用入队时的值：
+    # 连续切换产生的多个任务无论以什么顺序执行，最后一次执行都会写入配置的当前值
+    current = select(ModelConfig.enable_context).where(
+        ModelConfig.id == payload.config_id, ModelConfig.user_id == payload.user_id
+    ).scalar_subquery()
+    bulk_update_chat_histories(
+        db, payload.user_id,
+        # 模型配置已被删除时保持原值
+        {ChatHistory.enable_context: func.coalesce(current, ChatHistory.enable_context)},
+        config_id=payload.config_id
+    )
+
 def get_chat_history_count(db: Session, user_id: int, config_id: Optional[int] = None) -> int:
     """获取用户聊天历史总数"""
     query = db.query(ChatHistory).filter(
@@ -2,28 +2,59 @@ from sqlalchemy.orm import Session
 from sqlalchemy import and_
 from backend.models.model import ModelConfig
 from backend.schemas.model import ModelConfigCreate, ModelConfigUpdate
+from backend.core.cache import LRUCache, snapshot_row, attach_snapshot
+from backend.core.config import settings
+from backend.crud.cache_version import CacheVersionSync
+from backend.core.tracing import traced
 from typing import List, Optional
 
+# 模型配置缓存：(user_id, config_id) -> 列值快照
+model_config_cache = LRUCache("model_config", maxsize=settings.MODEL_CONFIG_CACHE_SIZE)
+model_config_versions = CacheVersionSync(model_config_cache, "model_configs", settings.CACHE_VERSION_CHECK_INTERVAL)
+
+def invalidate_model_config_cache(db: Session, model_config_id: int, user_id: int):
+    """写入后清除本进程缓存，并递增版本号通知其他进程"""
+    model_config_cache.invalidate((user_id, model_config_id))
+    model_config_versions.bump(db)
+
 def create_model_config(db: Session, model_config: ModelConfigCreate, user_id: int) -> ModelConfig:
     """创建模型配置"""
     db_model = ModelConfig(**model_config.model_dump(), user_id=user_id)
     db.add(db_model)
+    db.flush()
+    invalidate_model_config_cache(db, db_model.id, user_id)
     db.commit()
     db.refresh(db_model)
     return db_model
 
-def get_model_config(db: Session, model_config_id: int, user_id: int) -> Optional[ModelConfig]:
-    """根据ID获取模型配置（用户只能访问自己的模型）"""
+def _query_model_config(db: Session, model_config_id: int, user_id: int) -> Optional[ModelConfig]:
+    """直接查询数据库中的模型配置"""
     return db.query(ModelConfig).filter(
         and_(ModelConfig.id == model_config_id, ModelConfig.user_id == user_id)
     ).first()
 
+@traced()
+def get_model_config(db: Session, model_config_id: int, user_id: int) -> Optional[ModelConfig]:
+    """根据ID获取模型配置（用户只能访问自己的模型，优先读取进程内缓存）"""
+    model_config_versions.sync(db)
+    
+    cache_key = (user_id, model_config_id)
+    snapshot = model_config_cache.get(cache_key)
+    if snapshot is not None:
+        return attach_snapshot(db, ModelConfig, snapshot)
+    
+    db_model = _query_model_config(db, model_config_id, user_id)
+    if db_model:
+        model_config_cache.set(cache_key, snapshot_row(db_model))
+    return db_model
+
 def get_model_config_by_name(db: Session, name: str, user_id: int) -> Optional[ModelConfig]:
     """根据名称获取模型配置（用户只能访问自己的模型）"""
     return db.query(ModelConfig).filter(
         and_(ModelConfig.name == name, ModelConfig.user_id == user_id)
     ).first()
 
+@traced()
 def get_model_configs(
     db: Session, 
     user_id: int,
@@ -46,7 +77,7 @@ def update_model_config(
     user_id: int
 ) -> Optional[ModelConfig]:
     """更新模型配置（用户只能更新自己的模型）"""
-    db_model = get_model_config(db, model_config_id, user_id)
+    db_model = _query_model_config(db, model_config_id, user_id)
     if not db_model:
         return None
     
@@ -54,16 +85,18 @@ def update_model_config(
     for field, value in update_data.items():
         setattr(db_model, field, value)
     
+    invalidate_model_config_cache(db, model_config_id, user_id)
     db.commit()
     db.refresh(db_model)
     return db_model
 
 def delete_model_config(db: Session, model_config_id: int, user_id: int) -> bool:
     """删除模型配置（用户只能删除自己的模型）"""
-    db_model = get_model_config(db, model_config_id, user_id)
+    db_model = _query_model_config(db, model_config_id, user_id)
     if not db_model:
         return False
     
     db.delete(db_model)
+    invalidate_model_config_cache(db, model_config_id, user_id)
     db.commit()
     return True 
\ No newline at end of file
@@ -0,0 +1,120 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects import postgresql, sqlite
+from backend.models.usage import UsageRollup, LATENCY_BUCKETS, LATENCY_BUCKET_COLUMNS
+from backend.core.tracing import traced
+
+def hour_bucket(value: datetime) -> datetime:
+    """时间所在小时桶的起始时间"""
+    return value.replace(minute=0, second=0, microsecond=0)
+
+def latency_bucket_index(latency: float) -> int:
+    """响应时间所属的直方图桶"""
+    for index, upper in enumerate(LATENCY_BUCKETS):
+        if latency <= upper:
+            return index
+    return len(LATENCY_BUCKETS) - 1
+
+@traced()
+def record_usage(
+    db: Session,
+    user_id: int,
+    config_id: int,
+    created_at: datetime,
+    prompt_tokens: Optional[int] = None,
+    completion_tokens: Optional[int] = None,
+    estimated: bool = False,
+    latency: Optional[float] = None,
+    ttft: Optional[float] = None
+):
+    """把一次请求累加到所在小时的汇总行（单条 upsert，不读取旧值，由调用方提交）"""
+    increments = {
+        "request_count": 1,
+        "estimated_count": 1 if estimated else 0,
+        "prompt_tokens": prompt_tokens or 0,
+        "completion_tokens": completion_tokens or 0,
+        "latency_count": 1 if latency is not None else 0,
+        "latency_sum": latency or 0.0,
+        "ttft_count": 1 if ttft is not None else 0,
+        "ttft_sum": ttft or 0.0,
+    }
+    for column in LATENCY_BUCKET_COLUMNS:
+        increments[column] = 0
+    if latency is not None:
+        increments[LATENCY_BUCKET_COLUMNS[latency_bucket_index(latency)]] = 1
+
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    table = UsageRollup.__table__
+    statement = dialect.insert(table).values(
+        user_id=user_id,
+        config_id=config_id,
+        bucket_start=hour_bucket(created_at),
+        **increments
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=["user_id", "config_id", "bucket_start"],
+        set_={
+            **{name: table.c[name] + statement.excluded[name] for name in increments},
+            "updated_at": created_at,
+        }
+    )
+    db.execute(statement)
+
+def get_usage_rollups(
+    db: Session,
+    user_id: int,
+    config_id: int,
+    since: datetime,
+    until: Optional[datetime] = None
+) -> List[UsageRollup]:
+    """读取时间范围内的小时汇总行"""
+    query = db.query(UsageRollup).filter(
+        UsageRollup.user_id == user_id,
+        UsageRollup.config_id == config_id,
+        UsageRollup.bucket_start >= hour_bucket(since)
+    )
+    if until is not None:
+        query = query.filter(UsageRollup.bucket_start <= until)
+    return query.order_by(UsageRollup.bucket_start).all()
+
+def histogram_quantile(counts: List[int], quantile: float) -> Optional[float]:
+    """由直方图估算分位数（桶内线性插值，最后一个桶取其下限）"""
+    total = sum(counts)
+    if total == 0:
+        return None
+    target = quantile * total
+    cumulative = 0
+    for index, count in enumerate(counts):
+        lower = LATENCY_BUCKETS[index - 1] if index > 0 else 0.0
+        upper = LATENCY_BUCKETS[index]
+        if count and cumulative + count >= target:
+            if upper == float("inf"):
+                return lower
+            return lower + (upper - lower) * (target - cumulative) / count
+        cumulative += count
+    return LATENCY_BUCKETS[-2]
+
+def summarize_usage(rollups: List[UsageRollup]) -> Dict[str, Any]:
+    """合并多个小时汇总行"""
+    histogram = [sum(getattr(row, column) for row in rollups) for column in LATENCY_BUCKET_COLUMNS]
+    requests = sum(row.request_count for row in rollups)
+    prompt_tokens = sum(row.prompt_tokens for row in rollups)
+    completion_tokens = sum(row.completion_tokens for row in rollups)
+    latency_count = sum(row.latency_count for row in rollups)
+    ttft_count = sum(row.ttft_count for row in rollups)
+    return {
+        "requests": requests,
+        "estimated_requests": sum(row.estimated_count for row in rollups),
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "avg_latency": sum(row.latency_sum for row in rollups) / latency_count if latency_count else None,
+        "p50_latency": histogram_quantile(histogram, 0.5),
+        "p95_latency": histogram_quantile(histogram, 0.95),
+        "avg_ttft": sum(row.ttft_sum for row in rollups) / ttft_count if ttft_count else None,
+        "latency_histogram": [
+            {"le": None if upper == float("inf") else upper, "count": count}
+            for upper, count in zip(LATENCY_BUCKETS, histogram)
+        ],
+    }
@@ -1,7 +1,14 @@
 from sqlalchemy.orm import Session
+from typing import Optional
+import os
 from backend.models.user import User, get_current_time
 from backend.schemas.user import UserCreate
-from backend.utils.auth import get_password_hash
+from backend.schemas.job import AvatarCleanupJob
+from backend.utils.auth import get_password_hash, invalidate_user_cache
+from backend.core.jobs import job_handler, enqueue_job
+
+# 头像文件保存目录（相对于工作目录，与 /uploads 静态文件挂载一致）
+AVATAR_DIR = "uploads/avatars"
 
 def get_user(db: Session, user_id: int):
     """根据ID获取用户"""
@@ -19,9 +26,9 @@ def get_users(db: Session, skip: int = 0, limit: int = 100):
     """获取用户列表"""
     return db.query(User).offset(skip).limit(limit).all()
 
-def create_user(db: Session, user: UserCreate):
-    """创建新用户"""
-    hashed_password = get_password_hash(user.password)
+def create_user(db: Session, user: UserCreate, hashed_password: Optional[str] = None):
+    """创建新用户（可传入预先计算的密码哈希）"""
+    hashed_password = hashed_password or get_password_hash(user.password)
     current_time = get_current_time()
     db_user = User(
         username=user.username,
@@ -47,6 +54,7 @@ def update_user(db: Session, user_id: int, user_update):
         # 更新更新时间
         db_user.updated_at = get_current_time()
         
+        invalidate_user_cache(user_id, db)
         db.commit()
         db.refresh(db_user)
     return db_user
@@ -56,7 +64,22 @@ def delete_user(db: Session, user_id: int):
     db_user = get_user(db, user_id)
     if db_user:
         db.delete(db_user)
+        invalidate_user_cache(user_id, db)
         db.commit()
     return db_user
 
- 
\ No newline at end of file
+def enqueue_avatar_cleanup(db: Session, avatar_url: str) -> int:
+    """写入删除头像文件的任务（由调用方提交）"""
+    return enqueue_job(
+        db, "user.avatar_cleanup", AvatarCleanupJob(avatar_url=avatar_url),
+        idempotency_key=f"user.avatar_cleanup:{avatar_url}", commit=False
+    )
+
+@job_handler("user.avatar_cleanup", AvatarCleanupJob)
+def avatar_cleanup_job(db: Session, payload: AvatarCleanupJob):
+    file_path = payload.avatar_url.lstrip('/')
+    # 只删除头像目录中的文件
+    if os.path.dirname(os.path.normpath(file_path)) != os.path.normpath(AVATAR_DIR):
+        return
+    if os.path.exists(file_path):
+        os.remove(file_path)
@@ -1,22 +1,41 @@
-from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from backend.core.config import settings
+from backend.core.metrics import instrument_engine, db_read_sessions
+from backend.core.query_log import instrument_query_log
+from backend.database.engine import create_db_engine, is_sqlite
+from backend.database.routing import track_writes, should_read_primary, sticky_key_from_headers
+from fastapi import Request
 import os
 
 # 设置时区环境变量
 os.environ['TZ'] = 'Asia/Shanghai'
 
-engine = create_engine(
-    settings.DATABASE_URL, 
-    connect_args={
-        "check_same_thread": False,
-        "timeout": 20,
-        "isolation_level": None  # 启用自动提交模式
-    } if "sqlite" in settings.DATABASE_URL else {}
-)
+# 写引擎（默认会话使用）
+engine = create_db_engine(settings.DATABASE_URL)
+
+# 只读引擎：配置了只读副本时连接副本；SQLite 使用独立的只读连接池，读请求不占用写连接
+if settings.DATABASE_READ_URL:
+    read_engine = create_db_engine(settings.DATABASE_READ_URL, read_only=True)
+elif is_sqlite(settings.DATABASE_URL):
+    read_engine = create_db_engine(settings.DATABASE_URL, read_only=True)
+else:
+    read_engine = engine
+
+# 只读副本有复制延迟：记录每个用户的写入，写入后短时间内的读取走主库
+if settings.DATABASE_READ_URL:
+    track_writes(engine)
+
+for _engine in {engine, read_engine}:
+    # 统计SQL语句数量和耗时
+    instrument_engine(_engine)
+
+    # 调试模式下记录慢查询和N+1查询
+    if settings.QUERY_DEBUG:
+        instrument_query_log(_engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 
 Base = declarative_base()
 
@@ -25,4 +44,22 @@ def get_db():
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+def get_read_db(request: Request):
+    """只读会话（只用于不写数据库的接口）
+
+    配置了只读副本时，用户在 READ_AFTER_WRITE_SECONDS 秒内写入过则改用主库，保证读到自己的写入。
+    """
+    primary = settings.DATABASE_READ_URL and should_read_primary(sticky_key_from_headers(request.headers))
+    db_read_sessions.inc("primary" if primary or read_engine is engine else "replica")
+    db = SessionLocal() if primary else ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def dispose_engines(close: bool = True):
+    """丢弃所有连接池（多进程部署时在 fork 前后调用）"""
+    for _engine in {engine, read_engine}:
+        _engine.dispose(close=close)
@@ -0,0 +1,128 @@
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Connection, Engine
+
+from backend.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_checkpoint_task: Optional[asyncio.Task] = None
+
+
+def is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def sqlite_pragmas(read_only: bool = False) -> Dict[str, Any]:
+    """当前配置下每个SQLite连接要执行的 PRAGMA
+
+    production: WAL 日志允许读写并发，synchronous=NORMAL 在 WAL 下只在检查点时 fsync，
+    再加上内存映射、页缓存和内存临时表；default: 只设置忙等待时间，保持原有行为。
+    """
+    pragmas: Dict[str, Any] = {"busy_timeout": int(settings.SQLITE_BUSY_TIMEOUT * 1000)}
+    if settings.SQLITE_PROFILE == "production":
+        pragmas.update({
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "mmap_size": settings.SQLITE_MMAP_SIZE,
+            "cache_size": -settings.SQLITE_CACHE_SIZE_KB,
+            "temp_store": "MEMORY",
+            "wal_autocheckpoint": settings.SQLITE_WAL_AUTOCHECKPOINT,
+        })
+    if read_only:
+        pragmas["query_only"] = "ON"
+    return pragmas
+
+
+def _apply_pragmas(engine: Engine, pragmas: Dict[str, Any]):
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+def create_db_engine(url: str, read_only: bool = False) -> Engine:
+    """创建数据库引擎
+
+    SQLite 的写引擎和读引擎使用各自的连接池：WAL 模式下读连接不会被写事务阻塞，
+    写连接数量较少，减少多个写入者之间的锁等待。
+    """
+    if not is_sqlite(url):
+        return create_engine(url, pool_pre_ping=True)
+
+    pool_size = settings.SQLITE_READ_POOL_SIZE if read_only else settings.SQLITE_WRITE_POOL_SIZE
+    engine = create_engine(
+        url,
+        connect_args={
+            "check_same_thread": False,
+            "timeout": settings.SQLITE_BUSY_TIMEOUT,
+            "isolation_level": None  # 启用自动提交模式
+        },
+        pool_size=pool_size,
+        max_overflow=pool_size,
+        pool_timeout=settings.SQLITE_BUSY_TIMEOUT,
+    )
+    _apply_pragmas(engine, sqlite_pragmas(read_only))
+    return engine
+
+
+def begin_immediate(connection: Connection):
+    """开始一个真正的事务
+
+    SQLite 连接使用驱动的自动提交模式（isolation_level=None），驱动不会自动执行 BEGIN，
+    每条语句单独提交，rollback() 也无法撤销。需要多条语句原子提交时显式执行 BEGIN IMMEDIATE
+    （同时提前获取写锁）；其它数据库的驱动会自动开始事务。
+    """
+    if connection.dialect.name == "sqlite":
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def checkpoint(engine: Engine, mode: Optional[str] = None) -> Optional[Dict[str, int]]:
+    """执行一次WAL检查点，返回 (是否被阻塞, WAL页数, 已写回页数)"""
+    if not is_sqlite(str(engine.url)):
+        return None
+    mode = (mode or settings.SQLITE_CHECKPOINT_MODE).upper()
+    with engine.connect() as conn:
+        row = conn.execute(text(f"PRAGMA wal_checkpoint({mode})")).fetchone()
+    return {"busy": row[0], "log_pages": row[1], "checkpointed_pages": row[2]}
+
+
+async def _checkpoint_loop(engine: Engine, interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            result = await asyncio.to_thread(checkpoint, engine)
+            if result and result["busy"]:
+                logger.info("WAL检查点未完成（有读事务未结束）: %s", result)
+        except Exception:
+            logger.exception("WAL检查点失败")
+
+
+def start_checkpointer(engine: Engine) -> Optional[asyncio.Task]:
+    """定期执行WAL检查点，避免WAL文件持续增长（应用启动时调用）"""
+    global _checkpoint_task
+    interval = settings.SQLITE_CHECKPOINT_INTERVAL
+    if (interval <= 0 or _checkpoint_task is not None or not is_sqlite(str(engine.url))
+            or settings.SQLITE_PROFILE != "production"):
+        return _checkpoint_task
+    _checkpoint_task = asyncio.create_task(_checkpoint_loop(engine, interval))
+    return _checkpoint_task
+
+
+async def stop_checkpointer():
+    global _checkpoint_task
+    if _checkpoint_task is None:
+        return
+    _checkpoint_task.cancel()
+    try:
+        await _checkpoint_task
+    except asyncio.CancelledError:
+        pass
+    _checkpoint_task = None
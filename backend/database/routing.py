@@ -0,0 +1,158 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import contextvars
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from backend.core.cache import LRUCache
+from backend.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 当前请求的粘滞键（请求头中的令牌），用于把同一用户写入后的读取路由到主库
+_sticky_key: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("sticky_key", default=None)
+
+# 粘滞键 -> (最近一次写入的时间, 最近一次写入共享记录的时间)
+recent_writes = LRUCache("read_your_writes", maxsize=settings.READ_STICKY_CACHE_SIZE, ttl=settings.READ_AFTER_WRITE_SECONDS)
+
+_WRITE_PREFIXES = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+
+def sticky_key_from_headers(headers) -> Optional[str]:
+    """从请求头中取粘滞键（Authorization 令牌），headers 为 ASGI 原始头列表或 Starlette Headers"""
+    if isinstance(headers, list):
+        for name, value in headers:
+            if name == b"authorization":
+                return value.decode("latin-1")
+        return None
+    return headers.get("authorization")
+
+
+def current_sticky_key() -> Optional[str]:
+    """当前请求的粘滞键（用于在后台任务中代替请求记录写入）"""
+    return _sticky_key.get()
+
+
+class SharedWriteLog:
+    """同一节点的工作进程共享的最近写入记录（SQLite文件）
+
+    本进程的 recent_writes 只能看到自己处理的写入，预派生多进程部署时用户的下一个请求
+    可能落到另一个工作进程。这里按粘滞键的哈希（不把令牌写入磁盘）记录最近写入时间，
+    每个键最多每 READ_STICKY_SHARE_INTERVAL 秒写一次，并顺带清理过期记录。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._next_prune = 0.0
+
+    def _connection(self) -> sqlite3.Connection:
+        # 连接在第一次使用时打开，fork 出的子进程不沿用父进程的连接
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=0.5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute("CREATE TABLE IF NOT EXISTS recent_writes (key TEXT PRIMARY KEY, written_at REAL NOT NULL)")
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    @staticmethod
+    def _hash(key: str) -> str:
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def record(self, key: str, written_at: float):
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT INTO recent_writes (key, written_at) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET written_at = excluded.written_at",
+                (self._hash(key), written_at)
+            )
+            if written_at >= self._next_prune:
+                conn.execute("DELETE FROM recent_writes WHERE written_at < ?", (written_at - SHARED_WINDOW,))
+                self._next_prune = written_at + settings.READ_AFTER_WRITE_SECONDS
+
+    def last_write(self, key: str) -> Optional[float]:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT written_at FROM recent_writes WHERE key = ?", (self._hash(key),)
+            ).fetchone()
+        return row[0] if row else None
+
+
+# 共享记录最多比实际的最后一次写入晚 READ_STICKY_SHARE_INTERVAL 秒，判断时把窗口放宽同样的时间
+SHARED_WINDOW = settings.READ_AFTER_WRITE_SECONDS + settings.READ_STICKY_SHARE_INTERVAL
+
+# 只有配置了只读副本时读取才需要粘滞；多节点部署还需要负载均衡按 Authorization 头保持会话亲和
+shared_writes = (
+    SharedWriteLog(settings.READ_STICKY_FILE)
+    if settings.READ_STICKY_FILE and settings.DATABASE_READ_URL else None
+)
+
+
+def mark_write(key: Optional[str] = None):
+    """记录一次写入，之后 READ_AFTER_WRITE_SECONDS 秒内该用户的读取走主库"""
+    key = key or _sticky_key.get()
+    if not key:
+        return
+    now = time.time()
+    previous = recent_writes.get(key)
+    shared_at = previous[1] if previous else None
+    if shared_writes is not None and (shared_at is None or now - shared_at >= settings.READ_STICKY_SHARE_INTERVAL):
+        try:
+            shared_writes.record(key, now)
+            shared_at = now
+        except sqlite3.Error:
+            logger.warning("写入共享的最近写入记录失败", exc_info=True)
+    recent_writes.set(key, (now, shared_at))
+
+
+def should_read_primary(key: Optional[str]) -> bool:
+    """该用户最近是否写入过（需要读到自己的写入）"""
+    if not key:
+        return False
+    if recent_writes.get(key) is not None:
+        return True
+    if shared_writes is None:
+        return False
+    try:
+        written_at = shared_writes.last_write(key)
+    except sqlite3.Error:
+        # 无法确认时宁可读主库
+        logger.warning("读取共享的最近写入记录失败", exc_info=True)
+        return True
+    return written_at is not None and time.time() - written_at < SHARED_WINDOW
+
+
+def track_writes(engine: Engine):
+    """在写引擎上监听写语句，记录当前请求的用户最近写入过"""
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _sticky_key.get() is not None and statement.lstrip()[:7].upper().startswith(_WRITE_PREFIXES):
+            mark_write()
+
+
+class ReadYourWritesMiddleware:
+    """把请求的粘滞键放入上下文，供写引擎事件记录写入（纯ASGI中间件）"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _sticky_key.set(sticky_key_from_headers(scope.get("headers") or []))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _sticky_key.reset(token)
@@ -0,0 +1,16 @@
+from sqlalchemy import JSON
+from sqlalchemy.dialects.postgresql import JSONB
+
+# JSON列：PostgreSQL 使用 JSONB（可建 GIN 索引），其它数据库使用通用 JSON
+JSONType = JSON().with_variant(JSONB(), "postgresql")
+
+
+def include_for_dialect(dialect_name: str):
+    """Alembic include_object：跳过通过 ddl_if 限定为其它数据库的对象（例如 PostgreSQL 的 GIN 索引）"""
+    def include_object(obj, name, type_, reflected, compare_to):
+        ddl_if = getattr(obj, "_ddl_if", None)
+        if ddl_if is not None and ddl_if.dialect is not None:
+            dialects = (ddl_if.dialect,) if isinstance(ddl_if.dialect, str) else ddl_if.dialect
+            return dialect_name in dialects
+        return True
+    return include_object
@@ -15,15 +15,57 @@ time.tzset()
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, project_root)
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from backend.api import auth, agent, model, mcp, rag, settings, debug, remote, user, history
+from backend.api import auth, agent, model, mcp, rag, settings, debug, remote, user, history, metrics
+from backend.core.config import settings as app_settings
+from backend.core.tokenizer import start_tokenizer_warmup
+from backend.core.model_health import start_health_refresher, stop_health_refresher
+from backend.core.http_client import close_upstream_client
+from backend.core.metrics import MetricsMiddleware, start_metrics_flusher, stop_metrics_flusher
+from backend.core.tracing import TracingMiddleware
+from backend.core.query_log import QueryLogMiddleware
+from backend.core.jobs import start_job_workers, stop_job_workers
+from backend.core.message_writer import start_message_writer, stop_message_writer
+from backend.core.loop_monitor import LoopMonitorMiddleware, start_loop_monitor, stop_loop_monitor
+from backend.database.database import engine
+from backend.database.engine import start_checkpointer, stop_checkpointer
+from backend.database.routing import ReadYourWritesMiddleware
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动时初始化后台任务"""
+    # 后台预热jieba分词器，避免首条消息承担词典加载耗时
+    if app_settings.TOKENIZER_WARMUP:
+        start_tokenizer_warmup()
+    # 定期刷新模型健康状态
+    start_health_refresher()
+    # 多进程部署时定期写入本进程的指标快照
+    start_metrics_flusher()
+    # 监控事件循环阻塞
+    start_loop_monitor()
+    # 定期执行SQLite WAL检查点
+    start_checkpointer(engine)
+    # 重放崩溃前未写入的聊天消息，启动消息批量写入
+    await start_message_writer()
+    # 执行后台任务（摘要刷新、批量更新、文件清理等）
+    start_job_workers()
+    yield
+    await stop_job_workers()
+    await stop_message_writer()
+    await stop_checkpointer()
+    await stop_loop_monitor()
+    await stop_health_refresher()
+    await close_upstream_client()
+    await stop_metrics_flusher()
 
 app = FastAPI(
     title="ALLIN Backend API",
     description="ALLIN系统后端API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS配置
@@ -35,6 +77,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 请求耗时和流式响应指标
+app.add_middleware(MetricsMiddleware)
+
+# 请求追踪（按比例采样，输出 Server-Timing 响应头）
+app.add_middleware(TracingMiddleware)
+
+# SQL调试：统计每个请求的语句，发现N+1查询
+if app_settings.QUERY_DEBUG:
+    app.add_middleware(QueryLogMiddleware)
+
+# 事件循环监控：记录阻塞发生时正在处理的路由
+if app_settings.LOOP_MONITOR_INTERVAL > 0:
+    app.add_middleware(LoopMonitorMiddleware)
+
+# 读写分离：记录用户写入，写入后短时间内的读取走主库
+if app_settings.DATABASE_READ_URL:
+    app.add_middleware(ReadYourWritesMiddleware)
+
 # 静态文件服务
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 
@@ -49,6 +109,7 @@ app.include_router(debug.router, prefix="/api", tags=["调试"])
 app.include_router(remote.router, prefix="/api/remote", tags=["远程聊天"])
 app.include_router(history.router, prefix="/api/history", tags=["聊天历史"])
 app.include_router(user.router, prefix="/api", tags=["用户"])
+app.include_router(metrics.router, tags=["监控"])
 
 if __name__ == "__main__":
     import uvicorn
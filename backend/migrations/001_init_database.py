@@ -17,6 +17,9 @@ from backend.database.database import Base
 from backend.models.user import User
 from backend.models.model import ModelConfig, ModelInstance, UserModelPreference
 from backend.models.chat import ChatHistory, ChatMessage
+from backend.models.cache_version import CacheVersion
+from backend.models.usage import UsageRollup
+from backend.models.job import Job
 
 def init_database():
     """初始化数据库，创建所有表"""
@@ -32,7 +35,8 @@ def init_database():
             # 检查所有表
             tables = [
                 "users", "model_configs", "model_instances", 
-                "user_model_preferences", "chat_history", "chat_messages"
+                "user_model_preferences", "chat_history", "chat_messages",
+                "cache_versions", "usage_rollups", "jobs"
             ]
             
             for table in tables:
@@ -88,7 +92,8 @@ def check_database_status():
             
             expected_tables = [
                 "users", "model_configs", "model_instances", 
-                "user_model_preferences", "chat_history", "chat_messages"
+                "user_model_preferences", "chat_history", "chat_messages",
+                "cache_versions", "usage_rollups", "jobs"
             ]
             
             print(f"📊 数据库状态:")
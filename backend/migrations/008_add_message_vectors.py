@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+为聊天消息表添加语义向量字段
+"""
+
+import sys
+import os
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from sqlalchemy import create_engine, text
+from backend.core.config import settings
+
+def add_message_vectors():
+    """为chat_messages表添加context_vector字段"""
+    engine = create_engine(settings.DATABASE_URL)
+    
+    try:
+        with engine.connect() as conn:
+            # 检查chat_messages表是否存在
+            result = conn.execute(text("""
+                SELECT name FROM sqlite_master 
+                WHERE type='table' AND name='chat_messages'
+            """))
+            
+            if not result.fetchone():
+                print("❌ chat_messages表不存在，请先运行002_create_chat_tables.py")
+                return False
+            
+            # 检查字段是否已存在
+            result = conn.execute(text("PRAGMA table_info(chat_messages)"))
+            existing_columns = [row[1] for row in result.fetchall()]
+            
+            if "context_vector" not in existing_columns:
+                conn.execute(text("ALTER TABLE chat_messages ADD COLUMN context_vector BLOB"))
+                print("✅ 已添加字段: chat_messages.context_vector")
+            else:
+                print("ℹ️  字段已存在: chat_messages.context_vector")
+            
+            conn.commit()
+            return True
+            
+    except Exception as e:
+        print(f"❌ 添加语义向量字段失败: {e}")
+        return False
+
+if __name__ == "__main__":
+    print("🔄 为聊天消息表添加语义向量字段...")
+    success = add_message_vectors()
+    
+    if success:
+        print("\n🎉 语义向量字段添加完成！")
+        print("💡 运行 python backend/tools/reindex_keywords.py 为历史消息生成向量")
+        print("   （未生成向量的消息会在上下文选择时即时计算）")
+    else:
+        print("💥 语义向量字段添加失败！")
+        sys.exit(1)
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+创建缓存版本表
+多进程部署时，写入模型配置会递增版本号，其他进程据此失效进程内缓存
+"""
+
+import sys
+import os
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from sqlalchemy import create_engine, text
+from backend.core.config import settings
+from backend.database.database import Base
+from backend.models.cache_version import CacheVersion
+
+def create_cache_versions():
+    """创建cache_versions表并初始化版本号"""
+    engine = create_engine(settings.DATABASE_URL)
+    
+    try:
+        Base.metadata.create_all(bind=engine, tables=[CacheVersion.__table__])
+        print("✅ cache_versions表创建成功")
+        
+        with engine.connect() as conn:
+            for name in ["model_configs"]:
+                result = conn.execute(text("SELECT version FROM cache_versions WHERE name = :name"), {"name": name})
+                if result.fetchone():
+                    print(f"ℹ️  版本记录已存在: {name}")
+                else:
+                    conn.execute(text("INSERT INTO cache_versions (name, version) VALUES (:name, 0)"), {"name": name})
+                    print(f"✅ 已初始化版本记录: {name}")
+            conn.commit()
+            
+    except Exception as e:
+        print(f"❌ 创建缓存版本表失败: {e}")
+        return False
+    
+    return True
+
+if __name__ == "__main__":
+    print("🔄 创建缓存版本表...")
+    success = create_cache_versions()
+    
+    if success:
+        print("🎉 缓存版本表创建完成！")
+    else:
+        print("💥 缓存版本表创建失败！")
+        sys.exit(1)
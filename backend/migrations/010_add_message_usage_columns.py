@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+为聊天消息表添加用量和性能字段
+并从历史消息的 message_metadata.usage 中回填token数
+"""
+
+import sys
+import os
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from sqlalchemy import create_engine, text
+from backend.core.config import settings
+
+USAGE_COLUMNS = [
+    ("prompt_tokens", "INTEGER"),
+    ("completion_tokens", "INTEGER"),
+    ("usage_estimated", "BOOLEAN"),
+    ("ttft", "FLOAT"),
+    ("tokens_per_second", "FLOAT"),
+]
+
+def add_message_usage_columns():
+    """为chat_messages表添加用量字段"""
+    engine = create_engine(settings.DATABASE_URL)
+
+    try:
+        with engine.connect() as conn:
+            # 检查chat_messages表是否存在
+            result = conn.execute(text("""
+                SELECT name FROM sqlite_master
+                WHERE type='table' AND name='chat_messages'
+            """))
+
+            if not result.fetchone():
+                print("❌ chat_messages表不存在，请先运行002_create_chat_tables.py")
+                return False
+
+            # 检查字段是否已存在
+            result = conn.execute(text("PRAGMA table_info(chat_messages)"))
+            existing_columns = [row[1] for row in result.fetchall()]
+
+            for column_name, column_type in USAGE_COLUMNS:
+                if column_name not in existing_columns:
+                    conn.execute(text(f"ALTER TABLE chat_messages ADD COLUMN {column_name} {column_type}"))
+                    print(f"✅ 已添加字段: chat_messages.{column_name}")
+                else:
+                    print(f"ℹ️  字段已存在: chat_messages.{column_name}")
+
+            # 回填非流式请求保存在元数据中的usage
+            result = conn.execute(text("""
+                UPDATE chat_messages
+                SET prompt_tokens = json_extract(message_metadata, '$.usage.prompt_tokens'),
+                    completion_tokens = json_extract(message_metadata, '$.usage.completion_tokens'),
+                    usage_estimated = 0
+                WHERE role = 'assistant'
+                  AND prompt_tokens IS NULL
+                  AND json_extract(message_metadata, '$.usage.completion_tokens') IS NOT NULL
+            """))
+            print(f"✅ 已从元数据回填 {result.rowcount} 条消息的token数")
+
+            conn.commit()
+            return True
+
+    except Exception as e:
+        print(f"❌ 添加用量字段失败: {e}")
+        return False
+
+if __name__ == "__main__":
+    print("🔄 为聊天消息表添加用量字段...")
+    success = add_message_usage_columns()
+
+    if success:
+        print("\n🎉 用量字段添加完成！")
+    else:
+        print("💥 用量字段添加失败！")
+        sys.exit(1)
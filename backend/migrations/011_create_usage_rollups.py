@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+创建用量汇总表
+按小时汇总每个用户每个模型配置的请求数、token数和响应时间分布，
+并根据已有的助手消息回填汇总数据
+"""
+
+import sys
+import os
+import argparse
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from backend.core.config import settings
+from backend.database.database import Base
+from backend.models.usage import UsageRollup
+from backend.models.chat import ChatHistory, ChatMessage, shanghai_tz
+from backend.crud.usage import record_usage
+
+def backfill_usage_rollups(engine, batch_size: int = 1000) -> int:
+    """根据已有助手消息重建汇总数据，返回处理的消息数"""
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    processed = 0
+    try:
+        db.query(UsageRollup).delete()
+        last_id = 0
+        while True:
+            rows = db.query(ChatMessage, ChatHistory.user_id, ChatHistory.config_id).join(
+                ChatHistory, ChatMessage.chat_history_id == ChatHistory.id
+            ).filter(
+                ChatMessage.role == "assistant",
+                ChatMessage.id > last_id
+            ).order_by(ChatMessage.id).limit(batch_size).all()
+            if not rows:
+                break
+
+            for message, user_id, chat_config_id in rows:
+                metadata = message.message_metadata or {}
+                usage = metadata.get("usage") or {}
+                config_id = metadata.get("config_id")
+                latency = metadata.get("response_time")
+                created_at = message.created_at
+                if created_at.tzinfo is None:
+                    created_at = shanghai_tz.localize(created_at)
+                record_usage(
+                    db,
+                    user_id=user_id,
+                    config_id=config_id if isinstance(config_id, int) else chat_config_id,
+                    created_at=created_at,
+                    prompt_tokens=message.prompt_tokens if message.prompt_tokens is not None else usage.get("prompt_tokens"),
+                    completion_tokens=message.completion_tokens if message.completion_tokens is not None else usage.get("completion_tokens"),
+                    estimated=bool(message.usage_estimated),
+                    latency=latency if isinstance(latency, (int, float)) else None,
+                    ttft=message.ttft
+                )
+
+            db.commit()
+            processed += len(rows)
+            last_id = rows[-1][0].id
+            print(f"   已处理 {processed} 条消息")
+
+        db.commit()
+        return processed
+    finally:
+        db.close()
+
+def create_usage_rollups(backfill: bool = True):
+    """创建usage_rollups表"""
+    engine = create_engine(settings.DATABASE_URL)
+
+    try:
+        Base.metadata.create_all(bind=engine, tables=[UsageRollup.__table__])
+        print("✅ usage_rollups表创建成功")
+
+        with engine.connect() as conn:
+            result = conn.execute(text("""
+                SELECT name FROM sqlite_master
+                WHERE type='table' AND name='chat_messages'
+            """))
+            has_messages = result.fetchone() is not None
+
+        if backfill and has_messages:
+            print("🔄 根据已有消息回填汇总数据...")
+            processed = backfill_usage_rollups(engine)
+            print(f"✅ 回填完成，共 {processed} 条助手消息")
+
+        return True
+
+    except Exception as e:
+        print(f"❌ 创建用量汇总表失败: {e}")
+        return False
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="创建用量汇总表")
+    parser.add_argument("--no-backfill", action="store_true", help="只建表，不根据已有消息回填")
+    args = parser.parse_args()
+
+    print("🔄 创建用量汇总表...")
+    success = create_usage_rollups(backfill=not args.no_backfill)
+
+    if success:
+        print("\n🎉 用量汇总表创建完成！")
+    else:
+        print("💥 用量汇总表创建失败！")
+        sys.exit(1)
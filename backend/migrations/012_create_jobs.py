@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+创建后台任务表
+请求中只写入任务，由工作协程异步执行摘要刷新、上下文级联和头像清理
+"""
+
+import sys
+import os
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from sqlalchemy import create_engine
+from backend.core.config import settings
+from backend.database.database import Base
+from backend.models.job import Job
+
+def create_jobs():
+    """创建jobs表"""
+    engine = create_engine(settings.DATABASE_URL)
+    
+    try:
+        Base.metadata.create_all(bind=engine, tables=[Job.__table__])
+        print("✅ jobs表创建成功")
+        
+    except Exception as e:
+        print(f"❌ 创建后台任务表失败: {e}")
+        return False
+    
+    return True
+
+if __name__ == "__main__":
+    print("🔄 创建后台任务表...")
+    success = create_jobs()
+    
+    if success:
+        print("🎉 后台任务表创建完成！")
+    else:
+        print("💥 后台任务表创建失败！")
+        sys.exit(1)
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+为聊天消息表添加写入队列条目ID字段
+进程崩溃后重放消息日志时，根据该字段跳过已经写入的消息
+"""
+
+import sys
+import os
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from sqlalchemy import create_engine, text
+from backend.core.config import settings
+
+def add_message_write_id():
+    """为chat_messages表添加write_id字段和唯一索引"""
+    engine = create_engine(settings.DATABASE_URL)
+
+    try:
+        with engine.connect() as conn:
+            # 检查chat_messages表是否存在
+            result = conn.execute(text("""
+                SELECT name FROM sqlite_master
+                WHERE type='table' AND name='chat_messages'
+            """))
+
+            if not result.fetchone():
+                print("❌ chat_messages表不存在，请先运行002_create_chat_tables.py")
+                return False
+
+            # 检查字段是否已存在
+            result = conn.execute(text("PRAGMA table_info(chat_messages)"))
+            existing_columns = [row[1] for row in result.fetchall()]
+
+            if "write_id" not in existing_columns:
+                conn.execute(text("ALTER TABLE chat_messages ADD COLUMN write_id VARCHAR(32)"))
+                print("✅ 已添加字段: chat_messages.write_id")
+            else:
+                print("ℹ️  字段已存在: chat_messages.write_id")
+
+            conn.execute(text("""
+                CREATE UNIQUE INDEX IF NOT EXISTS ix_chat_messages_write_id
+                ON chat_messages (write_id)
+            """))
+            print("✅ 已创建唯一索引: ix_chat_messages_write_id")
+
+            conn.commit()
+            return True
+
+    except Exception as e:
+        print(f"❌ 添加写入ID字段失败: {e}")
+        return False
+
+if __name__ == "__main__":
+    print("🔄 为聊天消息表添加写入ID字段...")
+    success = add_message_write_id()
+
+    if success:
+        print("\n🎉 写入ID字段添加完成！")
+    else:
+        print("💥 写入ID字段添加失败！")
+        sys.exit(1)
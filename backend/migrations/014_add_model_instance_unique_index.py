@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+为模型实例表添加 (config_id, instance_name) 唯一索引
+健康检查结果按该索引 upsert，已有的重复行只保留最新的一行
+"""
+
+import sys
+import os
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from sqlalchemy import create_engine, text
+from backend.core.config import settings
+
+def add_model_instance_unique_index():
+    """删除model_instances表中的重复行并创建唯一索引"""
+    engine = create_engine(settings.DATABASE_URL)
+
+    try:
+        with engine.connect() as conn:
+            # 检查model_instances表是否存在
+            result = conn.execute(text("""
+                SELECT name FROM sqlite_master
+                WHERE type='table' AND name='model_instances'
+            """))
+
+            if not result.fetchone():
+                print("❌ model_instances表不存在，请先运行001_init_database.py")
+                return False
+
+            result = conn.execute(text("""
+                DELETE FROM model_instances
+                WHERE id NOT IN (SELECT MAX(id) FROM model_instances GROUP BY config_id, instance_name)
+            """))
+            if result.rowcount:
+                print(f"🧹 已删除重复的模型实例记录: {result.rowcount} 条")
+
+            conn.execute(text("""
+                CREATE UNIQUE INDEX IF NOT EXISTS uq_model_instances_config_instance
+                ON model_instances (config_id, instance_name)
+            """))
+            print("✅ 已创建唯一索引: uq_model_instances_config_instance")
+
+            conn.commit()
+            return True
+
+    except Exception as e:
+        print(f"❌ 添加模型实例唯一索引失败: {e}")
+        return False
+
+if __name__ == "__main__":
+    print("🔄 为模型实例表添加唯一索引...")
+    success = add_model_instance_unique_index()
+
+    if success:
+        print("\n🎉 模型实例唯一索引添加完成！")
+    else:
+        print("💥 模型实例唯一索引添加失败！")
+        sys.exit(1)
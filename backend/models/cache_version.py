@@ -0,0 +1,11 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.sql import func
+from backend.database.database import Base
+
+class CacheVersion(Base):
+    """缓存版本表 - 多进程部署时用于跨进程失效进程内缓存"""
+    __tablename__ = "cache_versions"
+    
+    name = Column(String(100), primary_key=True)  # 缓存名称
+    version = Column(Integer, nullable=False, default=0)  # 每次写入递增
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
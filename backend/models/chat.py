@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, LargeBinary, Float, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from backend.database.database import Base
+from backend.database.types import JSONType
 from datetime import datetime
 import pytz
 
@@ -30,7 +31,7 @@ class ChatHistory(Base):
     context_window_size = Column(Integer, default=10, comment="上下文窗口大小（消息数量）")
     enable_context_summary = Column(Boolean, default=True, comment="是否启用上下文摘要")
     context_summary = Column(Text, comment="上下文摘要内容")
-    context_settings = Column(JSON, default={}, comment="上下文设置，如智能选择、关键词过滤等")
+    context_settings = Column(JSONType, default={}, comment="上下文设置，如智能选择、关键词过滤等")
     
     # 关联关系
     user = relationship("User", back_populates="chat_histories")
@@ -41,17 +42,33 @@ class ChatHistory(Base):
 class ChatMessage(Base):
     """聊天消息表"""
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        # PostgreSQL 上为 JSONB 列建 GIN 索引，支持关键词和元数据的包含查询（@>）
+        Index("ix_chat_messages_context_keywords_gin", "context_keywords", postgresql_using="gin").ddl_if(dialect="postgresql"),
+        Index("ix_chat_messages_metadata_gin", "message_metadata", postgresql_using="gin").ddl_if(dialect="postgresql"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     chat_history_id = Column(Integer, ForeignKey("chat_history.id"), nullable=False)
     role = Column(String(50), nullable=False, comment="消息角色：user/assistant/system")
     content = Column(Text, nullable=False, comment="消息内容")
     created_at = Column(DateTime(timezone=True), server_default=func.now(), comment="创建时间")
-    message_metadata = Column(JSON, comment="额外元数据，如模型参数、工具调用等")
+    message_metadata = Column(JSONType, comment="额外元数据，如模型参数、工具调用等")
     
     # 上下文相关字段
     context_relevance_score = Column(Integer, default=0, comment="上下文相关性评分")
-    context_keywords = Column(JSON, comment="提取的关键词")
+    context_keywords = Column(JSONType, comment="提取的关键词")
+    context_vector = Column(LargeBinary, comment="哈希语义向量（float32）")
+    
+    # 用量和性能字段（仅助手消息）
+    prompt_tokens = Column(Integer, comment="输入token数")
+    completion_tokens = Column(Integer, comment="输出token数")
+    usage_estimated = Column(Boolean, comment="token数是否为本地估算")
+    ttft = Column(Float, comment="首token延迟（秒）")
+    tokens_per_second = Column(Float, comment="生成速度（token/秒）")
+    
+    # 写入队列分配的条目ID，重放日志时据此跳过已经写入的消息
+    write_id = Column(String(32), unique=True, index=True, comment="写入队列条目ID")
     
     # 关联关系
     chat_history = relationship("ChatHistory", back_populates="messages") 
\ No newline at end of file
@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index
+from sqlalchemy.sql import func
+from backend.database.database import Base
+from backend.database.types import JSONType
+
+# 任务状态
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+
+class Job(Base):
+    """后台任务表 - 请求中只写入任务，由工作协程异步执行（失败按退避时间重试）"""
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index("ix_jobs_status_run_at", "status", "run_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(100), nullable=False, index=True, comment="任务类型，对应注册的处理函数")
+    payload = Column(JSONType, comment="任务参数")
+    idempotency_key = Column(String(255), unique=True, comment="幂等键，相同键的任务只会创建一次")
+    status = Column(String(20), nullable=False, default=JOB_PENDING, comment="pending/running/succeeded/failed")
+    attempts = Column(Integer, nullable=False, default=0, comment="已执行次数")
+    max_attempts = Column(Integer, nullable=False, default=5, comment="最多执行次数")
+    run_at = Column(DateTime(timezone=True), nullable=False, comment="最早执行时间（重试时按退避时间推后）")
+    locked_by = Column(String(100), comment="正在执行的工作进程")
+    locked_at = Column(DateTime(timezone=True), comment="开始执行时间")
+    last_error = Column(Text, comment="最近一次失败的错误信息")
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), comment="创建时间")
+    finished_at = Column(DateTime(timezone=True), comment="完成时间")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, Float, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from backend.database.database import Base
@@ -33,6 +33,10 @@ class ModelConfig(Base):
 class ModelInstance(Base):
     """模型实例表 - 用于记录模型加载状态"""
     __tablename__ = "model_instances"
+    __table_args__ = (
+        # 同一模型配置的同名实例只有一行，健康检查按此 upsert
+        Index("uq_model_instances_config_instance", "config_id", "instance_name", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     config_id = Column(Integer, nullable=False)  # 关联的模型配置ID
@@ -0,0 +1,45 @@
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.sql import func
+from backend.database.database import Base
+
+# 响应时间直方图的桶上限（秒），最后一个桶收集超过上一个上限的所有请求
+LATENCY_BUCKETS = (0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, float("inf"))
+
+# 每个桶对应的列名：latency_bucket_0 ... latency_bucket_9
+LATENCY_BUCKET_COLUMNS = tuple(f"latency_bucket_{i}" for i in range(len(LATENCY_BUCKETS)))
+
+
+class UsageRollup(Base):
+    """用量汇总表 - 按小时汇总每个用户每个模型配置的请求数、token数和响应时间分布"""
+    __tablename__ = "usage_rollups"
+    __table_args__ = (
+        UniqueConstraint("user_id", "config_id", "bucket_start", name="uq_usage_rollup_bucket"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    config_id = Column(Integer, ForeignKey("model_configs.id"), nullable=False)
+    bucket_start = Column(DateTime(timezone=True), nullable=False, comment="小时桶起始时间")
+
+    request_count = Column(Integer, nullable=False, default=0, comment="请求数（助手回复数）")
+    estimated_count = Column(Integer, nullable=False, default=0, comment="token数为本地估算的请求数")
+    prompt_tokens = Column(Integer, nullable=False, default=0, comment="输入token总数")
+    completion_tokens = Column(Integer, nullable=False, default=0, comment="输出token总数")
+    latency_count = Column(Integer, nullable=False, default=0, comment="有响应时间的请求数")
+    latency_sum = Column(Float, nullable=False, default=0.0, comment="响应时间总和（秒）")
+    ttft_count = Column(Integer, nullable=False, default=0, comment="有首token延迟的请求数")
+    ttft_sum = Column(Float, nullable=False, default=0.0, comment="首token延迟总和（秒）")
+
+    # 响应时间直方图（各桶独立计数，非累计）
+    latency_bucket_0 = Column(Integer, nullable=False, default=0, comment="<= 0.5s")
+    latency_bucket_1 = Column(Integer, nullable=False, default=0, comment="<= 1s")
+    latency_bucket_2 = Column(Integer, nullable=False, default=0, comment="<= 2s")
+    latency_bucket_3 = Column(Integer, nullable=False, default=0, comment="<= 5s")
+    latency_bucket_4 = Column(Integer, nullable=False, default=0, comment="<= 10s")
+    latency_bucket_5 = Column(Integer, nullable=False, default=0, comment="<= 20s")
+    latency_bucket_6 = Column(Integer, nullable=False, default=0, comment="<= 30s")
+    latency_bucket_7 = Column(Integer, nullable=False, default=0, comment="<= 60s")
+    latency_bucket_8 = Column(Integer, nullable=False, default=0, comment="<= 120s")
+    latency_bucket_9 = Column(Integer, nullable=False, default=0, comment="> 120s")
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -50,6 +50,14 @@ class ChatMessageCreate(ChatMessageBase):
     context_relevance_score: Optional[int] = Field(0, description="上下文相关性评分")
     context_keywords: Optional[List[str]] = Field(None, description="提取的关键词")
 
+class ChatMessageRecord(ChatMessageCreate):
+    """服务端保存模型回复时使用的消息（包含用量字段，计入用量统计；不作为接口请求体，客户端不能填写）"""
+    prompt_tokens: Optional[int] = Field(None, description="输入token数")
+    completion_tokens: Optional[int] = Field(None, description="输出token数")
+    usage_estimated: Optional[bool] = Field(None, description="token数是否为本地估算")
+    ttft: Optional[float] = Field(None, description="首token延迟（秒）")
+    tokens_per_second: Optional[float] = Field(None, description="生成速度（token/秒）")
+
 class ChatMessageResponse(ChatMessageBase):
     """聊天消息响应"""
     id: int
@@ -58,6 +66,11 @@ class ChatMessageResponse(ChatMessageBase):
     message_metadata: Optional[Dict[str, Any]] = None
     context_relevance_score: int = 0
     context_keywords: Optional[List[str]] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    usage_estimated: Optional[bool] = None
+    ttft: Optional[float] = None
+    tokens_per_second: Optional[float] = None
     
     class Config:
         from_attributes = True
@@ -0,0 +1,18 @@
+from typing import Optional
+from pydantic import BaseModel, Field
+
+class ChatSummaryJob(BaseModel):
+    """刷新聊天上下文摘要"""
+    chat_id: int = Field(..., description="聊天ID")
+    user_id: int = Field(..., description="用户ID")
+
+class ChatContextCascadeJob(BaseModel):
+    """模型配置的上下文开关变化后，同步到使用该模型的聊天"""
+    user_id: int = Field(..., description="用户ID")
+    config_id: int = Field(..., description="模型配置ID")
+    # 旧版本写入的任务带有该字段；执行时以模型配置的当前值为准，不再使用
+    enable_context: Optional[bool] = Field(None, description="入队时的上下文开关（已不使用）")
+
+class AvatarCleanupJob(BaseModel):
+    """删除不再使用的头像文件"""
+    avatar_url: str = Field(..., description="头像URL，例如 /uploads/avatars/xxx.png")
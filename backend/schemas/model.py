@@ -80,4 +80,51 @@ class ModelConnectionTestResponse(BaseModel):
     message: str
     response: Optional[str] = None
     error: Optional[str] = None
-    connection_time: Optional[float] = None  # 连接耗时（秒） 
\ No newline at end of file
+    connection_time: Optional[float] = None  # 连接耗时（秒）
+
+class ModelHealthStatus(BaseModel):
+    """模型健康状态"""
+    config_id: int
+    name: str
+    status: str  # running, error, unknown
+    checked_at: Optional[datetime] = None  # 最近一次探测时间
+    last_healthy_at: Optional[datetime] = None  # 最近一次可用时间
+    latency: Optional[float] = None  # 探测耗时（秒）
+    error: Optional[str] = None
+    cached: bool = False  # 是否为缓存结果
+
+class ModelHealthResponse(BaseModel):
+    """模型健康状态列表响应"""
+    models: List[ModelHealthStatus]
+    healthy_count: int
+    probed_count: int
+
+class LatencyHistogramBucket(BaseModel):
+    """响应时间直方图桶"""
+    le: Optional[float] = None  # 桶上限（秒），None 表示无上限
+    count: int
+
+class ModelUsageBucket(BaseModel):
+    """单个小时的用量统计"""
+    bucket_start: datetime
+    requests: int
+    prompt_tokens: int
+    completion_tokens: int
+    avg_latency: Optional[float] = None
+
+class ModelUsageStatsResponse(BaseModel):
+    """模型用量和延迟统计（来自小时汇总表）"""
+    config_id: int
+    since: datetime
+    until: datetime
+    requests: int
+    estimated_requests: int  # token数为本地估算的请求数
+    prompt_tokens: int
+    completion_tokens: int
+    total_tokens: int
+    avg_latency: Optional[float] = None
+    p50_latency: Optional[float] = None  # 由直方图估算
+    p95_latency: Optional[float] = None  # 由直方图估算
+    avg_ttft: Optional[float] = None
+    latency_histogram: List[LatencyHistogramBucket]
+    buckets: List[ModelUsageBucket]
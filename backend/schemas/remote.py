@@ -11,6 +11,7 @@ class RemoteChatRequest(BaseModel):
         description="对话历史，格式: [{'role': 'user', 'content': '...'}, {'role': 'assistant', 'content': '...'}]"
     )
     chat_url: Optional[str] = Field(None, description="聊天URL，用于继续现有对话")
+    fallback_config_id: Optional[int] = Field(None, description="备用模型配置ID，主模型服务熔断时使用")
     
     # 可选参数
     max_tokens: Optional[int] = Field(None, ge=1, le=10000, description="最大token数")
@@ -35,6 +36,7 @@ class RemoteChatResponse(BaseModel):
     usage: Optional[Dict[str, Any]] = None
     finish_reason: Optional[str] = None
     chat_url: Optional[str] = None
+    config_id: Optional[int] = None  # 实际使用的模型配置ID（熔断时可能为备用配置）
 
 class RemoteChatStreamResponse(BaseModel):
     """远程聊天流式响应"""
@@ -45,6 +47,34 @@ class RemoteChatStreamResponse(BaseModel):
     name: Optional[str] = None
     finish_reason: Optional[str] = None
 
+class RemotePrewarmRequest(BaseModel):
+    """预热请求（用户开始输入时发送）"""
+    config_id: int = Field(..., description="模型配置ID")
+    chat_url: Optional[str] = Field(None, description="当前聊天URL，用于预加载上下文")
+
+class RemotePrewarmResponse(BaseModel):
+    """预热响应"""
+    success: bool
+    connection: str  # warmed / reused / failed / skipped
+    latency: Optional[float] = None
+    error: Optional[str] = None
+    context_messages: Optional[int] = None
+
+class CircuitBreakerStatus(BaseModel):
+    """模型服务熔断器状态"""
+    config_id: int
+    name: str
+    base_url: str
+    state: str  # closed / open / half_open
+    failure_rate: float
+    window_calls: int
+    total_successes: int
+    total_failures: int
+    total_rejected: int
+    last_failure: Optional[str] = None
+    last_failure_at: Optional[float] = None
+    retry_after: Optional[float] = None
+
 class RemoteModelListRequest(BaseModel):
     """远程模型列表请求"""
     skip: Optional[int] = Field(0, ge=0, description="跳过数量")
@@ -42,6 +42,7 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     username: Optional[str] = None
+    exp: Optional[float] = None  # 过期时间（Unix时间戳）
 
 class LoginRequest(BaseModel):
     username: Optional[str] = None
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+ALLIN 生产环境预派生（pre-fork）启动器
+
+父进程预先导入 backend.main:app 并初始化 jieba 分词器，然后 fork 出多个
+uvicorn 工作进程共享同一个监听套接字。只读的词典和模块对象以写时复制方式
+在工作进程间共享，父进程负责监控、重启工作进程并定期报告各进程内存占用。
+"""
+
+import sys
+import os
+import gc
+import time
+import signal
+import socket
+import argparse
+from typing import Dict, Optional
+
+# 添加项目根目录到Python路径
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(backend_dir)
+sys.path.insert(0, project_root)
+
+
+def _read_proc_kb(path: str, fields) -> Dict[str, int]:
+    """从 /proc 文件中读取以 kB 为单位的字段"""
+    values = {}
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in fields:
+                    values[key] = int(rest.split()[0])
+    except (OSError, ValueError, IndexError):
+        pass
+    return values
+
+
+def get_memory_info(pid: int) -> Dict[str, Optional[float]]:
+    """获取进程内存（MB）：RSS、PSS（按共享比例分摊）和共享页"""
+    status = _read_proc_kb(f"/proc/{pid}/status", ("VmRSS",))
+    rollup = _read_proc_kb(f"/proc/{pid}/smaps_rollup", ("Pss", "Shared_Clean", "Shared_Dirty"))
+
+    rss_kb = status.get("VmRSS")
+    if rss_kb is None:
+        # 非Linux系统退回 ps
+        try:
+            rss_kb = int(os.popen(f"ps -o rss= -p {pid}").read().strip() or 0) or None
+        except ValueError:
+            rss_kb = None
+
+    def to_mb(kb):
+        return round(kb / 1024, 1) if kb is not None else None
+
+    shared_kb = None
+    if "Shared_Clean" in rollup or "Shared_Dirty" in rollup:
+        shared_kb = rollup.get("Shared_Clean", 0) + rollup.get("Shared_Dirty", 0)
+
+    return {"rss": to_mb(rss_kb), "pss": to_mb(rollup.get("Pss")), "shared": to_mb(shared_kb)}
+
+
+class PreforkServer:
+    """预派生多进程服务器"""
+
+    def __init__(self, host: str, port: int, workers: int, log_level: str = "info",
+                 report_interval: float = 60.0, graceful_timeout: float = 30.0):
+        self.host = host
+        self.port = port
+        self.num_workers = workers
+        self.log_level = log_level
+        self.report_interval = report_interval
+        self.graceful_timeout = graceful_timeout
+        self.workers: Dict[int, float] = {}  # pid -> 启动时间
+        self.should_exit = False
+        self.report_requested = False
+        self.sock: Optional[socket.socket] = None
+        self.config = None
+
+    def prepare_metrics_dir(self):
+        """各工作进程把指标快照写入同一目录，/metrics 汇总所有进程（需在导入应用前设置）"""
+        metrics_dir = os.environ.setdefault("METRICS_DIR", os.path.join(project_root, ".cache", "metrics"))
+        os.makedirs(metrics_dir, exist_ok=True)
+        for filename in os.listdir(metrics_dir):
+            if filename.endswith(".json") or filename.endswith(".tmp"):
+                os.remove(os.path.join(metrics_dir, filename))
+
+    def prepare_read_sticky_file(self):
+        """各工作进程共享最近写入记录，用户写入后的读取无论落到哪个进程都走主库（需在导入应用前设置）"""
+        sticky_file = os.environ.setdefault("READ_STICKY_FILE", os.path.join(project_root, ".cache", "read_sticky.db"))
+        os.makedirs(os.path.dirname(sticky_file), exist_ok=True)
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(sticky_file + suffix):
+                os.remove(sticky_file + suffix)
+
+    def preload(self):
+        """在父进程中预加载应用和分词器"""
+        # 静态文件目录 uploads 相对于 backend 目录
+        os.chdir(backend_dir)
+
+        started = time.time()
+        from backend.main import app
+        from backend.core.tokenizer import init_tokenizer, get_tokenizer_status
+        from backend.database.database import dispose_engines
+        import uvicorn
+
+        init_tokenizer()
+        tokenizer_status = get_tokenizer_status()
+
+        # 父进程不持有数据库连接，避免连接被多个子进程共享
+        dispose_engines()
+
+        # 冻结当前所有对象，避免子进程GC改写引用计数页而破坏写时复制
+        gc.collect()
+        gc.freeze()
+
+        self.config = uvicorn.Config(app, log_level=self.log_level, lifespan="on")
+        print(f"📦 预加载完成，耗时 {time.time() - started:.2f}s（分词器: {tokenizer_status['state']}）")
+
+    def bind(self):
+        """创建共享的监听套接字"""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(self.config.backlog)
+        sock.set_inheritable(True)
+        self.sock = sock
+
+    def spawn_worker(self):
+        """fork 一个工作进程"""
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker()
+            os._exit(0)
+        self.workers[pid] = time.time()
+        print(f"👷 工作进程已启动: pid={pid}")
+
+    def _run_worker(self):
+        """工作进程主逻辑"""
+        for sig in (signal.SIGINT, signal.SIGTERM, signal.SIGCHLD, signal.SIGUSR1):
+            signal.signal(sig, signal.SIG_DFL)
+        try:
+            from backend.database.database import dispose_engines
+            import uvicorn
+
+            # 丢弃从父进程继承的连接池，不关闭父进程的连接
+            dispose_engines(close=False)
+            server = uvicorn.Server(self.config)
+            server.run(sockets=[self.sock])
+        except Exception as e:
+            print(f"❌ 工作进程异常退出 pid={os.getpid()}: {e}")
+            os._exit(1)
+
+    def report_memory(self):
+        """报告父进程和各工作进程的内存占用"""
+        print("📊 进程内存（MB）:")
+        rows = [("master", os.getpid())] + [("worker", pid) for pid in sorted(self.workers)]
+        total_pss = 0.0
+        for role, pid in rows:
+            info = get_memory_info(pid)
+            if info["pss"] is not None:
+                total_pss += info["pss"]
+            print(f"   - {role:<6} pid={pid:<7} RSS={info['rss']}  PSS={info['pss']}  共享={info['shared']}")
+        if total_pss:
+            print(f"   合计 PSS: {total_pss:.1f} MB")
+
+    def _handle_exit(self, signum, frame):
+        self.should_exit = True
+
+    def _handle_report(self, signum, frame):
+        self.report_requested = True
+
+    def reap_workers(self):
+        """回收已退出的工作进程"""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            if pid in self.workers:
+                del self.workers[pid]
+                if not self.should_exit:
+                    print(f"⚠️  工作进程退出 pid={pid} status={status}，重新启动")
+
+    def shutdown(self):
+        """优雅停止所有工作进程"""
+        print("🛑 正在停止工作进程...")
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                self.workers.pop(pid, None)
+
+        deadline = time.time() + self.graceful_timeout
+        while self.workers and time.time() < deadline:
+            self.reap_workers()
+            time.sleep(0.1)
+
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self.reap_workers()
+        if self.sock:
+            self.sock.close()
+
+    def run(self):
+        self.prepare_metrics_dir()
+        self.prepare_read_sticky_file()
+        self.preload()
+        self.bind()
+
+        signal.signal(signal.SIGINT, self._handle_exit)
+        signal.signal(signal.SIGTERM, self._handle_exit)
+        signal.signal(signal.SIGUSR1, self._handle_report)
+
+        print(f"🌐 监听 http://{self.host}:{self.port}，工作进程数: {self.num_workers}")
+        for _ in range(self.num_workers):
+            self.spawn_worker()
+
+        # 等工作进程完成启动后报告一次内存
+        next_report = time.time() + min(5.0, self.report_interval)
+        try:
+            while not self.should_exit:
+                self.reap_workers()
+                while not self.should_exit and len(self.workers) < self.num_workers:
+                    self.spawn_worker()
+                if self.report_requested or (self.report_interval > 0 and time.time() >= next_report):
+                    self.report_requested = False
+                    self.report_memory()
+                    next_report = time.time() + self.report_interval
+                time.sleep(0.5)
+        finally:
+            self.shutdown()
+        print("👋 服务器已停止")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ALLIN 预派生多进程服务器")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"), help="监听地址")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")), help="监听端口")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+                        help="工作进程数（默认CPU核数）")
+    parser.add_argument("--log-level", default="info", help="日志级别")
+    parser.add_argument("--report-interval", type=float, default=60.0,
+                        help="内存报告间隔（秒，0表示只在收到SIGUSR1时报告）")
+    parser.add_argument("--graceful-timeout", type=float, default=30.0, help="优雅停止超时（秒）")
+
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        print("❌ 当前平台不支持 fork，请使用 start_backend.sh")
+        sys.exit(1)
+
+    print("🚀 启动 ALLIN 后端服务器（预派生模式）...")
+    PreforkServer(
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        log_level=args.log_level,
+        report_interval=args.report_interval,
+        graceful_timeout=args.graceful_timeout
+    ).run()
@@ -0,0 +1 @@
+# Tools package - 运维命令行工具
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+并发登录压测：测量登录延迟和事件循环延迟
+
+在进程内通过 ASGI 直接调用应用，同时运行一个事件循环探针，
+用于比较 bcrypt 在请求中同步执行（PASSWORD_HASH_WORKERS=0）
+与放入线程池执行时对事件循环的影响。
+
+示例：
+    python backend/tools/bench_login.py --concurrency 50 --requests 200
+    PASSWORD_HASH_WORKERS=0 python backend/tools/bench_login.py
+"""
+
+import sys
+import os
+import time
+import uuid
+import asyncio
+import argparse
+import tempfile
+from typing import List
+
+# 添加项目根目录到Python路径
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+project_root = os.path.dirname(backend_dir)
+sys.path.insert(0, project_root)
+
+# 默认使用临时数据库，避免污染正式数据
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    """计算百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def _probe_loop_lag(interval: float, samples: List[float], stop: asyncio.Event):
+    """周期性休眠，记录实际唤醒时间比预期晚了多少"""
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, time.perf_counter() - expected))
+
+
+async def run_benchmark(total: int, concurrency: int, probe_interval: float):
+    import httpx
+    os.chdir(backend_dir)
+    from backend.main import app
+    from backend.database.database import Base, engine
+    from backend.core.config import settings
+    from backend.utils.auth import get_password_pool_stats
+    import backend.models.user, backend.models.model, backend.models.chat  # noqa: F401
+
+    Base.metadata.create_all(bind=engine)
+
+    username = f"bench_{uuid.uuid4().hex[:8]}"
+    password = "bench-password"
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        response = await client.post("/api/auth/register", json={
+            "username": username, "email": f"{username}@example.com", "password": password
+        })
+        if response.status_code != 200:
+            print(f"❌ 注册测试用户失败: {response.status_code} {response.text}")
+            return False
+
+        latencies: List[float] = []
+        status_counts = {}
+        lag_samples: List[float] = []
+        stop = asyncio.Event()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def login_once():
+            async with semaphore:
+                started = time.perf_counter()
+                resp = await client.post("/api/auth/login", json={"username": username, "password": password})
+                latencies.append(time.perf_counter() - started)
+                status_counts[resp.status_code] = status_counts.get(resp.status_code, 0) + 1
+
+        probe = asyncio.create_task(_probe_loop_lag(probe_interval, lag_samples, stop))
+        started = time.perf_counter()
+        await asyncio.gather(*(login_once() for _ in range(total)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await probe
+
+    mode = f"线程池({settings.PASSWORD_HASH_WORKERS} 线程, 队列 {settings.PASSWORD_HASH_QUEUE_SIZE})" \
+        if settings.PASSWORD_HASH_WORKERS > 0 else "请求内同步"
+    print(f"\n📋 并发登录压测结果 - 模式: {mode}")
+    print(f"   - 请求数: {total}，并发: {concurrency}，总耗时: {elapsed:.2f}s，吞吐: {total / elapsed:.1f} req/s")
+    print(f"   - 状态码: {status_counts}")
+    print(f"   - 登录延迟 p50={_percentile(latencies, 50) * 1000:.1f}ms "
+          f"p95={_percentile(latencies, 95) * 1000:.1f}ms max={max(latencies) * 1000:.1f}ms")
+    if lag_samples:
+        print(f"   - 事件循环延迟 p50={_percentile(lag_samples, 50) * 1000:.1f}ms "
+              f"p95={_percentile(lag_samples, 95) * 1000:.1f}ms max={max(lag_samples) * 1000:.1f}ms "
+              f"（探针间隔 {probe_interval * 1000:.0f}ms，样本 {len(lag_samples)}）")
+    print(f"   - 线程池状态: {get_password_pool_stats()}")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="并发登录压测")
+    parser.add_argument("--requests", type=int, default=100, help="登录请求总数")
+    parser.add_argument("--concurrency", type=int, default=20, help="并发数")
+    parser.add_argument("--probe-interval", type=float, default=0.01, help="事件循环探针间隔（秒）")
+
+    args = parser.parse_args()
+
+    print("🔄 开始并发登录压测...")
+    success = asyncio.run(run_benchmark(args.requests, args.concurrency, args.probe_interval))
+    if not success:
+        sys.exit(1)
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+SQLite 读写并发压测：比较 default 与 production 两种数据库配置
+
+多个写线程模拟流式回复落库（插入消息并更新聊天的更新时间），
+多个读线程模拟侧边栏和历史记录读取，统计两种配置下的吞吐和延迟。
+default 配置使用回滚日志和单个连接池（原有行为），
+production 配置使用 WAL、调优的 PRAGMA 以及独立的读写连接池。
+
+示例：
+    python backend/tools/bench_sqlite.py --writers 4 --readers 8 --duration 5
+    python backend/tools/bench_sqlite.py --profiles production
+"""
+
+import sys
+import os
+import time
+import argparse
+import tempfile
+import threading
+from typing import Dict, List
+
+# 添加项目根目录到Python路径
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+project_root = os.path.dirname(backend_dir)
+sys.path.insert(0, project_root)
+
+# 导入数据库模块时会创建全局引擎，默认指向临时数据库，避免影响正式数据
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+from sqlalchemy import select, func, update, insert
+from backend.core.config import settings
+from backend.database.database import Base
+from backend.database.engine import create_db_engine, checkpoint
+from backend.models.user import User
+from backend.models.model import ModelConfig
+from backend.models.chat import ChatHistory, ChatMessage
+import backend.models.cache_version, backend.models.usage, backend.models.job  # noqa: F401
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    """计算百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _prepare(engine, chats: int) -> List[int]:
+    """建表并写入一个用户、一个模型配置和若干聊天"""
+    Base.metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        user_id = conn.execute(insert(User).values(
+            username="bench", email="bench@example.com", hashed_password="x"
+        )).inserted_primary_key[0]
+        config_id = conn.execute(insert(ModelConfig).values(
+            user_id=user_id, name="bench", base_url="http://127.0.0.1", api_key="k", model_name="m"
+        )).inserted_primary_key[0]
+        chat_ids = [
+            conn.execute(insert(ChatHistory).values(
+                user_id=user_id, config_id=config_id, title=f"chat {i}", url=f"bench-{i}"
+            )).inserted_primary_key[0]
+            for i in range(chats)
+        ]
+    return chat_ids
+
+
+def _run_profile(profile: str, writers: int, readers: int, duration: float, chats: int) -> Dict[str, float]:
+    settings.SQLITE_PROFILE = profile
+    url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    write_engine = create_db_engine(url)
+    # default 配置下读写共用一个连接池，与原有行为一致
+    read_engine = create_db_engine(url, read_only=True) if profile == "production" else write_engine
+    chat_ids = _prepare(write_engine, chats)
+
+    write_latencies: List[float] = []
+    read_latencies: List[float] = []
+    errors = {"write": 0, "read": 0}
+    lock = threading.Lock()
+    stop = threading.Event()
+    content = "这是一条用于压测的助手回复。" * 20
+
+    def writer(index: int):
+        n = 0
+        while not stop.is_set():
+            chat_id = chat_ids[(index + n) % len(chat_ids)]
+            n += 1
+            started = time.perf_counter()
+            try:
+                with write_engine.connect() as conn:
+                    conn.execute(insert(ChatMessage).values(
+                        chat_history_id=chat_id, role="assistant", content=content,
+                        message_metadata={"streaming": True}
+                    ))
+                    conn.execute(update(ChatHistory).where(ChatHistory.id == chat_id).values(updated_at=func.now()))
+            except Exception:
+                with lock:
+                    errors["write"] += 1
+                continue
+            with lock:
+                write_latencies.append(time.perf_counter() - started)
+
+    def reader(index: int):
+        n = 0
+        while not stop.is_set():
+            chat_id = chat_ids[(index + n) % len(chat_ids)]
+            n += 1
+            started = time.perf_counter()
+            try:
+                with read_engine.connect() as conn:
+                    conn.execute(
+                        select(ChatHistory.id, ChatHistory.title, ChatHistory.updated_at)
+                        .where(ChatHistory.is_deleted == False)  # noqa: E712
+                        .order_by(ChatHistory.updated_at.desc()).limit(100)
+                    ).fetchall()
+                    conn.execute(
+                        select(ChatMessage.id, ChatMessage.role, ChatMessage.content)
+                        .where(ChatMessage.chat_history_id == chat_id)
+                        .order_by(ChatMessage.id.desc()).limit(50)
+                    ).fetchall()
+            except Exception:
+                with lock:
+                    errors["read"] += 1
+                continue
+            with lock:
+                read_latencies.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    threads += [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    if profile == "production":
+        checkpoint(write_engine, "TRUNCATE")
+    write_engine.dispose()
+    read_engine.dispose()
+
+    return {
+        "writes_per_second": len(write_latencies) / duration,
+        "reads_per_second": len(read_latencies) / duration,
+        "write_p50": _percentile(write_latencies, 50),
+        "write_p95": _percentile(write_latencies, 95),
+        "read_p50": _percentile(read_latencies, 50),
+        "read_p95": _percentile(read_latencies, 95),
+        "write_errors": errors["write"],
+        "read_errors": errors["read"],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SQLite 读写并发压测")
+    parser.add_argument("--writers", type=int, default=4, help="写线程数")
+    parser.add_argument("--readers", type=int, default=8, help="读线程数")
+    parser.add_argument("--duration", type=float, default=5.0, help="每种配置的压测时间（秒）")
+    parser.add_argument("--chats", type=int, default=50, help="聊天数量")
+    parser.add_argument("--profiles", nargs="+", default=["default", "production"],
+                        choices=["default", "production"], help="要比较的配置")
+
+    args = parser.parse_args()
+
+    print(f"🔄 开始SQLite读写并发压测（写线程 {args.writers}，读线程 {args.readers}，每种配置 {args.duration}s）...")
+    for profile in args.profiles:
+        result = _run_profile(profile, args.writers, args.readers, args.duration, args.chats)
+        print(f"\n📋 配置: {profile}")
+        print(f"   - 写入: {result['writes_per_second']:.1f} 次/s，"
+              f"p50={result['write_p50'] * 1000:.1f}ms p95={result['write_p95'] * 1000:.1f}ms，失败 {result['write_errors']}")
+        print(f"   - 读取: {result['reads_per_second']:.1f} 次/s，"
+              f"p50={result['read_p50'] * 1000:.1f}ms p95={result['read_p95'] * 1000:.1f}ms，失败 {result['read_errors']}")
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+并行重建 chat_messages.context_keywords 和 context_vector
+
+修改 ContextManager 的停用词、分词逻辑或向量维度后，已存储的关键词和向量会过期。
+本工具按 id 顺序分批读取消息，在进程池中并行分词，
+再通过 executemany 批量回写，支持断点续跑、进度和吞吐统计。
+"""
+
+import sys
+import os
+import json
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from sqlalchemy import create_engine, text
+from backend.core.config import settings
+
+# 默认断点文件，保存最后一个已提交的消息ID
+DEFAULT_CHECKPOINT = os.path.join(project_root, "reindex_keywords.checkpoint")
+
+# 子进程内的上下文管理器实例（由 _init_worker 创建）
+_worker_context_manager = None
+
+
+def _init_worker():
+    """子进程初始化：每个进程只创建一次 ContextManager"""
+    global _worker_context_manager
+    from backend.core.context_manager import ContextManager
+    _worker_context_manager = ContextManager()
+
+
+def _tokenize_chunk(rows: List[Tuple[int, str]]) -> List[Dict]:
+    """在子进程中对一组消息分词，返回 executemany 参数"""
+    params = []
+    for message_id, content in rows:
+        keywords = _worker_context_manager.extract_keywords(content or "")
+        params.append({
+            "id": message_id,
+            "keywords": json.dumps(keywords, ensure_ascii=False),
+            "vector": _worker_context_manager.compute_message_vector(content or "")
+        })
+    return params
+
+
+def load_checkpoint(path: str) -> int:
+    """读取断点，返回最后一个已处理的消息ID"""
+    if not os.path.exists(path):
+        return 0
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return int(json.load(f).get("last_id", 0))
+    except (ValueError, OSError):
+        return 0
+
+
+def save_checkpoint(path: str, last_id: int, processed: int):
+    """原子写入断点文件"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"last_id": last_id, "processed": processed, "updated_at": time.time()}, f)
+    os.replace(tmp_path, path)
+
+
+def _format_eta(seconds: float) -> str:
+    """格式化剩余时间"""
+    if seconds <= 0 or seconds == float("inf"):
+        return "--:--"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:d}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+
+def _split(rows: List, size: int) -> List[List]:
+    """把一个批次切分成若干子块分发给进程池"""
+    return [rows[i:i + size] for i in range(0, len(rows), size)]
+
+
+def reindex_keywords(
+    batch_size: int = 2000,
+    workers: Optional[int] = None,
+    chunk_size: int = 200,
+    checkpoint: str = DEFAULT_CHECKPOINT,
+    restart: bool = False,
+    dry_run: bool = False,
+    database_url: Optional[str] = None
+) -> bool:
+    """重建所有消息的关键词和语义向量"""
+    engine = create_engine(database_url or settings.DATABASE_URL)
+    workers = workers or os.cpu_count() or 1
+
+    last_id = 0 if restart else load_checkpoint(checkpoint)
+    if last_id:
+        print(f"ℹ️  从断点继续：id > {last_id}")
+
+    select_sql = text("""
+        SELECT id, content FROM chat_messages
+        WHERE id > :last_id
+        ORDER BY id
+        LIMIT :limit
+    """)
+    update_sql = text("UPDATE chat_messages SET context_keywords = :keywords, context_vector = :vector WHERE id = :id")
+
+    try:
+        with engine.connect() as conn:
+            total = conn.execute(
+                text("SELECT COUNT(*) FROM chat_messages WHERE id > :last_id"),
+                {"last_id": last_id}
+            ).scalar() or 0
+            print(f"📊 待处理消息: {total} 条（批大小 {batch_size}，进程数 {workers}）")
+            if total == 0:
+                print("✅ 没有需要重建的消息")
+                return True
+
+            processed = 0
+            started = time.time()
+            # 每个在途批次：(批次最大ID, 子块futures)
+            in_flight = deque()
+            # 在途子块数保持在进程数的两倍左右，让所有核心持续忙碌
+            chunks_per_batch = max(1, -(-batch_size // chunk_size))
+            max_in_flight = max(2, -(-workers * 2 // chunks_per_batch))
+
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+                cursor_id = last_id
+                exhausted = False
+
+                while not exhausted or in_flight:
+                    # 读取下一批并提交到进程池，同时保持有限的在途批次
+                    while not exhausted and len(in_flight) < max_in_flight:
+                        rows = conn.execute(select_sql, {"last_id": cursor_id, "limit": batch_size}).fetchall()
+                        # 结束读事务，避免长时间持有 SQLite 读锁
+                        conn.rollback()
+                        if not rows:
+                            exhausted = True
+                            break
+                        cursor_id = rows[-1][0]
+                        chunks = _split([(row[0], row[1]) for row in rows], chunk_size)
+                        in_flight.append((cursor_id, [pool.submit(_tokenize_chunk, chunk) for chunk in chunks]))
+
+                    if not in_flight:
+                        break
+
+                    # 按顺序提交最早的批次，保证断点单调递增
+                    batch_last_id, futures = in_flight.popleft()
+                    params = []
+                    for future in futures:
+                        params.extend(future.result())
+
+                    if not dry_run:
+                        conn.execute(update_sql, params)
+                        conn.commit()
+                        save_checkpoint(checkpoint, batch_last_id, processed + len(params))
+
+                    processed += len(params)
+                    elapsed = time.time() - started
+                    rate = processed / elapsed if elapsed > 0 else 0.0
+                    eta = (total - processed) / rate if rate > 0 else float("inf")
+                    print(
+                        f"  ⏳ {processed}/{total} ({processed * 100 / total:.1f}%) "
+                        f"| {rate:.0f} 条/秒 | 剩余 {_format_eta(eta)} | last_id={batch_last_id}",
+                        flush=True
+                    )
+
+            elapsed = time.time() - started
+            print(f"\n📋 完成: {processed} 条，耗时 {elapsed:.2f}s，平均 {processed / elapsed if elapsed > 0 else 0:.0f} 条/秒")
+            if dry_run:
+                print("ℹ️  dry-run 模式，未写入数据库")
+            elif os.path.exists(checkpoint):
+                os.remove(checkpoint)
+
+            return True
+
+    except KeyboardInterrupt:
+        print(f"\n⚠️  已中断，可重新运行以从断点继续（{checkpoint}）")
+        return False
+    except Exception as e:
+        print(f"❌ 重建关键词失败: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="并行重建 chat_messages 的上下文关键词和语义向量")
+    parser.add_argument("--batch-size", type=int, default=2000, help="每批读取的消息数")
+    parser.add_argument("--workers", type=int, default=None, help="分词进程数（默认CPU核数）")
+    parser.add_argument("--chunk-size", type=int, default=200, help="每个子任务的消息数")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="断点文件路径")
+    parser.add_argument("--restart", action="store_true", help="忽略断点，从头开始")
+    parser.add_argument("--dry-run", action="store_true", help="只分词不写库")
+    parser.add_argument("--database-url", default=None, help="覆盖配置中的数据库URL")
+
+    args = parser.parse_args()
+
+    print("🔄 重建消息关键词...")
+    success = reindex_keywords(
+        batch_size=args.batch_size,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        checkpoint=args.checkpoint,
+        restart=args.restart,
+        dry_run=args.dry_run,
+        database_url=args.database_url
+    )
+
+    if success:
+        print("🎉 关键词重建完成！")
+    else:
+        print("💥 关键词重建失败！")
+        sys.exit(1)
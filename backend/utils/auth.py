@@ -1,5 +1,8 @@
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Dict, Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
@@ -8,7 +11,10 @@ from sqlalchemy.orm import Session
 from backend.database.database import get_db
 from backend.models.user import User
 from backend.core.config import settings
+from backend.core.cache import LRUCache, snapshot_row, attach_snapshot
+from backend.crud.cache_version import CacheVersionSync
 from backend.schemas.user import TokenData
+from backend.core.tracing import traced
 
 # 密码加密上下文
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -16,6 +22,28 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 # JWT Bearer token
 security = HTTPBearer()
 
+# 已验证令牌 -> 用户快照（列值字典），避免每个请求都查询用户表
+user_cache = LRUCache("auth_user", maxsize=settings.AUTH_CACHE_SIZE, ttl=settings.AUTH_CACHE_TTL)
+user_cache_versions = CacheVersionSync(user_cache, "users", settings.CACHE_VERSION_CHECK_INTERVAL)
+
+def invalidate_user_cache(user_id: int, db: Optional[Session] = None) -> int:
+    """用户信息变更后清除本进程中其所有令牌的缓存
+
+    传入 db 时同时递增版本号（需要调用方提交事务），其他工作进程据此清空用户缓存；
+    只更新登录时间等展示字段时不传，避免每次登录都清空所有进程的缓存。
+    """
+    if db is not None:
+        user_cache_versions.bump(db)
+    return user_cache.invalidate_where(lambda token, snapshot: snapshot["id"] == user_id)
+
+# 密码哈希专用线程池：bcrypt 计算时释放GIL，放到线程中执行可避免阻塞事件循环
+_password_executor = (
+    ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+    if settings.PASSWORD_HASH_WORKERS > 0 else None
+)
+# 正在执行和排队中的密码任务数（只在事件循环线程中修改）
+_password_tasks_in_flight = 0
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """验证密码"""
     return pwd_context.verify(plain_password, hashed_password)
@@ -24,6 +52,44 @@ def get_password_hash(password: str) -> str:
     """生成密码哈希"""
     return pwd_context.hash(password)
 
+async def _run_password_task(func, *args):
+    """在密码线程池中执行，队列已满时返回503而不是阻塞"""
+    global _password_tasks_in_flight
+    if _password_executor is None:
+        return func(*args)
+    
+    if _password_tasks_in_flight >= settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_QUEUE_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please retry later",
+            headers={"Retry-After": "1"},
+        )
+    
+    _password_tasks_in_flight += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_password_executor, func, *args)
+    finally:
+        _password_tasks_in_flight -= 1
+
+@traced()
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """在线程池中验证密码"""
+    return await _run_password_task(verify_password, plain_password, hashed_password)
+
+@traced()
+async def get_password_hash_async(password: str) -> str:
+    """在线程池中生成密码哈希"""
+    return await _run_password_task(get_password_hash, password)
+
+def get_password_pool_stats() -> Dict[str, Any]:
+    """密码线程池状态"""
+    return {
+        "workers": settings.PASSWORD_HASH_WORKERS,
+        "queue_size": settings.PASSWORD_HASH_QUEUE_SIZE,
+        "in_flight": _password_tasks_in_flight,
+    }
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """创建访问令牌"""
     to_encode = data.copy()
@@ -42,11 +108,12 @@ def verify_token(token: str) -> Optional[TokenData]:
         username: str = payload.get("sub")
         if username is None:
             return None
-        token_data = TokenData(username=username)
+        token_data = TokenData(username=username, exp=payload.get("exp"))
         return token_data
     except JWTError:
         return None
 
+@traced()
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
@@ -59,6 +126,11 @@ async def get_current_user(
     )
     
     token = credentials.credentials
+    user_cache_versions.sync(db)
+    snapshot = user_cache.get(token)
+    if snapshot is not None:
+        return attach_snapshot(db, User, snapshot)
+    
     token_data = verify_token(token)
     if token_data is None:
         raise credentials_exception
@@ -67,8 +139,25 @@ async def get_current_user(
     if user is None:
         raise credentials_exception
     
+    # 缓存时间不超过令牌剩余有效期
+    ttl = settings.AUTH_CACHE_TTL
+    if token_data.exp is not None:
+        ttl = min(ttl, token_data.exp - time.time())
+    if ttl > 0:
+        user_cache.set(token, snapshot_row(user), ttl=ttl)
+    
     return user
 
 async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
     """获取当前用户"""
-    return current_user 
\ No newline at end of file
+    return current_user 
+
+async def get_current_admin_user(current_user: User = Depends(get_current_user)) -> User:
+    """获取当前管理员用户（用户名在 ADMIN_USERNAMES 中）"""
+    admins = {name.strip() for name in settings.ADMIN_USERNAMES.split(",") if name.strip()}
+    if current_user.username not in admins:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="需要管理员权限"
+        )
+    return current_user
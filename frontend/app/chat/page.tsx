@@ -956,6 +956,7 @@ export default function ChatPage() {
           isSidebarCollapsed={sidebarCollapsed}
           selectedModel={selectedModel}
           modelContextEnabled={selectedModel?.enable_context ?? true}
+          chatUrl={currentChat?.url}
         />
       </div>
 
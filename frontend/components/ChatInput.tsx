@@ -26,8 +26,12 @@ interface ChatInputProps {
   isSidebarCollapsed?: boolean
   selectedModel?: any
   modelContextEnabled?: boolean
+  chatUrl?: string
 }
 
+// 预热间隔：同一模型和聊天在该时间内只预热一次
+const PREWARM_INTERVAL_MS = 20000
+
 export default function ChatInput({ 
   onSend, 
   onContextToggle,
@@ -36,7 +40,8 @@ export default function ChatInput({
   isLoading = false,
   isSidebarCollapsed = false,
   selectedModel = null,
-  modelContextEnabled = true
+  modelContextEnabled = true,
+  chatUrl
 }: ChatInputProps) {
   const [message, setMessage] = useState('')
   const [isRecording, setIsRecording] = useState(false)
@@ -46,6 +51,35 @@ export default function ChatInput({
   const audioChunksRef = useRef<Blob[]>([])
   const recordingIntervalRef = useRef<NodeJS.Timeout | null>(null)
   const recognitionRef = useRef<any>(null)
+  const lastPrewarmRef = useRef<{ key: string; time: number } | null>(null)
+
+  // 预热模型连接和上下文缓存，让真正发送时不必再建立连接
+  const prewarm = () => {
+    if (!selectedModel || isLoading) {
+      return
+    }
+    const key = `${selectedModel.id}:${chatUrl || ''}`
+    const now = Date.now()
+    const last = lastPrewarmRef.current
+    if (last && last.key === key && now - last.time < PREWARM_INTERVAL_MS) {
+      return
+    }
+    lastPrewarmRef.current = { key, time: now }
+
+    fetch('http://localhost:8000/api/remote/prewarm', {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        'Authorization': `Bearer ${localStorage.getItem('token')}`
+      },
+      body: JSON.stringify({
+        config_id: selectedModel.id,
+        chat_url: chatUrl || undefined
+      })
+    }).catch(() => {
+      // 预热失败不影响正常发送
+    })
+  }
 
   const handleSubmit = (e: React.FormEvent) => {
     e.preventDefault()
@@ -230,7 +264,11 @@ export default function ChatInput({
             <textarea
               ref={textareaRef}
               value={message}
-              onChange={(e) => setMessage(e.target.value)}
+              onChange={(e) => {
+                setMessage(e.target.value)
+                prewarm()
+              }}
+              onFocus={prewarm}
               onKeyDown={handleKeyDown}
               placeholder="询问任何问题"
               className="w-full resize-none bg-transparent border-none outline-none text-gray-700 dark:text-gray-200 placeholder-gray-400 dark:placeholder-gray-500 text-base leading-relaxed"
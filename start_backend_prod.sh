@@ -0,0 +1,35 @@
+#!/bin/bash
+
+# ALLIN 后端生产启动脚本
+# 功能：预加载应用和分词器后 fork 多个工作进程，共享只读内存
+
+echo "🚀 启动 ALLIN 后端服务器（生产模式）..."
+echo "=================================="
+
+# 检查Python环境
+if ! command -v python3 &> /dev/null; then
+    echo "❌ 错误：未找到 Python3，请先安装 Python3"
+    exit 1
+fi
+
+# 检查是否在正确的目录
+if [ ! -f "backend/serve.py" ]; then
+    echo "❌ 错误：请在项目根目录运行此脚本"
+    exit 1
+fi
+
+# 工作进程数，默认使用CPU核数
+WORKERS=${WEB_CONCURRENCY:-$(python3 -c "import os; print(os.cpu_count() or 1)")}
+PORT=${PORT:-8000}
+
+echo ""
+echo "🌐 启动服务器..."
+echo "=================================="
+echo "📋 服务信息:"
+echo "   - 后端地址: http://localhost:${PORT}"
+echo "   - 工作进程: ${WORKERS}"
+echo "   - 内存报告: kill -USR1 <master pid>"
+echo "=================================="
+echo ""
+
+exec python3 backend/serve.py --host 0.0.0.0 --port "${PORT}" --workers "${WORKERS}" --log-level info